@@ -10,6 +10,8 @@ from config import LOGO_PATH
 from utils import ensure_data_directory, show_success_message, show_error_message, show_warning_message, show_info_message
 from database import load_parts_data, add_part, update_part, delete_part, search_parts
 from ui import show_parts_query, show_statistics
+from services.cache_service import load_file_as_base64, list_files_cached
+from services.contact_sheet_service import load_contact_sheets, contact_sheet_html, categorize
 
 # 设置页面配置
 st.set_page_config(
@@ -197,8 +199,8 @@ def ensure_data_directory():
 
 def ensure_cad_images_directory():
     """确保CAD图片目录存在并显示状态信息"""
-    if os.path.exists(CAD_IMAGES_DIR):
-        cad_files = [f for f in os.listdir(CAD_IMAGES_DIR) if f.endswith('.png')]
+    cad_files = list_files_cached(CAD_IMAGES_DIR, '.png')
+    if cad_files is not None:
         if cad_files:
             st.sidebar.success(f"✅ CAD image library is ready ({len(cad_files)} images)")
             return True
@@ -211,17 +213,15 @@ def ensure_cad_images_directory():
 
 def test_cad_image_display():
     """测试CAD图片显示功能"""
-    if os.path.exists(CAD_IMAGES_DIR):
-        cad_files = [f for f in os.listdir(CAD_IMAGES_DIR) if f.endswith('.png')]
+    cad_files = list_files_cached(CAD_IMAGES_DIR, '.png')
+    if cad_files is not None:
         if cad_files:
             # 选择第一个图片作为示例
             sample_image = cad_files[0]
             sample_path = os.path.join(CAD_IMAGES_DIR, sample_image)
             
             try:
-                with open(sample_path, "rb") as img_file:
-                    img_data = img_file.read()
-                    img_base64 = base64.b64encode(img_data).decode('utf-8')
+                img_base64 = load_file_as_base64(sample_path)
                 
                 st.success(f"✅ CAD image library connection successful! Example image: {sample_image}")
                 
@@ -306,46 +306,36 @@ def authenticate_user(username, password):
             return True, u.get('role', 'user')  # 返回认证状态和用户角色
     return False, None
 
-def show_cad_library_overview():
-    """显示CAD图片库概览"""
-    if os.path.exists(CAD_IMAGES_DIR):
-        cad_files = [f for f in os.listdir(CAD_IMAGES_DIR) if f.endswith('.png')]
+def show_cad_library_grid():
+    """逐张显示CAD图片库概览（拼图不可用时的回退方式，只预览前6张图片）"""
+    cad_files = list_files_cached(CAD_IMAGES_DIR, '.png')
+    if cad_files is not None:
         if cad_files:
             st.success(f"🎨 CAD image library contains {len(cad_files)} images")
             
             # 按类型分组显示
-            circle_files = [f for f in cad_files if 'circle' in f.lower()]
-            plate_files = [f for f in cad_files if 'plate' in f.lower()]
-            bracket_files = [f for f in cad_files if 'bracket' in f.lower()]
-            other_files = [f for f in cad_files if not any(keyword in f.lower() for keyword in ['circle', 'plate', 'bracket'])]
-            
+            categories = {'circle': 0, 'plate': 0, 'bracket': 0, 'other': 0}
+            for file in cad_files:
+                for category in categorize(file):
+                    categories[category] += 1
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Circle", len(circle_files))
-                st.metric("Plate", len(plate_files))
+                st.metric("Circle", categories['circle'])
+                st.metric("Plate", categories['plate'])
             with col2:
-                st.metric("Bracket", len(bracket_files))
-                st.metric("Other", len(other_files))
+                st.metric("Bracket", categories['bracket'])
+                st.metric("Other", categories['other'])
             
-            # 显示图片预览 - 使用container而不是expander来避免嵌套问题
             st.markdown("### 🖼️ Image preview")
             st.info("Below is a preview of some images in the CAD image library")
             
             # 显示前6张图片作为预览
-            preview_files = cad_files[:6]
             cols = st.columns(3)
-            for i, file in enumerate(preview_files):
+            for i, file in enumerate(cad_files[:6]):
                 with cols[i % 3]:
                     try:
-                        img_path = os.path.join(CAD_IMAGES_DIR, file)
-                        with open(img_path, "rb") as img_file:
-                            img_data = img_file.read()
-                            img_base64 = base64.b64encode(img_data).decode('utf-8')
-                        
-                        st.image(f"data:image/png;base64,{img_base64}", 
-                                 caption=file,
-                                 width=200,
-                                 use_column_width=False)
+                        img_base64 = load_file_as_base64(os.path.join(CAD_IMAGES_DIR, file))
+                        st.image(f"data:image/png;base64,{img_base64}", caption=file, width=200)
                     except Exception as e:
                         st.error(f"Failed to load image: {file}")
             
@@ -357,86 +347,126 @@ def show_cad_library_overview():
         st.error("❌ CAD image library does not exist")
         return False
 
+def show_cad_library_overview():
+    """显示CAD图片库概览（缩略图拼图 + 分类统计，一次加载）"""
+    # 首次加载或图片库变化后需要生成拼图，可能耗时数秒
+    try:
+        with st.spinner("🧩 Building CAD image contact sheets..."):
+            index, sheets = load_contact_sheets(CAD_IMAGES_DIR)
+    except (OSError, ValueError) as e:
+        # 拼图或图片损坏、写入未完成时退回逐张显示
+        st.warning(f"⚠️ Failed to build contact sheets, showing individual images: {e}")
+        return show_cad_library_grid()
+    if index is not None:
+        if index['images']:
+            st.success(f"🎨 CAD image library contains {len(index['images'])} images")
+            
+            # 按类型分组显示
+            categories = index['categories']
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Circle", categories['circle'])
+                st.metric("Plate", categories['plate'])
+            with col2:
+                st.metric("Bracket", categories['bracket'])
+                st.metric("Other", categories['other'])
+            
+            # 显示图片预览 - 使用container而不是expander来避免嵌套问题
+            st.markdown("### 🖼️ Image preview")
+            st.info("Below is a preview of all images in the CAD image library")
+            
+            # 所有缩略图来自少量拼图，按索引坐标裁剪显示
+            try:
+                st.markdown(contact_sheet_html(index, sheets), unsafe_allow_html=True)
+            except Exception as e:
+                st.error(f"Failed to load image preview: {e}")
+            
+            return True
+        else:
+            st.warning("⚠️ CAD image library is empty")
+            return False
+    else:
+        st.error("❌ CAD image library does not exist")
+        return False
+
 def main():
     # 水印图片 - 使用正确的路径和base64编码
     try:
-        with open(LOGO_PATH, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode()
-            
-                        # 方法1: 使用Streamlit容器创建水印效果
-            with st.container():
-                # 创建一个透明的容器来放置LOGO
-                col1, col2, col3 = st.columns([1, 4, 1])
-                with col1:
-                    # 使用HTML来创建水印效果
-                    watermark_html = f'''
-                    <div style="
-                        position: relative !important;
-                        z-index: 1000 !important;
-                        opacity: 0.25 !important;
-                        pointer-events: none !important;
-                        background-color: transparent !important;
-                        padding: 0 !important;
-                        margin: 0 !important;
-                    ">
-                        <img src="data:image/png;base64,{encoded_string}" 
-                             alt="ZICUS LOGO" 
-                             style="
-                                 width: auto !important;
-                                 height: auto !important;
-                                 max-width: 120px !important;
-                                 max-height: 80px !important;
-                                 min-width: 60px !important;
-                                 min-height: 40px !important;
-                                 object-fit: contain !important;
-                                 filter: drop-shadow(0 0 3px rgba(0,0,0,0.1)) !important;
-                                 display: block !important;
-                             ">
-                    </div>
-                    '''
-                    st.markdown(watermark_html, unsafe_allow_html=True)
+        encoded_string = load_file_as_base64(LOGO_PATH)
+        # 方法1: 使用Streamlit容器创建水印效果
+        with st.container():
+            # 创建一个透明的容器来放置LOGO
+            col1, col2, col3 = st.columns([1, 4, 1])
+            with col1:
+                # 使用HTML来创建水印效果
+                watermark_html = f'''
+                <div style="
+                    position: relative !important;
+                    z-index: 1000 !important;
+                    opacity: 0.25 !important;
+                    pointer-events: none !important;
+                    background-color: transparent !important;
+                    padding: 0 !important;
+                    margin: 0 !important;
+                ">
+                    <img src="data:image/png;base64,{encoded_string}" 
+                         alt="ZICUS LOGO" 
+                         style="
+                             width: auto !important;
+                             height: auto !important;
+                             max-width: 120px !important;
+                             max-height: 80px !important;
+                             min-width: 60px !important;
+                             min-height: 40px !important;
+                             object-fit: contain !important;
+                             filter: drop-shadow(0 0 3px rgba(0,0,0,0.1)) !important;
+                             display: block !important;
+                         ">
+                </div>
+                '''
+                st.markdown(watermark_html, unsafe_allow_html=True)
             
-            # 方法2: 备用JavaScript水印
-            watermark_js = f'''
-            <script>
-            // 创建水印元素
-            const watermark = document.createElement('div');
-            watermark.style.cssText = `
-                position: fixed !important;
-                top: 15px !important;
-                left: 15px !important;
-                z-index: 999999 !important;
-                opacity: 0.25 !important;
-                pointer-events: none !important;
-                background-color: transparent !important;
-                padding: 0 !important;
-                border-radius: 0 !important;
-            `;
+        # 方法2: 备用JavaScript水印
+        watermark_js = f'''
+        <script>
+        // 创建水印元素
+        const watermark = document.createElement('div');
+        watermark.style.cssText = `
+            position: fixed !important;
+            top: 15px !important;
+            left: 15px !important;
+            z-index: 999999 !important;
+            opacity: 0.25 !important;
+            pointer-events: none !important;
+            background-color: transparent !important;
+            padding: 0 !important;
+            border-radius: 0 !important;
+        `;
             
-            const img = document.createElement('img');
-            img.src = 'data:image/png;base64,{encoded_string}';
-            img.alt = 'ZICUS LOGO';
-            img.style.cssText = `
-                width: auto !important;
-                height: auto !important;
-                max-width: 120px !important;
-                max-height: 80px !important;
-                min-width: 60px !important;
-                min-height: 40px !important;
-                object-fit: contain !important;
-                filter: drop-shadow(0 0 3px rgba(0,0,0,0.1)) !important;
-                display: block !important;
-            `;
+        const img = document.createElement('img');
+        img.src = 'data:image/png;base64,{encoded_string}';
+        img.alt = 'ZICUS LOGO';
+        img.style.cssText = `
+            width: auto !important;
+            height: auto !important;
+            max-width: 120px !important;
+            max-height: 80px !important;
+            min-width: 60px !important;
+            min-height: 40px !important;
+            object-fit: contain !important;
+            filter: drop-shadow(0 0 3px rgba(0,0,0,0.1)) !important;
+            display: block !important;
+        `;
             
-            watermark.appendChild(img);
-            document.body.appendChild(watermark);
-            </script>
-            '''
+        watermark.appendChild(img);
+        document.body.appendChild(watermark);
+        </script>
+        '''
             
-            st.markdown(watermark_js, unsafe_allow_html=True)
+        st.markdown(watermark_js, unsafe_allow_html=True)
             
-            # 显示成功消息
-            # st.success("✅ LOGO水印已加载 (使用Streamlit容器 + JavaScript双重保障)")
+        # 显示成功消息
+        # st.success("✅ LOGO水印已加载 (使用Streamlit容器 + JavaScript双重保障)")
             
     except Exception as e:
         st.warning(f"Failed to load logo image: {e}")
@@ -547,8 +577,8 @@ def main():
     user_role = st.session_state.user.get('role', 'user')
     
     # CAD图片库状态显示
-    if os.path.exists(CAD_IMAGES_DIR):
-        cad_files = [f for f in os.listdir(CAD_IMAGES_DIR) if f.endswith('.png')]
+    cad_files = list_files_cached(CAD_IMAGES_DIR, '.png')
+    if cad_files is not None:
         if cad_files:
             with st.sidebar.expander("🎨 CAD image library status", expanded=False):
                 st.success(f"✅ Available CAD images: {len(cad_files)} images")
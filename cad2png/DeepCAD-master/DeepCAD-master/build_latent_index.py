@@ -0,0 +1,29 @@
+"""build a LatentIndex (deploy/latent_index.py) from the latents written by test.py --mode enc
+
+    python build_latent_index.py --zs proj_log/newDeepCAD/results/all_zs_ckpt1000.h5 -o proj_log/newDeepCAD/latent_index
+"""
+import argparse
+from deploy.latent_index import LatentIndex, load_latents, BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--zs', type=str, required=True, help="all_zs_ckpt*.h5 written by test.py --mode enc")
+    parser.add_argument('-o', '--outputs', type=str, required=True, help="output index folder")
+    parser.add_argument('--phases', type=str, nargs='+', default=["train", "validation", "test"])
+    parser.add_argument('--split_path', type=str, default=None, help="split file, for latents saved without ids")
+    parser.add_argument('--backend', type=str, default="ivf", choices=BACKENDS)
+    parser.add_argument('--n_lists', type=int, default=None, help="number of ivf lists, default sqrt(n)")
+    parser.add_argument('--n_probe', type=int, default=8, help="n_probe of the recall report")
+    args = parser.parse_args()
+
+    zs, ids = load_latents(args.zs, args.phases, args.split_path)
+    index = LatentIndex.build(zs, ids, args.backend, args.n_lists)
+    index.save(args.outputs)
+    print("indexed {} latents ({} backend) into {}".format(len(index), index.backend, args.outputs))
+    if index.backend != "flat":
+        print("recall@10 with n_probe={}: {:.3f}".format(args.n_probe, index.recall(10, args.n_probe)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import numpy as np
+from .curves import Line, Arc, Circle
+from .macro import *
+from .math_utils import angles_from_vectors_to_x
+
+
+# column layout of CurveArray.params
+START = slice(0, 2)  # start point (x, y)
+END = slice(2, 4)    # end point (x, y)
+CENTER = slice(4, 6) # center (x, y), arc and circle only
+RADIUS = 6           # radius, arc and circle only
+ANGLES = slice(7, 9) # counter-clockwise angle range (angle_s, angle_e), arc only
+N_CURVE_PARAMS = 9
+
+# axis-aligned extreme points of a circle, at angles 0, pi/2, pi, 3pi/2
+EXTREME_ANGLES = np.array([0, np.pi / 2, np.pi, np.pi / 2 * 3])
+EXTREME_DIRECTIONS = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+
+
+def arc_angles_counterclockwise(start_point, mid_point, end_point, center):
+    """vectorized Arc.get_angles_counterclockwise for (N, 2) arrays of arc points"""
+    angle_s = angles_from_vectors_to_x(start_point - center)
+    angle_m = angles_from_vectors_to_x(mid_point - center)
+    angle_e = angles_from_vectors_to_x(end_point - center)
+    angle_s, angle_e = np.minimum(angle_s, angle_e), np.maximum(angle_s, angle_e)
+    wrap = ~((angle_s < angle_m) & (angle_m < angle_e))
+    return np.stack([np.where(wrap, angle_e - np.pi * 2, angle_s),
+                     np.where(wrap, angle_s, angle_e)], axis=-1)
+
+
+class CurveArray(object):
+    """Struct-of-arrays representation of a collection of curves.
+
+    All curves of one or more sketch profiles (e.g. a whole CADSequence) are stored in flat numpy arrays:
+    a command type per curve (see macro.py) and a fixed-width parameter row (see the column layout above).
+    Curves are grouped into loops and loops into profiles by offset arrays, following the order of the
+    object representation, so that sampling and bounding box computation for all curves run as a few
+    vectorized operations instead of one python call per curve object.
+    """
+    def __init__(self, types, params, loop_offsets=None, profile_offsets=None):
+        """
+        Args:
+            types (np.array): (n_curves, ) command index of each curve
+            params (np.array): (n_curves, N_CURVE_PARAMS) curve parameters
+            loop_offsets (np.array): (n_loops + 1, ) index of the first curve of each loop.
+                Defaults to a single loop holding all curves.
+            profile_offsets (np.array): (n_profiles + 1, ) index of the first loop of each profile.
+                Defaults to a single profile holding all loops.
+        """
+        self.types = types
+        self.params = params
+        if loop_offsets is None:
+            loop_offsets = [0, len(types)]
+        self.loop_offsets = np.asarray(loop_offsets, dtype=np.int64)
+        if profile_offsets is None:
+            profile_offsets = [0, len(self.loop_offsets) - 1]
+        self.profile_offsets = np.asarray(profile_offsets, dtype=np.int64)
+
+    @staticmethod
+    def from_curves(curves, loop_offsets=None, profile_offsets=None):
+        """construct from a list of Line/Arc/Circle instances"""
+        n = len(curves)
+        types = np.empty(n, dtype=np.int64)
+        params = np.zeros((n, N_CURVE_PARAMS))
+        mid_points = np.zeros((n, 2))
+        for i, curve in enumerate(curves):
+            if isinstance(curve, Line):
+                types[i] = LINE_IDX
+                params[i, START] = curve.start_point
+                params[i, END] = curve.end_point
+            elif isinstance(curve, Arc):
+                types[i] = ARC_IDX
+                params[i, START] = curve.start_point
+                params[i, END] = curve.end_point
+                params[i, CENTER] = curve.center
+                params[i, RADIUS] = curve.radius
+                mid_points[i] = curve.mid_point
+            elif isinstance(curve, Circle):
+                types[i] = CIRCLE_IDX
+                params[i, START] = curve.start_point
+                params[i, END] = curve.end_point
+                params[i, CENTER] = curve.center
+                params[i, RADIUS] = curve.radius
+            else:
+                raise NotImplementedError("curve type not supported yet: {}".format(type(curve)))
+
+        is_arc = types == ARC_IDX
+        params[is_arc, ANGLES] = arc_angles_counterclockwise(params[is_arc, START], mid_points[is_arc],
+                                                             params[is_arc, END], params[is_arc, CENTER])
+        return CurveArray(types, params, loop_offsets, profile_offsets)
+
+    @staticmethod
+    def from_profiles(profiles):
+        """construct from a list of sketch profiles, keeping the loop/profile grouping"""
+        curves, loop_offsets, profile_offsets = [], [0], [0]
+        for profile in profiles:
+            for loop in profile.children:
+                curves.extend(loop.children)
+                loop_offsets.append(len(curves))
+            profile_offsets.append(len(loop_offsets) - 1)
+        return CurveArray.from_curves(curves, loop_offsets, profile_offsets)
+
+    @staticmethod
+    def from_sequence(cad_seq):
+        """construct from a CADSequence, one profile per extrude"""
+        return CurveArray.from_profiles([extrude_op.profile for extrude_op in cad_seq.seq])
+
+    @staticmethod
+    def concatenate(curve_arrays):
+        """merge several CurveArray (e.g. one per CAD model) into one, keeping all loops and profiles"""
+        loop_offsets, profile_offsets = [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+        n_curves, n_loops = 0, 0
+        for item in curve_arrays:
+            loop_offsets.append(item.loop_offsets[1:] + n_curves)
+            profile_offsets.append(item.profile_offsets[1:] + n_loops)
+            n_curves += len(item)
+            n_loops += item.n_loops
+        return CurveArray(np.concatenate([item.types for item in curve_arrays]),
+                          np.concatenate([item.params for item in curve_arrays], axis=0),
+                          np.concatenate(loop_offsets), np.concatenate(profile_offsets))
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def n_loops(self):
+        return len(self.loop_offsets) - 1
+
+    @property
+    def n_profiles(self):
+        return len(self.profile_offsets) - 1
+
+    @property
+    def loop_ids(self):
+        """(n_curves, ) index of the loop each curve belongs to"""
+        return np.repeat(np.arange(self.n_loops), np.diff(self.loop_offsets))
+
+    @property
+    def profile_ids(self):
+        """(n_curves, ) index of the profile each curve belongs to"""
+        loop_profile_ids = np.repeat(np.arange(self.n_profiles), np.diff(self.profile_offsets))
+        return loop_profile_ids[self.loop_ids]
+
+    def sample_points(self, n=32):
+        """uniformly sample points from every curve, same as calling curve.sample_points(n) on each curve
+
+        Returns:
+            np.array: (n_curves, n, 2)
+        """
+        points = np.empty((len(self), n, 2))
+        is_line = self.types == LINE_IDX
+        is_arc = self.types == ARC_IDX
+        is_circle = self.types == CIRCLE_IDX
+
+        params = self.params[is_line]
+        points[is_line] = np.linspace(params[:, START], params[:, END], num=n, axis=1)
+
+        params = self.params[is_arc]
+        angle_range = params[:, ANGLES]
+        angles = np.linspace(angle_range[:, 0], angle_range[:, 1], num=n, axis=1)
+        points[is_arc] = np.stack([np.cos(angles), np.sin(angles)], axis=-1) * \
+            params[:, RADIUS, np.newaxis, np.newaxis] + params[:, np.newaxis, CENTER]
+
+        params = self.params[is_circle]
+        angles = np.linspace(0, np.pi * 2, num=n, endpoint=False)
+        points[is_circle] = np.stack([np.cos(angles), np.sin(angles)], axis=1)[np.newaxis] * \
+            params[:, RADIUS, np.newaxis, np.newaxis] + params[:, np.newaxis, CENTER]
+        return points
+
+    @property
+    def bbox(self):
+        """bounding box of every curve, same as curve.bbox on each curve
+
+        Returns:
+            np.array: (n_curves, 2, 2), min/max points
+        """
+        start, end = self.params[:, START], self.params[:, END]
+        bbox_min, bbox_max = np.minimum(start, end), np.maximum(start, end)
+
+        radius = self.params[:, RADIUS, np.newaxis]
+        center = self.params[:, CENTER]
+        is_circle = self.types == CIRCLE_IDX
+        bbox_min[is_circle] = (center - radius)[is_circle]
+        bbox_max[is_circle] = (center + radius)[is_circle]
+
+        # an arc also reaches the extreme points of its circle that lie inside its angle range
+        angles = self.params[:, ANGLES]
+        angle_s, angle_e = angles[:, :1], angles[:, 1:]
+        alt_angles = EXTREME_ANGLES - np.pi * 2
+        inside = ((angle_s < EXTREME_ANGLES) & (EXTREME_ANGLES < angle_e)) | \
+                 ((angle_s < alt_angles) & (alt_angles < angle_e))
+        inside &= (self.types == ARC_IDX)[:, np.newaxis]
+        extremes = center[:, np.newaxis] + radius[:, np.newaxis] * EXTREME_DIRECTIONS # (n_curves, 4, 2)
+        bbox_min = np.minimum(bbox_min, np.where(inside[..., np.newaxis], extremes, np.inf).min(axis=1))
+        bbox_max = np.maximum(bbox_max, np.where(inside[..., np.newaxis], extremes, -np.inf).max(axis=1))
+        return np.stack([bbox_min, bbox_max], axis=1)
+
+    def _reduce_bbox(self, curve_offsets):
+        """bounding box over contiguous groups of curves. NOTE: every group must be non-empty."""
+        bbox = self.bbox
+        return np.stack([np.minimum.reduceat(bbox[:, 0], curve_offsets[:-1], axis=0),
+                         np.maximum.reduceat(bbox[:, 1], curve_offsets[:-1], axis=0)], axis=1)
+
+    @property
+    def profile_curve_offsets(self):
+        """(n_profiles + 1, ) index of the first curve of each profile"""
+        return self.loop_offsets[self.profile_offsets]
+
+    @property
+    def loop_bbox(self):
+        """(n_loops, 2, 2) bounding box of every loop, same as loop.bbox"""
+        return self._reduce_bbox(self.loop_offsets)
+
+    @property
+    def profile_bbox(self):
+        """(n_profiles, 2, 2) bounding box of every profile, same as profile.bbox"""
+        return self._reduce_bbox(self.profile_curve_offsets)
+
+    @property
+    def profile_bbox_size(self):
+        """(n_profiles, ) sketch size of every profile, same as profile.bbox_size"""
+        bbox = self.profile_bbox
+        start_point = self.params[self.profile_curve_offsets[:-1], START]
+        return np.max(np.abs(bbox - start_point[:, np.newaxis]), axis=(1, 2))
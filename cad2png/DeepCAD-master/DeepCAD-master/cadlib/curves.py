@@ -35,6 +35,8 @@ def construct_curve_from_vector(vec, start_point, is_numerical=True):
 #######################  base  #######################
 class CurveBase(object):
     """Base class for curve. All types of curves shall inherit from this."""
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -88,6 +90,8 @@ class CurveBase(object):
 
 ####################### curves #######################
 class Line(CurveBase):
+    __slots__ = ('start_point', 'end_point')
+
     def __init__(self, start_point, end_point):
         super(Line, self).__init__()
         self.start_point = start_point
@@ -136,8 +140,8 @@ class Line(CurveBase):
         self.start_point, self.end_point = self.end_point, self.start_point
 
     def numericalize(self, n=256):
-        self.start_point = self.start_point.round().clip(min=0, max=n-1).astype(np.int)
-        self.end_point = self.end_point.round().clip(min=0, max=n-1).astype(np.int)
+        self.start_point = self.start_point.round().clip(min=0, max=n-1).astype(np.int64)
+        self.end_point = self.end_point.round().clip(min=0, max=n-1).astype(np.int64)
 
     def to_vector(self):
         vec = [LINE_IDX, self.end_point[0], self.end_point[1]]
@@ -156,6 +160,9 @@ class Line(CurveBase):
 
 
 class Arc(CurveBase):
+    __slots__ = ('start_point', 'end_point', 'center', 'radius', 'normal',
+                 'start_angle', 'end_angle', 'ref_vec', 'mid_point')
+
     def __init__(self, start_point, end_point, center, radius,
                  normal=None, start_angle=None, end_angle=None, ref_vec=None):
         super(Arc, self).__init__()
@@ -293,13 +300,13 @@ class Arc(CurveBase):
         self.start_point, self.end_point = self.end_point, self.start_point
 
     def numericalize(self, n=256):
-        self.start_point = self.start_point.round().clip(min=0, max=n-1).astype(np.int)
-        self.mid_point = self.mid_point.round().clip(min=0, max=n-1).astype(np.int)
-        self.end_point = self.end_point.round().clip(min=0, max=n-1).astype(np.int)
-        self.center = self.center.round().clip(min=0, max=n-1).astype(np.int)
+        self.start_point = self.start_point.round().clip(min=0, max=n-1).astype(np.int64)
+        self.mid_point = self.mid_point.round().clip(min=0, max=n-1).astype(np.int64)
+        self.end_point = self.end_point.round().clip(min=0, max=n-1).astype(np.int64)
+        self.center = self.center.round().clip(min=0, max=n-1).astype(np.int64)
         tmp = np.array([self.start_angle, self.end_angle])
         self.start_angle, self.end_angle = (tmp / (2 * np.pi) * n).round().clip(
-                                            min=0, max=n-1).astype(np.int)
+                                            min=0, max=n-1).astype(np.int64)
 
     def to_vector(self):
         sweep_angle = max(abs(self.start_angle - self.end_angle), 1)
@@ -343,6 +350,8 @@ class Arc(CurveBase):
 
 
 class Circle(CurveBase):
+    __slots__ = ('center', 'radius', 'normal')
+
     def __init__(self, center, radius, normal=None):
         super(Circle, self).__init__()
         self.center = center
@@ -400,8 +409,8 @@ class Circle(CurveBase):
         pass
 
     def numericalize(self, n=256):
-        self.center = self.center.round().clip(min=0, max=n-1).astype(np.int)
-        self.radius = np.round(self.radius).clip(min=1, max=n-1).astype(np.int)
+        self.center = self.center.round().clip(min=0, max=n-1).astype(np.int64)
+        self.radius = np.round(self.radius).clip(min=1, max=n-1).astype(np.int64)
 
     def to_vector(self):
         vec = [CIRCLE_IDX, self.center[0], self.center[1], PAD_VAL, PAD_VAL, self.radius]
@@ -7,6 +7,8 @@ from .math_utils import cartesian2polar, polar2cartesian, polar_parameterization
 
 class CoordSystem(object):
     """Local coordinate system for sketch plane."""
+    __slots__ = ('origin', '_theta', '_phi', '_gamma', '_y_axis', 'is_numerical')
+
     def __init__(self, origin, theta, phi, gamma, y_axis=None, is_numerical=False):
         self.origin = origin
         self._theta = theta # 0~pi
@@ -58,10 +60,10 @@ class CoordSystem(object):
     def numericalize(self, n=256):
         """NOTE: shall only be called after normalization"""
         # assert np.max(self.origin) <= 1.0 and np.min(self.origin) >= -1.0 # TODO: origin can be out-of-bound!
-        self.origin = ((self.origin + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int)
+        self.origin = ((self.origin + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int64)
         tmp = np.array([self._theta, self._phi, self._gamma])
         self._theta, self._phi, self._gamma = ((tmp / np.pi + 1.0) / 2 * n).round().clip(
-            min=0, max=n-1).astype(np.int)
+            min=0, max=n-1).astype(np.int64)
         self.is_numerical = True
 
     def denumericalize(self, n=256):
@@ -77,6 +79,9 @@ class CoordSystem(object):
 class Extrude(object):
     """Single extrude operation with corresponding a sketch profile.
     NOTE: only support single sketch profile. Extrusion with multiple profiles is decomposed."""
+    __slots__ = ('profile', 'sketch_plane', 'operation', 'extent_type', 'extent_one', 'extent_two',
+                 'sketch_pos', 'sketch_size')
+
     def __init__(self, profile: Profile, sketch_plane: CoordSystem,
                  operation, extent_type, extent_one, extent_two, sketch_pos, sketch_size):
         """
@@ -187,13 +192,13 @@ class Extrude(object):
         assert -2.0 <= self.extent_one <= 2.0 and -2.0 <= self.extent_two <= 2.0
         self.profile.numericalize(n)
         self.sketch_plane.numericalize(n)
-        self.extent_one = ((self.extent_one + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int) 
-        self.extent_two = ((self.extent_two + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int) 
+        self.extent_one = ((self.extent_one + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int64) 
+        self.extent_two = ((self.extent_two + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int64) 
         self.operation = int(self.operation)
         self.extent_type = int(self.extent_type)
 
-        self.sketch_pos = ((self.sketch_pos + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int) 
-        self.sketch_size = (self.sketch_size / 2 * n).round().clip(min=0, max=n-1).astype(np.int) 
+        self.sketch_pos = ((self.sketch_pos + 1.0) / 2 * n).round().clip(min=0, max=n-1).astype(np.int64) 
+        self.sketch_size = (self.sketch_size / 2 * n).round().clip(min=0, max=n-1).astype(np.int64) 
 
     def denumericalize(self, n=256):
         """de-quantize the representation."""
@@ -228,6 +233,8 @@ class Extrude(object):
 
 class CADSequence(object):
     """A CAD modeling sequence, a series of extrude operations."""
+    __slots__ = ('seq', 'bbox')
+
     def __init__(self, extrude_seq, bbox=None):
         self.seq = extrude_seq
         self.bbox = bbox
@@ -304,7 +311,7 @@ class CADSequence(object):
             # random transform sketch
             scale = random.uniform(0.8, 1.2)
             item.profile.transform(-np.array([128, 128]), scale)
-            translate = np.array([random.randint(-5, 5), random.randint(-5, 5)], dtype=np.int) + 128
+            translate = np.array([random.randint(-5, 5), random.randint(-5, 5)], dtype=np.int64) + 128
             item.profile.transform(translate, 1)
 
             # random transform and scale extrusion
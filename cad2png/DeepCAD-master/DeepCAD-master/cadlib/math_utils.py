@@ -102,3 +102,8 @@ def polar_parameterization_inverse(theta, phi, gamma):
     ref_y = np.cross(normal_3d, ref_x)
     x_axis_3d = ref_x * np.cos(gamma) + ref_y * np.sin(gamma)
     return normal_3d, x_axis_3d
+
+
+def angles_from_vectors_to_x(vecs):
+    """vectorized angle_from_vector_to_x: angles (0~2pi) between vectors (..., 2) and positive x axis"""
+    return np.mod(np.arctan2(vecs[..., 1], vecs[..., 0]), 2.0 * np.pi)
@@ -0,0 +1,161 @@
+import numpy as np
+from .extrude import CADSequence
+from .macro import *
+
+
+def _check_numerical(vec):
+    if not np.array_equal(vec, np.round(vec)):
+        raise ValueError("packed CAD vectors must be quantized, call numericalize() first")
+
+
+class PackedCADSequence(object):
+    """Array-backed, compact view of a quantized CADSequence.
+
+    Holds only the (seq_len, 1 + N_ARGS) vector representation (see macro.py), typically a slice of
+    the shared buffer of a PackedCADSequences, and converts to/from CADSequence on demand.
+    """
+    __slots__ = ('vec',)
+
+    def __init__(self, vec):
+        self.vec = vec
+
+    @staticmethod
+    def from_vector(vec, dtype=np.int16):
+        """construct from the vector representation of a quantized CADSequence"""
+        vec = np.asarray(vec)
+        _check_numerical(vec)
+        return PackedCADSequence(vec.astype(dtype))
+
+    @staticmethod
+    def from_sequence(cad_seq, max_n_ext=MAX_N_EXT, max_n_loops=MAX_N_LOOPS, max_len_loop=MAX_N_CURVES,
+                      max_total_len=MAX_TOTAL_LEN, dtype=np.int16):
+        """construct from a quantized CADSequence. Returns None if it exceeds the length limits."""
+        vec = cad_seq.to_vector(max_n_ext, max_n_loops, max_len_loop, max_total_len, pad=False)
+        if vec is None:
+            return None
+        return PackedCADSequence.from_vector(vec, dtype)
+
+    def __len__(self):
+        return len(self.vec)
+
+    @property
+    def commands(self):
+        return self.vec[:, 0]
+
+    @property
+    def n_extrudes(self):
+        return int(np.count_nonzero(self.commands == EXT_IDX))
+
+    @property
+    def n_curves(self):
+        return int(np.count_nonzero(self.commands < EOS_IDX))
+
+    def to_vector(self, max_total_len=MAX_TOTAL_LEN, pad=False):
+        """same output as CADSequence.to_vector on the original (quantized) sequence"""
+        vec = self.vec.astype(np.int64)
+        if pad and vec.shape[0] < max_total_len:
+            pad_len = max_total_len - vec.shape[0]
+            vec = np.concatenate([vec, EOS_VEC[np.newaxis].repeat(pad_len, axis=0)], axis=0)
+        return vec
+
+    def unpack(self, is_numerical=True, n=256):
+        """rebuild the full CADSequence object (see CADSequence.from_vector)"""
+        return CADSequence.from_vector(self.to_vector(), is_numerical=is_numerical, n=n)
+
+
+class PackedCADSequences(object):
+    """A collection of quantized CAD sequences packed into one contiguous array.
+
+    All vectors are concatenated along the sequence axis into a single (total_len, 1 + N_ARGS) int16
+    buffer with an offset array, so a whole dataset costs a few bytes per command instead of a tree of
+    python objects per model. Indexing returns a PackedCADSequence whose vector is a view into the buffer.
+    """
+    def __init__(self, data, offsets, ids=None):
+        """
+        Args:
+            data (np.array): (total_len, 1 + N_ARGS) concatenated vectors
+            offsets (np.array): (n_seqs + 1, ) start row of each sequence in data
+            ids (list): optional data id of each sequence
+        """
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = list(ids) if ids is not None else None
+        self._id_index = None
+
+    @staticmethod
+    def from_vectors(vecs, ids=None, dtype=np.int16):
+        """pack a list of quantized CAD vectors"""
+        lengths = [len(vec) for vec in vecs]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        data = np.empty((offsets[-1], 1 + N_ARGS), dtype=dtype)
+        for vec, start, end in zip(vecs, offsets[:-1], offsets[1:]):
+            vec = np.asarray(vec)
+            _check_numerical(vec)
+            data[start:end] = vec
+        return PackedCADSequences(data, offsets, ids)
+
+    @staticmethod
+    def from_sequences(cad_seqs, ids=None, dtype=np.int16, **kwargs):
+        """pack a list of quantized CADSequence. Sequences exceeding the length limits are skipped."""
+        vecs, kept_ids = [], []
+        for i, cad_seq in enumerate(cad_seqs):
+            packed = PackedCADSequence.from_sequence(cad_seq, dtype=dtype, **kwargs)
+            if packed is None:
+                continue
+            vecs.append(packed.vec)
+            if ids is not None:
+                kept_ids.append(ids[i])
+        return PackedCADSequences.from_vectors(vecs, kept_ids if ids is not None else None, dtype)
+
+    @staticmethod
+    def load(path):
+        """load from a .npz file written by save"""
+        with np.load(path, allow_pickle=False) as fp:
+            ids = fp["ids"].tolist() if "ids" in fp.files else None
+            return PackedCADSequences(fp["data"], fp["offsets"], ids)
+
+    def save(self, path):
+        """save as an uncompressed .npz file"""
+        arrays = {"data": self.data, "offsets": self.offsets}
+        if self.ids is not None:
+            arrays["ids"] = np.array(self.ids)
+        np.savez(path, **arrays)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index {} out of range for {} sequences".format(index, len(self)))
+        return PackedCADSequence(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_by_id(self, data_id):
+        if self._id_index is None:
+            self._id_index = {data_id: i for i, data_id in enumerate(self.ids or [])}
+        return self[self._id_index[data_id]]
+
+    @property
+    def lengths(self):
+        """(n_seqs, ) number of commands of each sequence"""
+        return np.diff(self.offsets)
+
+    @property
+    def seq_ids(self):
+        """(total_len, ) index of the sequence each row of data belongs to"""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def command_counts(self):
+        """(n_seqs, len(ALL_COMMANDS)) number of each command type in every sequence"""
+        counts = np.zeros((len(self), len(ALL_COMMANDS)), dtype=np.int64)
+        np.add.at(counts, (self.seq_ids, self.data[:, 0].astype(np.int64)), 1)
+        return counts
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes
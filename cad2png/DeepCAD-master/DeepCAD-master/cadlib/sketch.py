@@ -9,6 +9,8 @@ from .macro import *
 ##########################   base  ###########################
 class SketchBase(object):
     """Base class for sketch (a collection of curves). """
+    __slots__ = ('children',)
+
     def __init__(self, children, reorder=True):
         self.children = children
 
@@ -117,6 +119,8 @@ class SketchBase(object):
 ####################### loop & profile #######################
 class Loop(SketchBase):
     """Sketch loop, a sequence of connected curves."""
+    __slots__ = ('is_outer',)
+
     @staticmethod
     def from_dict(stat):
         all_curves = [construct_curve_from_dict(item) for item in stat['profile_curves']]
@@ -211,6 +215,8 @@ class Loop(SketchBase):
 class Profile(SketchBase):
     """Sketch profile，a closed region formed by one or more loops. 
     The outer-most loop is placed at first."""
+    __slots__ = ()
+
     @staticmethod
     def from_dict(stat):
         all_loops = [Loop.from_dict(item) for item in stat['loops']]
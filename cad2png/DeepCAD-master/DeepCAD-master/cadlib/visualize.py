@@ -3,17 +3,18 @@ from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeEdge, BRepBuilderAPI_Mak
 from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakePrism
 from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse, BRepAlgoAPI_Common
 from OCC.Core.GC import GC_MakeArcOfCircle
-from OCC.Extend.DataExchange import write_stl_file
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods_Face
 from copy import copy
 from .extrude import *
 from .sketch import Loop, Profile
 from .curves import *
-import os
-import trimesh
-from trimesh.sample import sample_surface
-import random
 
 
 def vec2CADsolid(vec, is_numerical=True, n=256):
@@ -117,17 +118,72 @@ def point_local2global(point, sketch_plane: CoordSystem, to_gp_Pnt=True):
     return g_point
 
 
+def CADsolid2mesh(shape, linear_deflection=0.9, angular_deflection=0.5):
+    """tessellate opencascade solid in memory. Deflections are the same as write_stl_file defaults.
+
+    Returns:
+        vertices (np.array): (n_vertices, 3)
+        faces (np.array): (n_faces, 3) vertex indices of triangles
+    """
+    BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True).Perform()
+
+    all_vertices, all_faces = [], []
+    n_vertices = 0
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = topods_Face(explorer.Current())
+        explorer.Next()
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, location)
+        if triangulation is None:
+            continue
+        trsf = location.Transformation()
+        # OCC < 7.6 exposes node/triangle arrays, newer versions only indexed accessors
+        if hasattr(triangulation, "Nodes"):
+            nodes, triangles = triangulation.Nodes(), triangulation.Triangles()
+            get_node, get_triangle = nodes.Value, triangles.Value
+        else:
+            get_node, get_triangle = triangulation.Node, triangulation.Triangle
+        vertices = [get_node(i).Transformed(trsf).Coord() for i in range(1, triangulation.NbNodes() + 1)]
+        faces = [get_triangle(i).Get() for i in range(1, triangulation.NbTriangles() + 1)]
+        faces = np.array(faces, dtype=np.int64).reshape(-1, 3) - 1 + n_vertices
+        if face.Orientation() == TopAbs_REVERSED:
+            faces = faces[:, [0, 2, 1]]
+        all_vertices.append(np.array(vertices, dtype=np.float64).reshape(-1, 3))
+        all_faces.append(faces)
+        n_vertices += len(vertices)
+
+    if not all_faces:
+        raise ValueError("tessellation failed: no triangles")
+    return np.concatenate(all_vertices, axis=0), np.concatenate(all_faces, axis=0)
+
+
+def sample_mesh_surface(vertices, faces, n_points):
+    """uniformly sample points on a triangle mesh surface (area-weighted triangle choice)"""
+    triangles = vertices[faces] # (n_faces, 3, 3)
+    edges = triangles[:, 1:] - triangles[:, :1]
+    areas = np.linalg.norm(np.cross(edges[:, 0], edges[:, 1]), axis=1)
+    cum_areas = np.cumsum(areas)
+    if cum_areas[-1] <= 0:
+        raise ValueError("degenerated mesh: zero surface area")
+    face_idx = np.searchsorted(cum_areas, np.random.uniform(0, cum_areas[-1], size=n_points))
+    face_idx = np.minimum(face_idx, len(faces) - 1)
+
+    # uniform point in triangle: reflect samples of the unit square lying outside the triangle
+    uv = np.random.uniform(size=(n_points, 2))
+    outside = uv.sum(axis=1) > 1
+    uv[outside] = 1 - uv[outside]
+    edges = edges[face_idx]
+    return triangles[face_idx, 0] + uv[:, :1] * edges[:, 0] + uv[:, 1:] * edges[:, 1]
+
+
 def CADsolid2pc(shape, n_points, name=None):
-    """convert opencascade solid to point clouds"""
+    """convert opencascade solid to point clouds. Tessellated in memory, no temporary files.
+    name is kept for backward compatibility and not used."""
     bbox = Bnd_Box()
     brepbndlib_Add(shape, bbox)
     if bbox.IsVoid():
         raise ValueError("box check failed")
 
-    if name is None:
-        name = random.randint(100000, 999999)
-    write_stl_file(shape, "tmp_out_{}.stl".format(name))
-    out_mesh = trimesh.load("tmp_out_{}.stl".format(name))
-    os.system("rm tmp_out_{}.stl".format(name))
-    out_pc, _ = sample_surface(out_mesh, n_points)
-    return out_pc
+    vertices, faces = CADsolid2mesh(shape)
+    return sample_mesh_surface(vertices, faces, n_points)
@@ -79,19 +79,37 @@ class ConfigAE(object):
         parser.add_argument('--proj_dir', type=str, default="proj_log", help="path to project folder where models and logs will be saved")
         parser.add_argument('--data_root', type=str, default="data", help="path to source data folder")
         parser.add_argument('--exp_name', type=str, default=os.getcwd().split('/')[-1], help="name of this experiment")
-        parser.add_argument('-g', '--gpu_ids', type=str, default='0', help="gpu to use, e.g. 0  0,1,2. CPU not supported.")
+        parser.add_argument('-g', '--gpu_ids', type=str, default='0', help="gpu to use, e.g. 0  0,1,2")
+        parser.add_argument('--device', type=str, default=None, choices=["cuda", "cpu"],
+                            help="device to run on, default cuda if available")
+        parser.add_argument('--num_threads', type=int, default=None, help="number of CPU threads, default all cores")
 
         parser.add_argument('--batch_size', type=int, default=512, help="batch size")
         parser.add_argument('--num_workers', type=int, default=8, help="number of workers for data loading")
+        parser.add_argument('--data_format', type=str, default="h5", choices=["h5", "packed"],
+                            help="h5: one cad_vec/<id>.h5 file per model; packed: sharded files from dataset/pack_vec.py")
+        parser.add_argument('--pin_memory', type=int, default=None, choices=[0, 1],
+                            help="load batches into pinned memory for asynchronous copies to GPU, default on with cuda")
+        parser.add_argument('--persistent_workers', action='store_true',
+                            help="keep data loading workers alive across epochs (torch >= 1.7)")
+        parser.add_argument('--prefetch_factor', type=int, default=None,
+                            help="batches loaded in advance by each worker, default 2 (torch >= 1.7)")
 
         parser.add_argument('--nr_epochs', type=int, default=1000, help="total number of epochs to train")
         parser.add_argument('--lr', type=float, default=1e-3, help="initial learning rate")
         parser.add_argument('--grad_clip', type=float, default=1.0, help="initial learning rate")
         parser.add_argument('--warmup_step', type=int, default=2000, help="step size for learning rate warm up")
+        parser.add_argument('--amp', type=str, default=None, choices=["fp16", "bf16"],
+                            help="train with automatic mixed precision, fp16 losses are scaled by a GradScaler")
+        parser.add_argument('--accum_steps', type=int, default=1,
+                            help="accumulate gradients over x batches before each optimizer step, "
+                                 "the effective batch size is batch_size * accum_steps")
         parser.add_argument('--continue', dest='cont',  action='store_true', help="continue training from checkpoint")
         parser.add_argument('--ckpt', type=str, default='latest', required=False, help="desired checkpoint to restore")
         parser.add_argument('--vis', action='store_true', default=False, help="visualize output in training")
         parser.add_argument('--save_frequency', type=int, default=500, help="save models every x epochs")
+        parser.add_argument('--keep_ckpts', type=int, default=None,
+                            help="keep only the last x periodic checkpoints (latest.pth is always kept), default all")
         parser.add_argument('--val_frequency', type=int, default=10, help="run validation every x iterations")
         parser.add_argument('--vis_frequency', type=int, default=2000, help="visualize output every x iterations")
         parser.add_argument('--augment', action='store_true', help="use random data augmentation")
@@ -100,6 +118,12 @@ class ConfigAE(object):
             parser.add_argument('-m', '--mode', type=str, choices=['rec', 'enc', 'dec'])
             parser.add_argument('-o', '--outputs', type=str, default=None)
             parser.add_argument('--z_path', type=str, default=None)
+            parser.add_argument('--precision', type=str, default="fp32", choices=["fp32", "int8", "bf16"],
+                                help="inference precision, int8: dynamic quantization (CPU only), bf16: autocast")
         
         args = parser.parse_args()
+        if args.keep_ckpts is not None and args.keep_ckpts < 1:
+            parser.error("--keep_ckpts must be at least 1")
+        if args.accum_steps < 1:
+            parser.error("--accum_steps must be at least 1")
         return parser, args
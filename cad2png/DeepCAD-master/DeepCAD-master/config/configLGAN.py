@@ -63,14 +63,24 @@ class ConfigLGAN(object):
         parser.add_argument('--test', action='store_true', help="test mode")
         parser.add_argument('--n_samples', type=int, default=100, help="number of samples to generate when testing")
         parser.add_argument('-g', '--gpu_ids', type=str, default="0",
-                            help="gpu to use, e.g. 0  0,1,2. CPU not supported.")
+                            help="gpu to use, e.g. 0  0,1,2")
+        parser.add_argument('--device', type=str, default=None, choices=["cuda", "cpu"],
+                            help="device to run on, default cuda if available")
 
         parser.add_argument('--batch_size', type=int, default=256, help="batch size")
         parser.add_argument('--num_workers', type=int, default=8, help="number of workers for data loading")
+        parser.add_argument('--in_memory', action='store_true',
+                            help="keep all latents on the device and train with the fused critic step")
+        parser.add_argument('--log_frequency', type=int, default=10,
+                            help="log iterations/sec (and losses, with --in_memory) every x iterations")
 
         parser.add_argument('--n_iters', type=int, default=200000, help="total number of iterations to train")
         parser.add_argument('--save_frequency', type=int, default=100000, help="save models every x iterations")
+        parser.add_argument('--keep_ckpts', type=int, default=None,
+                            help="keep only the last x periodic checkpoints (latest.pth is always kept), default all")
         parser.add_argument('--lr', type=float, default=2e-4, help="initial learning rate")
 
         args = parser.parse_args()
+        if args.keep_ckpts is not None and args.keep_ckpts < 1:
+            parser.error("--keep_ckpts must be at least 1")
         return parser, args
@@ -3,16 +3,19 @@ import torch
 import os
 import json
 import h5py
-import random
+import numpy as np
 from cadlib.macro import *
+from dataset.pack_vec import PACKED_DIR, INDEX_NAME, SHARD_NAME
+from dataset.loader_utils import loader_kwargs
 
 
 def get_dataloader(phase, config, shuffle=None):
     is_shuffle = phase == 'train' if shuffle is None else shuffle
 
     dataset = CADDataset(phase, config)
-    dataloader = DataLoader(dataset, batch_size=config.batch_size, shuffle=is_shuffle, num_workers=config.num_workers,
-                            worker_init_fn=np.random.seed())
+    collate_fn = CADCollator(config.max_total_len, augment=config.augment and phase == 'train')
+    dataloader = DataLoader(dataset, batch_size=config.batch_size, shuffle=is_shuffle, collate_fn=collate_fn,
+                            **loader_kwargs(config))
     return dataloader
 
 
@@ -26,6 +29,19 @@ class CADDataset(Dataset):
         with open(self.path, "r") as fp:
             self.all_data = json.load(fp)[phase]
 
+        # packed mode: read vectors from sharded files written by dataset/pack_vec.py
+        self.packed = config.data_format == "packed"
+        if self.packed:
+            packed_dir = os.path.join(config.data_root, PACKED_DIR)
+            with np.load(os.path.join(packed_dir, INDEX_NAME.format(phase))) as fp:
+                self.all_data = fp["ids"].tolist()
+                self.shard_idx = fp["shard"]
+                self.starts = fp["start"]
+                self.lengths = fp["length"]
+                n_shards = int(fp["n_shards"])
+            self.shard_paths = [os.path.join(packed_dir, SHARD_NAME.format(phase, i)) for i in range(n_shards)]
+            self._shards = None # memory-mapped lazily, once per worker process
+
         self.max_n_loops = config.max_n_loops          # Number of paths (N_P)
         self.max_n_curves = config.max_n_curves            # Number of commands (N_C)
         self.max_total_len = config.max_total_len
@@ -33,52 +49,118 @@ class CADDataset(Dataset):
 
     def get_data_by_id(self, data_id):
         idx = self.all_data.index(data_id)
-        return self.__getitem__(idx)
+        batch = CADCollator(self.max_total_len)([self.__getitem__(idx)])
+        return {"command": batch["command"][0], "args": batch["args"][0], "id": data_id}
 
-    def __getitem__(self, index):
-        data_id = self.all_data[index]
-        h5_path = os.path.join(self.raw_data, data_id + ".h5")
+    def load_vec(self, index):
+        """load the vector representation (len, 1 + N_ARGS) of the index-th model"""
+        if self.packed:
+            if self._shards is None:
+                self._shards = [np.load(path, mmap_mode="r") for path in self.shard_paths]
+            start = self.starts[index]
+            shard = self._shards[self.shard_idx[index]]
+            return shard[start:start + self.lengths[index]].astype(np.int64)
+
+        h5_path = os.path.join(self.raw_data, self.all_data[index] + ".h5")
         with h5py.File(h5_path, "r") as fp:
-            cad_vec = fp["vec"][:] # (len, 1 + N_ARGS)
-
-        if self.aug and self.phase == "train":
-            command1 = cad_vec[:, 0]
-            ext_indices1 = np.where(command1 == EXT_IDX)[0]
-            # if len(ext_indices1) > 1 and random.randint(0, 1) == 1:
-            if len(ext_indices1) > 1 and random.uniform(0, 1) > 0.5:
-                ext_vec1 = np.split(cad_vec, ext_indices1 + 1, axis=0)[:-1]
-        
-                data_id2 = self.all_data[random.randint(0, len(self.all_data) - 1)]
-                h5_path2 = os.path.join(self.raw_data, data_id2 + ".h5")
-                with h5py.File(h5_path2, "r") as fp:
-                    cad_vec2 = fp["vec"][:]
-                command2 = cad_vec2[:, 0]
-                ext_indices2 = np.where(command2 == EXT_IDX)[0]
-                ext_vec2 = np.split(cad_vec2, ext_indices2 + 1, axis=0)[:-1]
-        
-                n_replace = random.randint(1, min(len(ext_vec1) - 1, len(ext_vec2)))
-                old_idx = sorted(random.sample(list(range(len(ext_vec1))), n_replace))
-                new_idx = sorted(random.sample(list(range(len(ext_vec2))), n_replace))
-                for i in range(len(old_idx)):
-                    ext_vec1[old_idx[i]] = ext_vec2[new_idx[i]]
-        
-                sum_len = 0
-                new_vec = []
-                for i in range(len(ext_vec1)):
-                    sum_len += len(ext_vec1[i])
-                    if sum_len > self.max_total_len:
-                        break
-                    new_vec.append(ext_vec1[i])
-                cad_vec = np.concatenate(new_vec, axis=0)
-
-        pad_len = self.max_total_len - cad_vec.shape[0]
-        cad_vec = np.concatenate([cad_vec, EOS_VEC[np.newaxis].repeat(pad_len, axis=0)], axis=0)
-
-        command = cad_vec[:, 0]
-        args = cad_vec[:, 1:]
-        command = torch.tensor(command, dtype=torch.long)
-        args = torch.tensor(args, dtype=torch.long)
-        return {"command": command, "args": args, "id": data_id}
+            return fp["vec"][:]
+
+    def __getitem__(self, index):
+        """raw (unpadded) vector, padded and augmented batch-wise by CADCollator"""
+        return {"vec": self.load_vec(index), "id": self.all_data[index]}
 
     def __len__(self):
         return len(self.all_data)
+
+
+class CADCollator(object):
+    """collate_fn for CADDataset: augments and pads a whole batch of raw vectors with numpy.
+
+    Each sample is described by its extrude segments ([SOL, ..., Ext] rows) as start/end offsets into the
+    concatenated batch. Augmentation replaces a random subset of a sample's segments with the same number of
+    segments from another sample of the batch (keeping their order) and drops the segments that overflow
+    max_total_len. All selected rows are then gathered into a preallocated EOS-filled batch buffer at once.
+    """
+    def __init__(self, max_total_len, augment=False):
+        self.max_total_len = max_total_len
+        self.augment = augment
+
+    def __call__(self, items):
+        vecs = [item["vec"] for item in items]
+        lengths = np.array([len(vec) for vec in vecs])
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        flat = np.concatenate(vecs, axis=0)
+        n = len(vecs)
+
+        # by default every sample is copied as a whole (one segment, including its trailing EOS)
+        seg_start = offsets[:-1, np.newaxis]
+        seg_len = np.minimum(lengths, self.max_total_len)[:, np.newaxis]
+        if self.augment:
+            seg_start, seg_len = self.augment_segments(flat, offsets, seg_start, seg_len)
+
+        # gather all kept rows into the padded batch buffer in one fancy-indexing step
+        dst_start = np.cumsum(seg_len, axis=1) - seg_len
+        seg_len, seg_start, dst_start = seg_len.ravel(), seg_start.ravel(), dst_start.ravel()
+        batch_idx = np.repeat(np.arange(n), seg_len.reshape(n, -1).sum(axis=1))
+        inner = np.arange(seg_len.sum()) - np.repeat(np.cumsum(seg_len) - seg_len, seg_len)
+        src_rows = np.repeat(seg_start, seg_len) + inner
+        dst_rows = np.repeat(dst_start, seg_len) + inner
+
+        batch = np.empty((n, self.max_total_len, 1 + N_ARGS), dtype=np.int64)
+        batch[:] = EOS_VEC
+        batch[batch_idx, dst_rows] = flat[src_rows]
+        return {"command": torch.from_numpy(np.ascontiguousarray(batch[:, :, 0])),
+                "args": torch.from_numpy(np.ascontiguousarray(batch[:, :, 1:])),
+                "id": [item["id"] for item in items]}
+
+    def augment_segments(self, flat, offsets, seg_start, seg_len):
+        """randomly replace extrude segments with segments from another sample in the batch"""
+        n = len(offsets) - 1
+        ext_rows = np.where(flat[:, 0] == EXT_IDX)[0]
+        owner = np.searchsorted(offsets, ext_rows, side='right') - 1
+        n_ext = np.bincount(owner, minlength=n)
+        max_n_ext = max(n_ext.max(), 1)
+
+        # (n, max_n_ext) tables of segment [start, end) rows, a segment ends with its Ext command
+        rank = np.arange(len(ext_rows)) - np.repeat(np.cumsum(n_ext) - n_ext, n_ext)
+        ends = np.zeros((n, max_n_ext), dtype=np.int64)
+        ends[owner, rank] = ext_rows + 1
+        starts = np.zeros((n, max_n_ext), dtype=np.int64)
+        starts[:, 0] = offsets[:-1]
+        starts[:, 1:] = ends[:, :-1]
+        valid = np.arange(max_n_ext) < n_ext[:, np.newaxis]
+
+        do_aug = (n_ext > 1) & (np.random.uniform(size=n) > 0.5)
+        if not do_aug.any():
+            return seg_start, seg_len
+        partner = np.random.randint(0, n, size=n)
+        high = np.minimum(n_ext - 1, n_ext[partner])
+        do_aug &= high >= 1
+        n_replace = np.random.randint(1, np.maximum(high, 1) + 1)
+
+        def choose(n_valid):
+            # random subset of n_replace segments per row, as a mask over the sorted segment positions
+            keys = np.where(np.arange(max_n_ext) < n_valid[:, np.newaxis], np.random.uniform(size=(n, max_n_ext)), 2.0)
+            order = np.argsort(np.argsort(keys, axis=1), axis=1)
+            return order < n_replace[:, np.newaxis]
+
+        old_mask = choose(n_ext)
+        new_mask = choose(n_ext[partner])
+        # i-th replaced position takes the i-th chosen segment of the partner
+        new_sorted = np.sort(np.where(new_mask, np.arange(max_n_ext), max_n_ext), axis=1)
+        src = np.take_along_axis(new_sorted, np.maximum(np.cumsum(old_mask, axis=1) - 1, 0), axis=1)
+        src = np.minimum(src, max_n_ext - 1)
+        aug_start = np.where(old_mask, np.take_along_axis(starts[partner], src, axis=1), starts)
+        aug_end = np.where(old_mask, np.take_along_axis(ends[partner], src, axis=1), ends)
+        aug_len = np.where(valid, aug_end - aug_start, 0)
+        aug_len[np.cumsum(aug_len, axis=1) > self.max_total_len] = 0
+
+        width = max(seg_start.shape[1], max_n_ext)
+        out_start = np.zeros((n, width), dtype=np.int64)
+        out_len = np.zeros((n, width), dtype=np.int64)
+        out_start[:, :seg_start.shape[1]] = seg_start
+        out_len[:, :seg_len.shape[1]] = seg_len
+        out_start[do_aug, :max_n_ext] = aug_start[do_aug]
+        out_len[do_aug, :max_n_ext] = aug_len[do_aug]
+        out_len[do_aug, max_n_ext:] = 0
+        return out_start, out_len
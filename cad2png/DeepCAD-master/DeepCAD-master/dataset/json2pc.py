@@ -5,7 +5,6 @@ import numpy as np
 import random
 import h5py
 from joblib import Parallel, delayed
-from trimesh.sample import sample_surface
 import argparse
 import sys
 sys.path.append("..")
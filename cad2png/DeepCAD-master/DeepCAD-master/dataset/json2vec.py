@@ -1,5 +1,12 @@
+"""convert cad_json/<id>.json into the vector representation cad_vec/<id>.h5.
+
+Resumable: a manifest records the input hash, status and vector length of every processed id, so re-runs
+only process new or changed inputs. Rejected ids ("failed" / "exceed") are written to a failures file.
+"""
 import os
 import json
+import hashlib
+import argparse
 import numpy as np
 import h5py
 from joblib import Parallel, delayed
@@ -9,46 +16,140 @@ from cadlib.extrude import CADSequence
 from cadlib.macro import *
 
 DATA_ROOT = "../data"
-RAW_DATA = os.path.join(DATA_ROOT, "cad_json")
-RECORD_FILE = os.path.join(DATA_ROOT, "train_val_test_split.json")
+MANIFEST_NAME = "json2vec_manifest.json"
+FAILURES_NAME = "json2vec_failures.json"
+PIPELINE_VERSION = 1 # bump when the conversion changes, to invalidate all manifest entries
+
+
+def file_hash(path):
+    with open(path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as fp:
+            manifest = json.load(fp)
+    except ValueError:
+        print("corrupted manifest, start from scratch:", path)
+        return {}
+    if manifest.get("version") != PIPELINE_VERSION:
+        return {}
+    return manifest["entries"]
+
+
+def save_json(obj, path):
+    """atomic write (temporary file + rename), so an interrupted run never leaves a broken file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(obj, fp, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
 
-SAVE_DIR = os.path.join(DATA_ROOT, "cad_vec")
-print(SAVE_DIR)
-if not os.path.exists(SAVE_DIR):
-    os.makedirs(SAVE_DIR)
 
+def is_up_to_date(entry, input_hash, save_path, retry_failed):
+    if entry is None or entry["input_hash"] != input_hash:
+        return False
+    if entry["status"] == "ok":
+        return os.path.exists(save_path)
+    return not retry_failed
 
-def process_one(data_id):
-    json_path = os.path.join(RAW_DATA, data_id + ".json")
-    with open(json_path, "r") as fp:
-        data = json.load(fp)
 
+def process_one(data_id, raw_dir, save_dir, input_hash):
+    """convert one json file. Returns its manifest entry."""
+    json_path = os.path.join(raw_dir, data_id + ".json")
+    save_path = os.path.join(save_dir, data_id + ".h5")
+    record = {"input_hash": input_hash, "status": "failed", "length": None, "error": None}
     try:
+        with open(json_path, "r") as fp:
+            data = json.load(fp)
         cad_seq = CADSequence.from_dict(data)
         cad_seq.normalize()
         cad_seq.numericalize()
         cad_vec = cad_seq.to_vector(MAX_N_EXT, MAX_N_LOOPS, MAX_N_CURVES, MAX_TOTAL_LEN, pad=False)
-
     except Exception as e:
-        print("failed:", data_id)
-        return
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+        return record
 
-    if MAX_TOTAL_LEN < cad_vec.shape[0] or cad_vec is None:
-        print("exceed length condition:", data_id, cad_vec.shape[0])
-        return
+    if cad_vec is None or MAX_TOTAL_LEN < cad_vec.shape[0]:
+        record["status"] = "exceed"
+        record["length"] = None if cad_vec is None else int(cad_vec.shape[0])
+        return record
 
-    save_path = os.path.join(SAVE_DIR, data_id + ".h5")
     truck_dir = os.path.dirname(save_path)
     if not os.path.exists(truck_dir):
         os.makedirs(truck_dir)
 
-    with h5py.File(save_path, 'w') as fp:
-        fp.create_dataset("vec", data=cad_vec, dtype=np.int)
+    tmp_path = save_path + ".tmp"
+    with h5py.File(tmp_path, 'w') as fp:
+        fp.create_dataset("vec", data=cad_vec, dtype=np.int64)
+    os.replace(tmp_path, save_path)
+    record["status"] = "ok"
+    record["length"] = int(cad_vec.shape[0])
+    return record
+
+
+def process_chunk(data_ids, raw_dir, save_dir, entries, retry_failed):
+    """process a chunk of ids in one job, to amortize the dispatching overhead.
+    Returns the new manifest entries of the ids that were not up-to-date."""
+    results = []
+    for data_id, entry in zip(data_ids, entries):
+        try:
+            input_hash = file_hash(os.path.join(raw_dir, data_id + ".json"))
+        except OSError as e:
+            results.append((data_id, {"input_hash": None, "status": "failed", "length": None,
+                                      "error": "{}: {}".format(type(e).__name__, e)}))
+            continue
+        save_path = os.path.join(save_dir, data_id + ".h5")
+        if not is_up_to_date(entry, input_hash, save_path, retry_failed):
+            record = process_one(data_id, raw_dir, save_dir, input_hash)
+            if record["status"] != "ok" and os.path.exists(save_path):
+                os.remove(save_path) # stale output of a previous version of this input
+            results.append((data_id, record))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_root', type=str, default=DATA_ROOT, help="path to source data folder")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--chunk_size', type=int, default=64, help="number of ids per job")
+    parser.add_argument('--save_every', type=int, default=64, help="save manifest every x chunks")
+    parser.add_argument('--phases', type=str, nargs='+', default=["train", "validation", "test"])
+    parser.add_argument('--retry_failed', action='store_true', help="reprocess previously rejected ids")
+    parser.add_argument('--force', action='store_true', help="ignore the manifest and reprocess everything")
+    args = parser.parse_args()
+
+    raw_dir = os.path.join(args.data_root, "cad_json")
+    save_dir = os.path.join(args.data_root, "cad_vec")
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    manifest_path = os.path.join(save_dir, MANIFEST_NAME)
+    entries = {} if args.force else load_manifest(manifest_path)
+
+    with open(os.path.join(args.data_root, "train_val_test_split.json"), "r") as fp:
+        all_data = json.load(fp)
+    data_ids = [data_id for phase in args.phases for data_id in all_data[phase]]
+
+    chunks = [data_ids[i:i + args.chunk_size] for i in range(0, len(data_ids), args.chunk_size)]
+    n_processed = 0
+    with Parallel(n_jobs=args.workers, verbose=2) as parallel:
+        for i in range(0, len(chunks), args.save_every):
+            results = parallel(delayed(process_chunk)(chunk, raw_dir, save_dir,
+                                                      [entries.get(data_id) for data_id in chunk], args.retry_failed)
+                               for chunk in chunks[i:i + args.save_every])
+            for data_id, record in (item for chunk_results in results for item in chunk_results):
+                entries[data_id] = record
+                n_processed += 1
+            save_json({"version": PIPELINE_VERSION, "entries": entries}, manifest_path)
 
+    failures = [dict(id=data_id, **entries[data_id]) for data_id in data_ids if entries[data_id]["status"] != "ok"]
+    save_json(failures, os.path.join(save_dir, FAILURES_NAME))
+    n_ok = sum(entries[data_id]["status"] == "ok" for data_id in data_ids)
+    print("{} ids: {} ok, {} rejected, {} (re)processed. failures: {}".format(
+        len(data_ids), n_ok, len(failures), n_processed, os.path.join(save_dir, FAILURES_NAME)))
 
-with open(RECORD_FILE, "r") as fp:
-    all_data = json.load(fp)
 
-Parallel(n_jobs=10, verbose=2)(delayed(process_one)(x) for x in all_data["train"])
-Parallel(n_jobs=10, verbose=2)(delayed(process_one)(x) for x in all_data["validation"])
-Parallel(n_jobs=10, verbose=2)(delayed(process_one)(x) for x in all_data["test"])
+if __name__ == '__main__':
+    main()
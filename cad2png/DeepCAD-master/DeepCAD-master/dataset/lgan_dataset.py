@@ -1,13 +1,12 @@
 import torch
 from torch.utils.data import Dataset, DataLoader
-import numpy as np
 import h5py
+from dataset.loader_utils import loader_kwargs
 
 
 def get_dataloader(cfg):
     dataset = LGANDataset(cfg.data_root)
-    dataloader = DataLoader(dataset, batch_size=cfg.batch_size, shuffle=True,
-                              num_workers=cfg.num_workers, worker_init_fn=np.random.seed(), drop_last=True)
+    dataloader = DataLoader(dataset, batch_size=cfg.batch_size, shuffle=True, drop_last=True, **loader_kwargs(cfg))
     return dataloader
 
 
@@ -24,3 +23,39 @@ class LGANDataset(Dataset):
 
     def __len__(self):
         return len(self.data)
+
+
+class LatentSampler(object):
+    """All training latents resident on the device, batches drawn by on-device shuffling.
+
+    Same sampling as get_dataloader: every epoch is a random permutation of the latents, split into batches
+    with the last incomplete one dropped. Replaces the DataLoader and the host to device copy of every batch.
+    """
+    def __init__(self, data_root, batch_size, device):
+        with h5py.File(data_root, 'r') as fp:
+            data = fp["train_zs"][:]
+        if len(data) < batch_size:
+            raise ValueError("{} training latents, fewer than the batch size {}".format(len(data), batch_size))
+        self.latents = torch.tensor(data, dtype=torch.float32, device=device)
+        self.batch_size = batch_size
+        self.device = device
+        self.n_batches = len(data) // batch_size # per epoch
+        self._order = None
+        self._next = self.n_batches
+
+    def sample(self, n_batches=1):
+        """(n_batches, batch_size, z_dim) next batches of the epoch, starting new epochs as needed"""
+        batches = []
+        while n_batches > 0:
+            if self._next == self.n_batches:
+                order = torch.randperm(len(self.latents), device=self.device)
+                self._order = order[:self.n_batches * self.batch_size].view(self.n_batches, self.batch_size)
+                self._next = 0
+            n = min(n_batches, self.n_batches - self._next)
+            batches.append(self._order[self._next:self._next + n])
+            self._next += n
+            n_batches -= n
+        return self.latents[torch.cat(batches, dim=0)]
+
+    def __len__(self):
+        return len(self.latents)
@@ -0,0 +1,88 @@
+import random
+import inspect
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+
+def seed_worker(worker_id):
+    """worker_init_fn: seed numpy and random of each data loading worker from its torch seed.
+
+    torch gives every worker a different seed (base seed + worker id), and draws a new base seed every time the
+    workers are started, so augmentations differ across workers and epochs."""
+    seed = torch.initial_seed() % 2 ** 32
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+def loader_kwargs(cfg):
+    """DataLoader keyword arguments of the data pipeline options in cfg (num_workers, pin_memory,
+    persistent_workers, prefetch_factor). Options missing from cfg take the DataLoader defaults, options the
+    installed torch does not support (persistent_workers and prefetch_factor need torch >= 1.7) are skipped."""
+    num_workers = getattr(cfg, "num_workers", 0)
+    pin_memory = getattr(cfg, "pin_memory", None)
+    if pin_memory is None:
+        # pinned host memory only helps host to device copies
+        device = getattr(cfg, "device", None)
+        pin_memory = torch.cuda.is_available() and device != "cpu"
+    kwargs = {"num_workers": num_workers, "pin_memory": bool(pin_memory), "worker_init_fn": seed_worker}
+
+    supported = inspect.signature(DataLoader.__init__).parameters
+    if num_workers > 0:
+        if getattr(cfg, "persistent_workers", False) and "persistent_workers" in supported:
+            kwargs["persistent_workers"] = True
+        if getattr(cfg, "prefetch_factor", None) is not None and "prefetch_factor" in supported:
+            kwargs["prefetch_factor"] = cfg.prefetch_factor
+    return kwargs
+
+
+class DevicePrefetcher(object):
+    """Iterate over a DataLoader with its batches already on the device.
+
+    On cuda the non-blocking copy of the next batch is issued on a side stream before the current batch is
+    yielded, so it runs while the current batch computes. Use with pin_memory, otherwise the copies are
+    synchronous. On CPU batches are yielded as they come."""
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.stream = torch.cuda.Stream(self.device) if self.device.type == "cuda" else None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _to_device(self, obj):
+        if isinstance(obj, torch.Tensor):
+            return obj.to(self.device, non_blocking=True)
+        if isinstance(obj, dict):
+            return type(obj)((k, self._to_device(v)) for k, v in obj.items())
+        return obj
+
+    def _record_stream(self, obj):
+        """mark obj's tensors as used on the current stream, so their memory, allocated on the side stream,
+        is not reused while the current stream still reads them"""
+        if isinstance(obj, torch.Tensor):
+            obj.record_stream(torch.cuda.current_stream(self.device))
+        elif isinstance(obj, dict):
+            for v in obj.values():
+                self._record_stream(v)
+
+    def _preload(self, it):
+        try:
+            batch = next(it)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(self.stream):
+            return self._to_device(batch)
+
+    def __iter__(self):
+        if self.stream is None:
+            yield from self.loader
+            return
+        it = iter(self.loader)
+        batch = self._preload(it)
+        while batch is not None:
+            torch.cuda.current_stream(self.device).wait_stream(self.stream)
+            self._record_stream(batch)
+            next_batch = self._preload(it)
+            yield batch
+            batch = next_batch
@@ -0,0 +1,36 @@
+"""pack the ground truth point clouds pc_cad/<id>.ply (see json2pc.py) into one memory-mapped store.
+
+Evaluation scripts and pc2cad read the store with --pc_store instead of parsing one .ply file per sample.
+"""
+import os
+import json
+import argparse
+import numpy as np
+import sys
+sys.path.append("..")
+from utils.pc_store import build_pc_store
+
+PC_STORE_DIR = "pc_cad_packed"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_root', type=str, default="../data", help="path to source data folder")
+    parser.add_argument('--n_points', type=int, default=8096, help="number of points stored per model")
+    parser.add_argument('--dtype', type=str, default="float32", choices=["float16", "float32"])
+    parser.add_argument('--phases', type=str, nargs='+', default=["train", "validation", "test"])
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data_root, "train_val_test_split.json"), "r") as fp:
+        all_data = json.load(fp)
+    data_ids = [data_id for phase in args.phases for data_id in all_data[phase]]
+
+    save_dir = os.path.join(args.data_root, PC_STORE_DIR)
+    skipped = build_pc_store(os.path.join(args.data_root, "pc_cad"), data_ids, save_dir, args.n_points,
+                             dtype=np.dtype(args.dtype))
+    print("packed {} point clouds into {}, skipped {} (missing or too few points)".format(
+        len(data_ids) - len(skipped), save_dir, len(skipped)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""pack the per-model cad_vec/<id>.h5 files into a few sharded, memory-mappable files.
+
+For each phase in train_val_test_split.json, all vectors are concatenated into ragged (total_len, 1 + N_ARGS)
+int16 arrays, one .npy file per shard, plus an index (data ids, shard, start, length) in <phase>_index.npz.
+CADDataset reads them with --data_format packed, memory-mapping each shard once per worker.
+"""
+import os
+import json
+import argparse
+import numpy as np
+import h5py
+import sys
+sys.path.append("..")
+from cadlib.packed import PackedCADSequences
+
+PACKED_DIR = "cad_vec_packed"
+INDEX_NAME = "{}_index.npz"
+SHARD_NAME = "{}_{:03d}.npy"
+
+
+def pack_phase(phase, data_ids, vec_dir, save_dir, shard_size):
+    ids, shard_ids, starts, lengths = [], [], [], []
+    missing = []
+    n_shards = 0
+    for shard_start in range(0, len(data_ids), shard_size):
+        vecs, shard_data_ids = [], []
+        for data_id in data_ids[shard_start:shard_start + shard_size]:
+            h5_path = os.path.join(vec_dir, data_id + ".h5")
+            if not os.path.exists(h5_path):
+                missing.append(data_id)
+                continue
+            with h5py.File(h5_path, "r") as fp:
+                vecs.append(fp["vec"][:])
+            shard_data_ids.append(data_id)
+        if not vecs:
+            continue
+
+        packed = PackedCADSequences.from_vectors(vecs, shard_data_ids)
+        np.save(os.path.join(save_dir, SHARD_NAME.format(phase, n_shards)), packed.data)
+        ids.extend(shard_data_ids)
+        shard_ids.extend([n_shards] * len(packed))
+        starts.extend(packed.offsets[:-1])
+        lengths.extend(packed.lengths)
+        n_shards += 1
+
+    np.savez(os.path.join(save_dir, INDEX_NAME.format(phase)), ids=np.array(ids, dtype=str),
+             shard=np.array(shard_ids, dtype=np.int32), start=np.array(starts, dtype=np.int64),
+             length=np.array(lengths, dtype=np.int32), n_shards=np.array(n_shards))
+    print("{}: packed {} models into {} shards, {} missing".format(phase, len(ids), n_shards, len(missing)))
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_root', type=str, default="../data", help="path to source data folder")
+    parser.add_argument('--shard_size', type=int, default=50000, help="number of models per shard")
+    args = parser.parse_args()
+
+    vec_dir = os.path.join(args.data_root, "cad_vec")
+    save_dir = os.path.join(args.data_root, PACKED_DIR)
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    with open(os.path.join(args.data_root, "train_val_test_split.json"), "r") as fp:
+        all_data = json.load(fp)
+
+    for phase in ["train", "validation", "test"]:
+        pack_phase(phase, all_data[phase], vec_dir, save_dir, args.shard_size)
+
+
+if __name__ == '__main__':
+    main()
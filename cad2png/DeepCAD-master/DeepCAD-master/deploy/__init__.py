@@ -0,0 +1,4 @@
+from .onnx_runtime import CADTransformerONNX
+from .latent_index import LatentIndex
+from .retrieval import CADRetrieval, cad_json_to_vec
+from .encode_service import CADEncodeService
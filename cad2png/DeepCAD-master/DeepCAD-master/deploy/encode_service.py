@@ -0,0 +1,170 @@
+"""batched encoding of raw DeepCAD json dicts into the latent space, without intermediate h5 files.
+
+json -> CAD vector conversion (CADSequence.from_dict, normalize, numericalize, to_vector) runs in a process
+pool, chunk by chunk. The converted vectors are padded into one (batch, MAX_TOTAL_LEN, 1 + N_ARGS) array and
+encoded in large batches by the torch model or the exported ONNX encoder, while the workers keep converting the
+following chunks.
+
+    service = CADEncodeService.from_export("proj_log/newDeepCAD/export_1000")
+    for indices, zs in service.encode_iter(json_dicts):
+        ...
+"""
+import itertools
+import multiprocessing
+import numpy as np
+from cadlib.macro import *
+from .retrieval import cad_json_to_vec, pad_vec
+
+
+def _convert_chunk(args):
+    """(padded vectors of the converted models, their positions in the chunk, {position: error message})"""
+    chunk, max_total_len = args
+    vecs, positions, errors = [], [], {}
+    for i, data in enumerate(chunk):
+        try:
+            cad_vec = cad_json_to_vec(data)
+        except Exception as e:
+            errors[i] = "{}: {}".format(type(e).__name__, e)
+            continue
+        if cad_vec is None:
+            errors[i] = "CAD model exceeds the maximum sequence length {}".format(max_total_len)
+            continue
+        vecs.append(pad_vec(cad_vec, max_total_len))
+        positions.append(i)
+    vecs = np.stack(vecs) if len(vecs) > 0 else np.zeros((0, max_total_len, 1 + N_ARGS), dtype=np.int64)
+    return vecs, np.array(positions, dtype=np.int64), errors
+
+
+class TorchEncoder(object):
+    """(N, S, 1 + N_ARGS) CAD vectors -> (N, dim_z) latents with the eager CADTransformer of a checkpoint"""
+    def __init__(self, ckpt_path, device=None, num_threads=None):
+        import torch
+        from .torch_model import CADEncoderExport, load_net
+        self.torch = torch
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
+        if num_threads is not None and self.device.type == "cpu":
+            torch.set_num_threads(num_threads)
+        net = load_net(ckpt_path)
+        self.encoder = CADEncoderExport(net).to(self.device).eval()
+        self.max_total_len = MAX_TOTAL_LEN
+        self.dim_z = net.bottleneck.bottleneck[0].out_features
+
+    def __call__(self, cad_vecs):
+        torch = self.torch
+        no_grad = torch.inference_mode if hasattr(torch, "inference_mode") else torch.no_grad
+        vecs = torch.from_numpy(np.ascontiguousarray(cad_vecs, dtype=np.int64))
+        if self.device.type == "cuda":
+            vecs = vecs.pin_memory().to(self.device, non_blocking=True)
+        with no_grad():
+            z = self.encoder(vecs[:, :, 0], vecs[:, :, 1:])
+        return z.float().cpu().numpy()
+
+
+class CADEncodeService(object):
+    """Encode many DeepCAD json dicts into latents in one pipelined call."""
+    def __init__(self, encoder, max_total_len=MAX_TOTAL_LEN, dim_z=None, n_workers=None, batch_size=512,
+                 chunk_size=64):
+        """
+        Args:
+            encoder: callable (N, max_total_len, 1 + N_ARGS) int64 array -> (N, dim_z) float array
+            max_total_len (int): sequence length the encoder expects
+            dim_z (int): latent size of the encoder, found by encoding an empty model if None
+            n_workers (int): conversion processes, default cpu count. 0 converts in the calling process.
+            batch_size (int): number of models per encoder call
+            chunk_size (int): number of json dicts per conversion task
+        """
+        self.encoder = encoder
+        self.max_total_len = max_total_len
+        if dim_z is None:
+            dim_z = self.encoder(EOS_VEC[np.newaxis, np.newaxis].repeat(max_total_len, axis=1)).shape[1]
+        self.dim_z = dim_z
+        self.n_workers = multiprocessing.cpu_count() if n_workers is None else n_workers
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    @staticmethod
+    def from_export(export_dir, num_threads=None, **kwargs):
+        """service on the ONNX encoder exported by export.py"""
+        from .onnx_runtime import CADTransformerONNX
+        runtime = CADTransformerONNX(export_dir, num_threads)
+        return CADEncodeService(runtime.encode, runtime.max_total_len, runtime.dim_z, **kwargs)
+
+    @staticmethod
+    def from_checkpoint(ckpt_path, device=None, num_threads=None, **kwargs):
+        """service on the eager torch model of an autoencoder checkpoint"""
+        encoder = TorchEncoder(ckpt_path, device, num_threads)
+        return CADEncodeService(encoder, encoder.max_total_len, encoder.dim_z, **kwargs)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _chunks(self, json_dicts):
+        it = iter(json_dicts)
+        while True:
+            chunk = list(itertools.islice(it, self.chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk, self.max_total_len
+
+    def _converted_chunks(self, json_dicts):
+        if self.n_workers == 0:
+            return map(_convert_chunk, self._chunks(json_dicts))
+        if self._pool is None:
+            # the pool is kept across calls, its startup costs more than a typical batch
+            self._pool = multiprocessing.Pool(self.n_workers)
+        # imap keeps the workers converting ahead while the main process encodes
+        return self._pool.imap(_convert_chunk, self._chunks(json_dicts))
+
+    def encode_iter(self, json_dicts, errors=None):
+        """encode json dicts batch by batch, as soon as enough of them are converted
+
+        Args:
+            json_dicts (iterable): DeepCAD json dicts, may be a generator
+            errors (dict): if given, filled with {input index: error message} of the models that cannot be
+                converted (invalid json, or longer than max_total_len)
+
+        Yields:
+            (indices, zs): input indices (np.array) and (len(indices), dim_z) latents, in input order
+        """
+        vecs, indices, n_pending = [], [], 0
+        chunk_start = 0
+        for chunk_vecs, positions, chunk_errors in self._converted_chunks(json_dicts):
+            if errors is not None:
+                errors.update({chunk_start + i: msg for i, msg in chunk_errors.items()})
+            vecs.append(chunk_vecs)
+            indices.append(chunk_start + positions)
+            chunk_start += len(positions) + len(chunk_errors)
+            n_pending += len(positions)
+            while n_pending >= self.batch_size:
+                batch_vecs, batch_indices = np.concatenate(vecs), np.concatenate(indices)
+                yield batch_indices[:self.batch_size], self.encoder(batch_vecs[:self.batch_size])
+                vecs, indices = [batch_vecs[self.batch_size:]], [batch_indices[self.batch_size:]]
+                n_pending -= self.batch_size
+        if n_pending > 0:
+            yield np.concatenate(indices), self.encoder(np.concatenate(vecs))
+
+    def encode(self, json_dicts):
+        """encode all json dicts at once
+
+        Returns:
+            zs (np.array): (n, dim_z) latents, NaN rows for the models that cannot be converted
+            errors (dict): {input index: error message}
+        """
+        json_dicts = list(json_dicts)
+        errors = {}
+        zs = np.full((len(json_dicts), self.dim_z), np.nan, dtype=np.float32)
+        for indices, batch_zs in self.encode_iter(json_dicts, errors):
+            zs[indices] = batch_zs
+        return zs, errors
@@ -0,0 +1,236 @@
+"""nearest-neighbor index over the autoencoder latent vectors (all_zs_ckpt*.h5 from test.py --mode enc),
+for retrieving geometrically similar CAD models by cosine similarity.
+
+Latents are L2-normalized into one float32 matrix that is memory-mapped at search time. Backends:
+    flat: exact search, one matrix product
+    ivf: inverted file in pure NumPy. Rows are clustered by spherical k-means and stored contiguously per
+         cluster, a query scans only the n_probe closest clusters
+    hnsw: faiss IndexHNSWFlat, if faiss is installed
+"""
+import os
+import json
+import numpy as np
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+LATENTS_NAME = "latents.npy"
+INDEX_NAME = "index.npz"
+HNSW_NAME = "hnsw.faiss"
+BACKENDS = ["flat", "ivf", "hnsw"]
+MIN_IVF_SIZE = 10000 # smaller collections are searched exhaustively
+
+
+def normalize_rows(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, k):
+    """indices of the k largest scores, sorted in descending order"""
+    k = min(k, len(scores))
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _assign(x, centroids, chunk_size=16384):
+    """closest centroid of every row, in chunks to bound the memory of the score matrix"""
+    return np.concatenate([np.argmax(x[i:i + chunk_size] @ centroids.T, axis=1)
+                           for i in range(0, len(x), chunk_size)])
+
+
+def train_centroids(x, n_lists, n_iter=10, n_train_per_list=64, seed=0):
+    """spherical k-means on a random subset of the (normalized) rows of x"""
+    rng = np.random.RandomState(seed)
+    sample = x[np.sort(rng.choice(len(x), min(len(x), n_lists * n_train_per_list), replace=False))]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        non_empty = np.linalg.norm(sums, axis=1) > 0 # keep the previous centroid of an empty cluster
+        centroids[non_empty] = normalize_rows(sums[non_empty])
+    return centroids
+
+
+class LatentIndex(object):
+    """Nearest-neighbor index over normalized latent vectors, searched by cosine similarity."""
+    def __init__(self, latents, ids, backend="flat", centroids=None, list_offsets=None, hnsw=None):
+        """
+        Args:
+            latents (np.array): (n, dim_z) normalized latents, grouped by list for the ivf backend
+            ids (list): data id of each row
+            backend (str): one of BACKENDS
+            centroids (np.array): (n_lists, dim_z) ivf cluster centers
+            list_offsets (np.array): (n_lists + 1, ) first row of each ivf list
+            hnsw: faiss index for the hnsw backend
+        """
+        self.latents = latents
+        self.ids = list(ids)
+        self.id2row = {data_id: i for i, data_id in enumerate(self.ids)}
+        self.backend = backend
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.hnsw = hnsw
+
+    @staticmethod
+    def build(zs, ids, backend="ivf", n_lists=None, hnsw_m=32, seed=0):
+        """build an index from raw latent vectors
+
+        Args:
+            zs (np.array): (n, dim_z) latents
+            ids (list): data id of each row
+            backend (str): one of BACKENDS. ivf falls back to flat for fewer than MIN_IVF_SIZE rows.
+            n_lists (int): number of ivf lists, default sqrt(n)
+            hnsw_m (int): number of neighbors per hnsw node
+        """
+        if len(zs) != len(ids):
+            raise ValueError("{} latents but {} ids".format(len(zs), len(ids)))
+        latents = normalize_rows(zs)
+        ids = list(ids)
+
+        if backend == "hnsw":
+            if faiss is None:
+                raise ImportError("the hnsw backend requires faiss (pip install faiss-cpu)")
+            hnsw = faiss.IndexHNSWFlat(latents.shape[1], hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            hnsw.add(latents)
+            return LatentIndex(latents, ids, backend, hnsw=hnsw)
+
+        if backend == "ivf" and len(latents) >= MIN_IVF_SIZE:
+            n_lists = n_lists or int(np.sqrt(len(latents)))
+            centroids = train_centroids(latents, n_lists, seed=seed)
+            assign = _assign(latents, centroids)
+            order = np.argsort(assign, kind="stable")
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+            return LatentIndex(latents[order], [ids[i] for i in order], backend, centroids, list_offsets)
+
+        if backend not in BACKENDS:
+            raise ValueError("unknown backend: {}".format(backend))
+        return LatentIndex(latents, ids, "flat")
+
+    @staticmethod
+    def load(index_dir, mmap=True):
+        """load an index saved by save. The latent matrix is memory-mapped unless mmap is False."""
+        with np.load(os.path.join(index_dir, INDEX_NAME)) as fp:
+            ids = fp["ids"].tolist()
+            backend = str(fp["backend"])
+            centroids = fp["centroids"] if backend == "ivf" else None
+            list_offsets = fp["list_offsets"] if backend == "ivf" else None
+        latents = np.load(os.path.join(index_dir, LATENTS_NAME), mmap_mode="r" if mmap else None)
+        hnsw = None
+        if backend == "hnsw":
+            if faiss is None:
+                raise ImportError("the hnsw backend requires faiss (pip install faiss-cpu)")
+            hnsw = faiss.read_index(os.path.join(index_dir, HNSW_NAME))
+        return LatentIndex(latents, ids, backend, centroids, list_offsets, hnsw)
+
+    def save(self, index_dir):
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        np.save(os.path.join(index_dir, LATENTS_NAME), np.asarray(self.latents))
+        arrays = {"ids": np.array(self.ids, dtype=str), "backend": np.array(self.backend)}
+        if self.backend == "ivf":
+            arrays.update(centroids=self.centroids, list_offsets=self.list_offsets)
+        np.savez(os.path.join(index_dir, INDEX_NAME), **arrays)
+        if self.backend == "hnsw":
+            faiss.write_index(self.hnsw, os.path.join(index_dir, HNSW_NAME))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, data_id):
+        return data_id in self.id2row
+
+    @property
+    def dim(self):
+        return self.latents.shape[1]
+
+    def vector(self, data_id):
+        """normalized latent vector of an indexed model"""
+        return np.asarray(self.latents[self.id2row[data_id]])
+
+    def _search_rows(self, query, k, n_probe):
+        """(rows, scores) of the k nearest rows of one normalized query"""
+        if self.backend == "ivf":
+            # every list is a contiguous block of rows
+            probe = _top_k(self.centroids @ query, n_probe)
+            starts, ends = self.list_offsets[probe], self.list_offsets[probe + 1]
+            rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+            scores = np.concatenate([self.latents[start:end] @ query for start, end in zip(starts, ends)])
+        else:
+            rows = None
+            scores = np.asarray(self.latents) @ query
+        top = _top_k(scores, k)
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search(self, queries, k=10, n_probe=8, exclude=None):
+        """k nearest indexed models of each query latent
+
+        Args:
+            queries (np.array): (dim_z, ) or (n_queries, dim_z) latents, not necessarily normalized
+            k (int): number of neighbors
+            n_probe (int): number of ivf lists scanned per query (hnsw: search depth is max(k, 8 * n_probe))
+            exclude (list): optional data id to leave out of the results of each query
+
+        Returns:
+            list: for each query, a list of (data_id, cosine similarity) sorted by decreasing similarity
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        exclude = exclude if exclude is not None else [None] * len(queries)
+        n_extra = [int(x is not None) for x in exclude]
+
+        if self.backend == "hnsw":
+            self.hnsw.hnsw.efSearch = max(k + 1, 8 * n_probe)
+            all_scores, all_rows = self.hnsw.search(queries, k + max(n_extra))
+        else:
+            all_rows, all_scores = zip(*[self._search_rows(q, k + extra, n_probe)
+                                         for q, extra in zip(queries, n_extra)])
+
+        results = []
+        for rows, scores, excluded in zip(all_rows, all_scores, exclude):
+            hits = [(self.ids[row], float(score)) for row, score in zip(rows, scores)
+                    if row >= 0 and self.ids[row] != excluded]
+            results.append(hits[:k])
+        return results
+
+    def search_by_id(self, data_id, k=10, n_probe=8):
+        """k models most similar to an indexed model, excluding itself"""
+        return self.search(self.vector(data_id), k, n_probe, exclude=[data_id])[0]
+
+    def recall(self, k=10, n_probe=8, n_queries=200, seed=0):
+        """recall@k of the approximate search against exact search, on random indexed models"""
+        rng = np.random.RandomState(seed)
+        rows = rng.choice(len(self), min(n_queries, len(self)), replace=False)
+        queries = np.asarray(self.latents[np.sort(rows)])
+        approx = self.search(queries, k, n_probe)
+        exact = LatentIndex(self.latents, self.ids, "flat").search(queries, k)
+        hits = [len(set(x[0] for x in a) & set(x[0] for x in e)) for a, e in zip(approx, exact)]
+        return float(np.sum(hits)) / max(sum(len(e) for e in exact), 1)
+
+
+def load_latents(zs_path, phases, split_path=None):
+    """latents and data ids of the given phases from an all_zs_ckpt*.h5 file.
+    Files written before the <phase>_ids datasets were added take the ids from the split file."""
+    import h5py
+    split = None
+    all_zs, all_ids = [], []
+    with h5py.File(zs_path, "r") as fp:
+        for phase in phases:
+            zs = fp["{}_zs".format(phase)][:]
+            if "{}_ids".format(phase) in fp:
+                ids = [x.decode() if isinstance(x, bytes) else str(x) for x in fp["{}_ids".format(phase)][:]]
+            else:
+                if split is None:
+                    if split_path is None:
+                        raise ValueError("{} has no {}_ids, give the split file".format(zs_path, phase))
+                    with open(split_path, "r") as f:
+                        split = json.load(f)
+                ids = split[phase]
+            if len(ids) != len(zs):
+                raise ValueError("{}: {} latents but {} ids".format(phase, len(zs), len(ids)))
+            all_zs.append(zs)
+            all_ids.extend(ids)
+    return np.concatenate(all_zs, axis=0), all_ids
+
@@ -0,0 +1,80 @@
+"""CPU inference of the CADTransformer encoder/decoder exported by export.py, with ONNX Runtime.
+
+Depends only on numpy and onnxruntime, so it can run in a serving process without torch or the training code.
+"""
+import os
+import json
+import numpy as np
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+ENCODER_NAME = "cad_encoder.onnx"
+DECODER_NAME = "cad_decoder.onnx"
+INFO_NAME = "export_info.json"
+
+
+class CADTransformerONNX(object):
+    """Exported CADTransformer, encoding CAD vectors into latent vectors and decoding them back.
+
+    Both models have a dynamic batch size. Inputs larger than max_batch_size are split into chunks.
+    """
+    def __init__(self, export_dir, num_threads=None, max_batch_size=512):
+        """
+        Args:
+            export_dir (str): output folder of export.py
+            num_threads (int): ONNX Runtime intra-op threads, default all cores
+            max_batch_size (int): maximum number of samples per session run
+        """
+        if ort is None:
+            raise ImportError("CADTransformerONNX requires onnxruntime (pip install onnxruntime)")
+        with open(os.path.join(export_dir, INFO_NAME), "r") as fp:
+            self.info = json.load(fp)
+        self.max_total_len = self.info["max_total_len"]
+        self.dim_z = self.info["dim_z"]
+        self.max_batch_size = max_batch_size
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        self.encoder = ort.InferenceSession(os.path.join(export_dir, ENCODER_NAME), options,
+                                            providers=["CPUExecutionProvider"])
+        self.decoder = ort.InferenceSession(os.path.join(export_dir, DECODER_NAME), options,
+                                            providers=["CPUExecutionProvider"])
+
+    def _run_chunks(self, session, inputs):
+        n = len(next(iter(inputs.values())))
+        outputs = []
+        for i in range(0, n, self.max_batch_size):
+            outputs.append(session.run(None, {k: v[i:i + self.max_batch_size] for k, v in inputs.items()})[0])
+        return np.concatenate(outputs, axis=0)
+
+    def encode(self, cad_vecs):
+        """encode padded CAD vectors into latent vectors
+
+        Args:
+            cad_vecs (np.array): (N, max_total_len, 1 + N_ARGS), EOS padded (see CADSequence.to_vector)
+
+        Returns:
+            np.array: (N, dim_z) float32
+        """
+        cad_vecs = np.asarray(cad_vecs, dtype=np.int64)
+        if cad_vecs.ndim != 3 or cad_vecs.shape[1] != self.max_total_len:
+            raise ValueError("expected (N, {}, n_args + 1) CAD vectors, got {}".format(
+                self.max_total_len, cad_vecs.shape))
+        return self._run_chunks(self.encoder, {"commands": np.ascontiguousarray(cad_vecs[:, :, 0]),
+                                               "args": np.ascontiguousarray(cad_vecs[:, :, 1:])})
+
+    def decode(self, zs):
+        """decode latent vectors into CAD vectors, same as TrainerAE.logits2vec(TrainerAE.decode(z))
+
+        Args:
+            zs (np.array): (N, dim_z)
+
+        Returns:
+            np.array: (N, max_total_len, 1 + N_ARGS) int64, unused arguments set to -1
+        """
+        zs = np.asarray(zs, dtype=np.float32).reshape(-1, self.dim_z)
+        return self._run_chunks(self.decoder, {"z": zs})
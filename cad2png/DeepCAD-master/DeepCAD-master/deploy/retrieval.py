@@ -0,0 +1,73 @@
+"""retrieval of geometrically similar CAD models: by indexed id, or by a new CAD vector / DeepCAD json,
+which is first encoded into the latent space by the exported encoder (see export.py)."""
+import numpy as np
+from cadlib.extrude import CADSequence
+from cadlib.macro import *
+from .latent_index import LatentIndex
+from .onnx_runtime import CADTransformerONNX
+
+
+def cad_json_to_vec(data):
+    """DeepCAD json dict -> quantized (seq_len, 1 + N_ARGS) vector, same as dataset/json2vec.py.
+    Returns None if the model exceeds the length limits."""
+    cad_seq = CADSequence.from_dict(data)
+    cad_seq.normalize()
+    cad_seq.numericalize()
+    cad_vec = cad_seq.to_vector(MAX_N_EXT, MAX_N_LOOPS, MAX_N_CURVES, MAX_TOTAL_LEN, pad=False)
+    if cad_vec is None or cad_vec.shape[0] > MAX_TOTAL_LEN:
+        return None
+    return cad_vec
+
+
+def pad_vec(cad_vec, max_total_len=MAX_TOTAL_LEN):
+    """pad a (seq_len, 1 + N_ARGS) vector with EOS up to max_total_len"""
+    cad_vec = np.asarray(cad_vec, dtype=np.int64)
+    pad_len = max_total_len - cad_vec.shape[0]
+    if pad_len < 0:
+        raise ValueError("CAD vector of length {} exceeds {}".format(cad_vec.shape[0], max_total_len))
+    return np.concatenate([cad_vec, EOS_VEC[np.newaxis].repeat(pad_len, axis=0)], axis=0)
+
+
+class CADRetrieval(object):
+    """Find similar CAD models in a LatentIndex.
+
+    Queries by id only need the index. Queries by CAD vector or json need the exported encoder.
+    """
+    def __init__(self, index_dir, export_dir=None, num_threads=None, n_probe=8):
+        """
+        Args:
+            index_dir (str): output folder of deploy/latent_index.py
+            export_dir (str): output folder of export.py, to encode new models
+            num_threads (int): ONNX Runtime threads of the encoder
+            n_probe (int): search breadth, see LatentIndex.search
+        """
+        self.index = LatentIndex.load(index_dir)
+        self.encoder = CADTransformerONNX(export_dir, num_threads) if export_dir is not None else None
+        self.n_probe = n_probe
+
+    def __contains__(self, data_id):
+        return data_id in self.index
+
+    def similar_to_id(self, data_id, k=10):
+        """list of (data_id, similarity) most similar to an indexed model, excluding itself"""
+        return self.index.search_by_id(data_id, k, self.n_probe)
+
+    def encode(self, cad_vecs):
+        """(N, dim_z) latents of a list of quantized CAD vectors"""
+        if self.encoder is None:
+            raise RuntimeError("no encoder loaded, give export_dir to query by CAD vector or json")
+        return self.encoder.encode(np.stack([pad_vec(vec, self.encoder.max_total_len) for vec in cad_vecs]))
+
+    def similar_to_vecs(self, cad_vecs, k=10):
+        """for each quantized CAD vector, list of (data_id, similarity) of the most similar indexed models"""
+        return self.index.search(self.encode(cad_vecs), k, self.n_probe)
+
+    def similar_to_vec(self, cad_vec, k=10):
+        return self.similar_to_vecs([cad_vec], k)[0]
+
+    def similar_to_json(self, data, k=10):
+        """most similar indexed models of a DeepCAD json dict. Raises ValueError if it cannot be converted."""
+        cad_vec = cad_json_to_vec(data)
+        if cad_vec is None:
+            raise ValueError("CAD model exceeds the maximum sequence length {}".format(MAX_TOTAL_LEN))
+        return self.similar_to_vec(cad_vec, k)
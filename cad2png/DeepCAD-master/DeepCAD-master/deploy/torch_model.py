@@ -0,0 +1,47 @@
+"""torch side of the deployment: the autoencoder loaded from a checkpoint without ConfigAE argument parsing,
+and the encode / decode modules that are traced by export.py."""
+import torch
+import torch.nn as nn
+from config import ConfigAE
+from model import CADTransformer
+from cadlib.macro import *
+
+
+class ModelConfig(object):
+    """CADTransformer hyperparameters of ConfigAE, without command-line parsing and experiment folders"""
+    def __init__(self):
+        ConfigAE.set_configuration(self)
+
+
+class CADEncoderExport(nn.Module):
+    """(N, S) commands, (N, S, N_ARGS) args -> (N, dim_z) latent vectors"""
+    def __init__(self, net):
+        super(CADEncoderExport, self).__init__()
+        self.net = net
+
+    def forward(self, commands, args):
+        z = self.net(commands, args, encode_mode=True)  # (N, 1, dim_z)
+        return z[:, 0]
+
+
+class CADDecoderExport(nn.Module):
+    """(N, dim_z) latent vectors -> (N, S, 1 + N_ARGS) CAD vectors, same as TrainerAE.logits2vec(refill_pad=True)"""
+    def __init__(self, net):
+        super(CADDecoderExport, self).__init__()
+        self.net = net
+        self.register_buffer("cmd_args_mask", torch.tensor(CMD_ARGS_MASK).bool())
+
+    def forward(self, z):
+        outputs = self.net(None, None, z=z.unsqueeze(1), return_tgt=False)
+        out_command = torch.argmax(outputs['command_logits'], dim=-1)  # (N, S)
+        out_args = torch.argmax(outputs['args_logits'], dim=-1) - 1  # (N, S, N_ARGS)
+        mask = self.cmd_args_mask[out_command]
+        out_args = torch.where(mask, out_args, torch.full_like(out_args, -1))
+        return torch.cat([out_command.unsqueeze(-1), out_args], dim=-1)
+
+
+def load_net(ckpt_path):
+    net = CADTransformer(ModelConfig())
+    checkpoint = torch.load(ckpt_path, map_location="cpu")
+    net.load_state_dict(checkpoint['model_state_dict'])
+    return net.eval()
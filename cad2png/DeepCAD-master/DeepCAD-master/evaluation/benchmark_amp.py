@@ -0,0 +1,96 @@
+"""training throughput and peak memory of TrainerAE in fp32, bf16 and fp16 automatic mixed precision,
+with and without gradient accumulation, on random CAD vectors. Accumulation runs keep the effective batch
+size: batch_size / accum_steps samples per step.
+
+    python benchmark_amp.py [--device cuda] [--batch_size 512] [--accum_steps 4]
+
+Peak memory is the maximum allocated by torch on cuda, and the peak resident size of the process on CPU
+(which only grows, so the modes are run from the smallest to the largest expected footprint).
+"""
+import os
+import time
+import argparse
+import tempfile
+import resource
+import torch
+import sys
+sys.path.append("..")
+from export import random_cad_vecs
+from config import ConfigAE
+from trainer import TrainerAE
+
+
+class BenchmarkConfig(object):
+    """ConfigAE hyperparameters of the network and optimizer, without command-line parsing"""
+    def __init__(self, log_dir, device, batch_size, amp, accum_steps):
+        ConfigAE.set_configuration(self)
+        self.log_dir = self.model_dir = log_dir
+        self.device = device
+        self.batch_size = batch_size
+        self.amp = amp
+        self.accum_steps = accum_steps
+        self.lr = 1e-3
+        self.warmup_step = 2000
+        self.grad_clip = 1.0
+
+
+def peak_memory_mb(device):
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2 ** 20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def benchmark(cfg, n_iters, n_warmup):
+    trainer = TrainerAE(cfg)
+    vecs = torch.tensor(random_cad_vecs(cfg.batch_size))
+    data = {"command": vecs[:, :, 0], "args": vecs[:, :, 1:]}
+    if trainer.device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(trainer.device)
+
+    for i in range(n_warmup + n_iters):
+        if i == n_warmup:
+            if trainer.device.type == "cuda":
+                torch.cuda.synchronize(trainer.device)
+            start = time.time()
+        _, losses = trainer.train_func(data)
+        trainer.update_learning_rate()
+    loss = sum(v.item() for v in losses.values()) # waits for the device
+    elapsed = time.time() - start
+    trainer.train_tb.close()
+    trainer.val_tb.close()
+    return n_iters * cfg.batch_size / elapsed, peak_memory_mb(trainer.device), loss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument('--batch_size', type=int, default=64, help="effective batch size")
+    parser.add_argument('--accum_steps', type=int, default=4, help="accumulation steps of the accumulation runs")
+    parser.add_argument('--n_iters', type=int, default=20)
+    parser.add_argument('--n_warmup', type=int, default=3)
+    parser.add_argument('--modes', type=str, nargs='+', default=["bf16", "fp16", "fp32"],
+                        choices=["fp32", "bf16", "fp16"])
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    print("device {}, batch size {}".format(device, args.batch_size))
+    print("{:>6} {:>6} {:>6} {:>12} {:>14} {:>10}".format("amp", "batch", "accum", "samples/s", "peak mem(MB)",
+                                                          "loss"))
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in args.modes:
+            for accum_steps in sorted({1, args.accum_steps}, reverse=True):
+                amp = None if mode == "fp32" else mode
+                batch_size = args.batch_size // accum_steps
+                cfg = BenchmarkConfig(os.path.join(log_dir, "{}_{}".format(mode, accum_steps)), args.device,
+                                      batch_size, amp, accum_steps)
+                try:
+                    throughput, memory, loss = benchmark(cfg, args.n_iters, args.n_warmup)
+                except (RuntimeError, ValueError) as e: # e.g. fp16 not supported on this device / torch
+                    print("{:>6} {:>6} {:>6} failed: {}".format(mode, batch_size, accum_steps, str(e).splitlines()[0]))
+                    continue
+                print("{:>6} {:>6} {:>6} {:>12.1f} {:>14.1f} {:>10.4f}".format(mode, batch_size, accum_steps,
+                                                                               throughput, memory, loss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""parity check and microbenchmark of the fused SDPA attention path against the reference
+multi_head_attention_forward, for the masks used by the CAD transformer and sequence lengths up to MAX_TOTAL_LEN.
+
+    python benchmark_attention.py [--device cpu] [--batch_size 512]
+"""
+import time
+import argparse
+import torch
+import sys
+sys.path.append("..")
+from cadlib.macro import MAX_TOTAL_LEN
+from model.layers.attention import MultiheadAttention, SDPA_AVAILABLE
+
+D_MODEL = 256
+N_HEADS = 8
+SEQ_LENS = [8, 16, 32, MAX_TOTAL_LEN]
+
+
+def random_key_padding_mask(batch_size, seq_len, device):
+    """padding after a random sequence length (at least 1 valid position), like _get_key_padding_mask"""
+    lengths = torch.randint(1, seq_len + 1, (batch_size, 1), device=device)
+    return torch.arange(seq_len, device=device).unsqueeze(0) >= lengths
+
+
+def check_parity(attn, device, atol):
+    """compare both paths on self-attention, encoder-decoder attention and every mask combination"""
+    batch_size, seq_len, src_len = 16, MAX_TOTAL_LEN, 24
+    max_err = 0.
+    for cross in [False, True]:
+        query = torch.randn(seq_len, batch_size, D_MODEL, device=device)
+        key = torch.randn(src_len, batch_size, D_MODEL, device=device) if cross else query
+        key_len = key.size(0)
+        for use_padding in [False, True]:
+            for attn_mask_dim in [None, 2, 3]:
+                key_padding_mask = random_key_padding_mask(batch_size, key_len, device) if use_padding else None
+                attn_mask = None
+                if attn_mask_dim == 2:
+                    attn_mask = torch.triu(torch.full((seq_len, key_len), float('-inf'), device=device), diagonal=1)
+                elif attn_mask_dim == 3:
+                    attn_mask = torch.randn(batch_size * N_HEADS, seq_len, key_len, device=device)
+
+                attn.use_sdpa = False
+                ref = attn(query, key, key, key_padding_mask=key_padding_mask, attn_mask=attn_mask,
+                           need_weights=False)[0]
+                attn.use_sdpa = True
+                out = attn(query, key, key, key_padding_mask=key_padding_mask, attn_mask=attn_mask,
+                           need_weights=False)[0]
+                err = (out - ref).abs().max().item()
+                max_err = max(max_err, err)
+                status = "ok" if err <= atol else "MISMATCH"
+                print("cross={:d} padding={:d} attn_mask={}: max abs error {:.2e} {}".format(
+                    cross, use_padding, attn_mask_dim, err, status))
+    return max_err <= atol
+
+
+def benchmark(attn, device, batch_size, n_iters):
+    print("{:>8} {:>14} {:>14} {:>8}".format("seq_len", "reference(ms)", "sdpa(ms)", "speedup"))
+    for seq_len in SEQ_LENS:
+        src = torch.randn(seq_len, batch_size, D_MODEL, device=device)
+        key_padding_mask = random_key_padding_mask(batch_size, seq_len, device)
+        timings = []
+        for use_sdpa in [False, True]:
+            attn.use_sdpa = use_sdpa
+            for _ in range(3): # warm up
+                attn(src, src, src, key_padding_mask=key_padding_mask, need_weights=False)
+            if device.type == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            for _ in range(n_iters):
+                attn(src, src, src, key_padding_mask=key_padding_mask, need_weights=False)
+            if device.type == "cuda":
+                torch.cuda.synchronize()
+            timings.append((time.perf_counter() - start) / n_iters * 1000)
+        print("{:>8} {:>14.3f} {:>14.3f} {:>7.2f}x".format(seq_len, timings[0], timings[1], timings[0] / timings[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument('--batch_size', type=int, default=512)
+    parser.add_argument('--n_iters', type=int, default=20)
+    parser.add_argument('--atol', type=float, default=1e-5)
+    args = parser.parse_args()
+
+    if not SDPA_AVAILABLE:
+        print("torch.nn.functional.scaled_dot_product_attention not available (torch {})".format(torch.__version__))
+        sys.exit(1)
+
+    device = torch.device(args.device)
+    torch.manual_seed(0)
+    attn = MultiheadAttention(D_MODEL, N_HEADS, dropout=0.1).to(device).eval()
+    with torch.no_grad():
+        attn.in_proj_bias.normal_()
+        attn.out_proj.bias.normal_()
+        if not check_parity(attn, device, args.atol):
+            sys.exit("SDPA attention does not match the reference implementation")
+        benchmark(attn, device, args.batch_size, args.n_iters)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""end-to-end check of deploy.CADEncodeService on real DeepCAD json files: every file must convert, and the
+batched, pooled latents must match encoding each file on its own.
+
+    python check_encode_service.py --export_dir ../proj_log/newDeepCAD/export_1000
+    python check_encode_service.py --ckpt ../proj_log/newDeepCAD/model/ckpt_epoch1000.pth
+"""
+import os
+import glob
+import json
+import argparse
+import numpy as np
+import sys
+sys.path.append("..")
+from deploy import CADEncodeService
+from deploy.retrieval import cad_json_to_vec, pad_vec
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--json_dir', type=str, default="../../../cad/json", help="folder of DeepCAD json files")
+    parser.add_argument('--export_dir', type=str, default=None, help="output folder of export.py")
+    parser.add_argument('--ckpt', type=str, default=None, help="autoencoder checkpoint, if no export_dir")
+    parser.add_argument('--n_workers', type=int, default=2)
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--chunk_size', type=int, default=4)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    args = parser.parse_args()
+    if (args.export_dir is None) == (args.ckpt is None):
+        parser.error("give exactly one of --export_dir and --ckpt")
+
+    paths = sorted(glob.glob(os.path.join(args.json_dir, "*.json")))
+    if len(paths) == 0:
+        raise SystemExit("no json files in {}".format(args.json_dir))
+    json_dicts = []
+    for path in paths:
+        with open(path, "r") as fp:
+            json_dicts.append(json.load(fp))
+
+    kwargs = dict(n_workers=args.n_workers, batch_size=args.batch_size, chunk_size=args.chunk_size)
+    if args.export_dir is not None:
+        service = CADEncodeService.from_export(args.export_dir, **kwargs)
+    else:
+        service = CADEncodeService.from_checkpoint(args.ckpt, device="cpu", **kwargs)
+
+    with service:
+        zs, errors = service.encode(json_dicts)
+    for i, msg in sorted(errors.items()):
+        print("{}: {}".format(os.path.basename(paths[i]), msg))
+
+    # reference: every file converted and encoded on its own, in this process
+    ok = np.array([i not in errors for i in range(len(paths))])
+    ref = np.full_like(zs, np.nan)
+    for i in np.where(ok)[0]:
+        ref[i] = service.encoder(pad_vec(cad_json_to_vec(json_dicts[i]), service.max_total_len)[np.newaxis])[0]
+    err = np.max(np.abs(zs[ok] - ref[ok])) if ok.any() else 0.
+
+    print("{} files, {} encoded, {} failed, latents {}, max abs error {:.2e}".format(
+        len(paths), ok.sum(), len(errors), zs.shape, err))
+    if len(errors) > 0 or zs.shape != (len(paths), service.dim_z) or err > args.atol:
+        raise SystemExit("encode service check failed")
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
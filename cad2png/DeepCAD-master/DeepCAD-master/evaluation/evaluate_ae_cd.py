@@ -9,7 +9,7 @@ from scipy.spatial import cKDTree as KDTree
 import time
 import sys
 sys.path.append("..")
-from utils import read_ply
+from utils import read_ply, PointCloudStore
 from cadlib.visualize import vec2CADsolid, CADsolid2pc
 
 
@@ -40,15 +40,37 @@ def normalize_pc(points):
     return points
 
 
+_pc_store = None
+
+
+def load_gt_pc(truck_id, data_id, n_points):
+    """ground truth point cloud from the packed store (--pc_store) or from the .ply file. None if missing."""
+    global _pc_store
+    if args.pc_store is not None:
+        if _pc_store is None:
+            _pc_store = PointCloudStore(args.pc_store)
+        key = truck_id + '/' + data_id
+        if key not in _pc_store:
+            return None
+        return _pc_store.sample(_pc_store.rows([key]), n_points)[0]
+
+    gt_pc_path = os.path.join(PC_ROOT, truck_id, data_id + '.ply')
+    if not os.path.exists(gt_pc_path):
+        return None
+    gt_pc = read_ply(gt_pc_path)
+    sample_idx = random.sample(list(range(gt_pc.shape[0])), n_points)
+    return gt_pc[sample_idx]
+
+
 def process_one(path):
     with h5py.File(path, 'r') as fp:
-        out_vec = fp["out_vec"][:].astype(np.float)
-        # gt_vec = fp["gt_vec"][:].astype(np.float)
+        out_vec = fp["out_vec"][:].astype(np.float64)
+        # gt_vec = fp["gt_vec"][:].astype(np.float64)
 
     data_id = path.split('/')[-1].split('.')[0][:8]
     truck_id = data_id[:4]
-    gt_pc_path = os.path.join(PC_ROOT, truck_id, data_id + '.ply')
-    if not os.path.exists(gt_pc_path):
+    gt_pc = load_gt_pc(truck_id, data_id, args.n_points)
+    if gt_pc is None:
         return None
 
     try:
@@ -66,10 +88,6 @@ def process_one(path):
     if np.max(np.abs(out_pc)) > 2: # normalize out-of-bound data
         out_pc = normalize_pc(out_pc)
 
-    gt_pc = read_ply(gt_pc_path)
-    sample_idx = random.sample(list(range(gt_pc.shape[0])), args.n_points)
-    gt_pc = gt_pc[sample_idx]
-
     cd = chamfer_dist(gt_pc, out_pc)
     return cd
 
@@ -141,6 +159,7 @@ parser.add_argument('--src', type=str, default=None, required=True)
 parser.add_argument('--n_points', type=int, default=2000)
 parser.add_argument('--num', type=int, default=-1)
 parser.add_argument('--parallel', action='store_true', help="use parallelization")
+parser.add_argument('--pc_store', type=str, default=None, help="packed ground truth point clouds (dataset/pack_pc.py)")
 args = parser.parse_args()
 
 print(args.src)
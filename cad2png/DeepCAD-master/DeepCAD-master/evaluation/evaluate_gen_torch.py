@@ -12,7 +12,7 @@ from scipy.stats import entropy
 from sklearn.neighbors import NearestNeighbors
 import sys
 sys.path.append("..")
-from utils import read_ply
+from utils import read_ply, PointCloudStore, normalize_pcs
 
 N_POINTS = 2000
 
@@ -214,6 +214,21 @@ def normalize_pc(points):
     return points
 
 
+def collect_test_set_pcs_from_store(args, store):
+    """sample and normalize the reference set from the packed point cloud store, in one batch"""
+    start = time.time()
+
+    with open(os.path.join(RECORD_FILE), "r") as fp:
+        all_data = [data_id for data_id in json.load(fp)['test'] if data_id in store]
+    select_idx = random.sample(list(range(len(all_data))), min(args.n_test, len(all_data)))
+    rows = store.rows([all_data[x] for x in select_idx])
+    ref_pcs = normalize_pcs(store.sample(rows, N_POINTS))
+
+    print("reference point clouds: {}".format(ref_pcs.shape))
+    print("time: {:.2f}s".format(time.time() - start))
+    return ref_pcs
+
+
 def collect_test_set_pcs(args):
     start = time.time()
 
@@ -277,6 +292,7 @@ def main():
     parser.add_argument("--times", type=int, default=3)
     parser.add_argument("--batch_size", type=int, default=64)
     parser.add_argument("-o", "--output", type=str)
+    parser.add_argument("--pc_store", type=str, default=None, help="packed ground truth point clouds (dataset/pack_pc.py)")
     args = parser.parse_args()
 
     print("n_test: {}, multiplier: {}, repeat times: {}".format(args.n_test, args.multi, args.times))
@@ -288,10 +304,15 @@ def main():
 
     fp = open(args.output, "w")
 
+    store = PointCloudStore(args.pc_store) if args.pc_store is not None else None
+
     result_list = []
     for i in range(args.times):
         print("iteration {}...".format(i))
-        ref_pcs = collect_test_set_pcs(args)
+        if store is not None:
+            ref_pcs = collect_test_set_pcs_from_store(args, store)
+        else:
+            ref_pcs = collect_test_set_pcs(args)
         sample_pcs = collect_src_pcs(args)
 
         jsd = jsd_between_point_cloud_sets(sample_pcs, ref_pcs, in_unit_sphere=False)
@@ -0,0 +1,123 @@
+"""export a trained CADTransformer encoder and decoder (with the logits2vec post-processing) to TorchScript
+and ONNX for serving, and check numerical parity of the exported models against the eager model.
+
+    python export.py --exp_name newDeepCAD --ckpt 1000
+
+Outputs (in proj_log/<exp_name>/export_<ckpt> by default):
+    cad_encoder.pt, cad_decoder.pt: TorchScript
+    cad_encoder.onnx, cad_decoder.onnx: ONNX, run on CPU with deploy.CADTransformerONNX
+    export_info.json
+"""
+import os
+import json
+import argparse
+import numpy as np
+import torch
+from cadlib.macro import *
+from deploy.onnx_runtime import ENCODER_NAME, DECODER_NAME, INFO_NAME
+from deploy.torch_model import CADEncoderExport, CADDecoderExport, load_net
+
+
+def random_cad_vecs(batch_size, seed=0):
+    """random EOS padded CAD vectors, for tracing and parity checks"""
+    rng = np.random.RandomState(seed)
+    vecs = np.tile(EOS_VEC, (batch_size, MAX_TOTAL_LEN, 1))
+    for i in range(batch_size):
+        seq_len = rng.randint(2, MAX_TOTAL_LEN)
+        vecs[i, :seq_len, 0] = rng.choice([LINE_IDX, ARC_IDX, CIRCLE_IDX, SOL_IDX, EXT_IDX], seq_len)
+        vecs[i, :seq_len, 1:] = rng.randint(0, ARGS_DIM, (seq_len, N_ARGS))
+        vecs[i, :seq_len, 1:][~CMD_ARGS_MASK[vecs[i, :seq_len, 0]].astype(bool)] = PAD_VAL
+    return vecs
+
+
+def export_torchscript(module, example_inputs, save_path):
+    traced = torch.jit.trace(module, example_inputs, check_trace=False)
+    traced.save(save_path)
+    return torch.jit.load(save_path)
+
+
+def export_onnx(module, example_inputs, save_path, input_names, output_name, opset):
+    dynamic_axes = {name: {0: "batch"} for name in input_names + [output_name]}
+    kwargs = {}
+    if "dynamo" in torch.onnx.export.__code__.co_varnames:
+        kwargs["dynamo"] = False # TorchScript-based exporter, supports dynamic_axes
+    torch.onnx.export(module, example_inputs, save_path, input_names=input_names, output_names=[output_name],
+                      dynamic_axes=dynamic_axes, opset_version=opset, **kwargs)
+
+
+def check_parity(name, reference, outputs, atol):
+    if reference.dtype.kind == 'f':
+        err = np.max(np.abs(reference - outputs))
+        ok = err <= atol
+        print("{}: max abs error {:.2e} {}".format(name, err, "ok" if ok else "MISMATCH"))
+    else:
+        mismatch = np.mean(np.any(reference != outputs, axis=-1))
+        ok = mismatch == 0
+        print("{}: {:.2%} of commands differ {}".format(name, mismatch, "ok" if ok else "MISMATCH"))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--proj_dir', type=str, default="proj_log", help="path to project folder")
+    parser.add_argument('--exp_name', type=str, required=True, help="name of the autoencoder experiment")
+    parser.add_argument('--ckpt', type=str, default='latest', help="checkpoint to export")
+    parser.add_argument('-o', '--outputs', type=str, default=None, help="output folder")
+    parser.add_argument('--format', type=str, nargs='+', default=["torchscript", "onnx"],
+                        choices=["torchscript", "onnx"])
+    parser.add_argument('--opset', type=int, default=17, help="ONNX opset version")
+    parser.add_argument('--batch_size', type=int, default=16, help="batch size of the parity check")
+    parser.add_argument('--atol', type=float, default=1e-4, help="tolerance of the latent vectors parity check")
+    args = parser.parse_args()
+
+    exp_dir = os.path.join(args.proj_dir, args.exp_name)
+    name = args.ckpt if args.ckpt == 'latest' else "ckpt_epoch{}".format(args.ckpt)
+    ckpt_path = os.path.join(exp_dir, "model", "{}.pth".format(name))
+    save_dir = args.outputs if args.outputs is not None else os.path.join(exp_dir, "export_{}".format(args.ckpt))
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    net = load_net(ckpt_path)
+    encoder, decoder = CADEncoderExport(net).eval(), CADDecoderExport(net).eval()
+
+    # eager reference, with a batch size different from the tracing one to check the dynamic batch axis
+    vecs = random_cad_vecs(args.batch_size, seed=1)
+    commands, cad_args = torch.tensor(vecs[:, :, 0]), torch.tensor(vecs[:, :, 1:])
+    example_vecs = random_cad_vecs(2)
+    example_inputs = (torch.tensor(example_vecs[:, :, 0]), torch.tensor(example_vecs[:, :, 1:]))
+    with torch.no_grad():
+        ref_z = encoder(commands, cad_args)
+        ref_vec = decoder(ref_z).numpy()
+        example_z = encoder(*example_inputs)
+    ref_z = ref_z.numpy()
+
+    all_ok = True
+    with torch.no_grad():
+        if "torchscript" in args.format:
+            ts_encoder = export_torchscript(encoder, example_inputs, os.path.join(save_dir, "cad_encoder.pt"))
+            ts_decoder = export_torchscript(decoder, (example_z,), os.path.join(save_dir, "cad_decoder.pt"))
+            all_ok &= check_parity("torchscript encoder", ref_z, ts_encoder(commands, cad_args).numpy(), args.atol)
+            all_ok &= check_parity("torchscript decoder", ref_vec, ts_decoder(torch.tensor(ref_z)).numpy(), args.atol)
+
+        if "onnx" in args.format:
+            export_onnx(encoder, example_inputs, os.path.join(save_dir, ENCODER_NAME), ["commands", "args"], "z",
+                        args.opset)
+            export_onnx(decoder, (example_z,), os.path.join(save_dir, DECODER_NAME), ["z"], "cad_vec", args.opset)
+
+    with open(os.path.join(save_dir, INFO_NAME), "w") as fp:
+        json.dump({"ckpt": ckpt_path, "max_total_len": MAX_TOTAL_LEN, "n_args": N_ARGS,
+                   "dim_z": net.bottleneck.bottleneck[0].out_features, "formats": args.format}, fp, indent=2)
+
+    if "onnx" in args.format:
+        from deploy import CADTransformerONNX
+        runtime = CADTransformerONNX(save_dir)
+        all_ok &= check_parity("onnx encoder", ref_z, runtime.encode(vecs), args.atol)
+        all_ok &= check_parity("onnx decoder", ref_vec, runtime.decode(ref_z), args.atol)
+
+    print("exported to", save_dir)
+    if not all_ok:
+        raise SystemExit("exported models do not match the eager model")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@ import h5py
 from utils import ensure_dir
 from config import ConfigLGAN
 from trainer import TrainerLatentWGAN
-from dataset.lgan_dataset import get_dataloader
+from dataset.lgan_dataset import get_dataloader, LatentSampler
 
 
 cfg = ConfigLGAN()
@@ -16,10 +16,15 @@ if not cfg.test:
     if cfg.cont:
         agent.load_ckpt(cfg.ckpt)
 
-    # create dataloader
-    train_loader = get_dataloader(cfg)
+    if cfg.in_memory:
+        # all latents on the device, sampled without a dataloader
+        sampler = LatentSampler(cfg.data_root, cfg.batch_size, agent.device)
+        agent.train_in_memory(sampler)
+    else:
+        # create dataloader
+        train_loader = get_dataloader(cfg)
 
-    agent.train(train_loader)
+        agent.train(train_loader)
 else:
     # load trained weights
     agent.load_ckpt(cfg.ckpt)
@@ -5,8 +5,18 @@ from torch.nn.init import constant_
 from torch.nn.init import xavier_normal_
 from torch.nn.parameter import Parameter
 from torch.nn.modules.module import Module
+import torch.nn.functional as F
 
-from .functional import multi_head_attention_forward
+from .functional import multi_head_attention_forward, sdpa_attention_forward
+
+# fused scaled dot product attention kernels, torch >= 2.0
+SDPA_AVAILABLE = hasattr(F, "scaled_dot_product_attention")
+
+
+class NonDynamicallyQuantizableLinear(Linear):
+    """Linear whose weight is read directly by the attention functions. quantize_dynamic only swaps modules
+    of the exact type Linear, so this output projection is kept in float while all other Linear are quantized."""
+    pass
 
 
 class MultiheadAttention(Module):
@@ -28,6 +38,9 @@ class MultiheadAttention(Module):
                        value sequences at dim=1.
         kdim: total number of features in key. Default: None.
         vdim: total number of features in key. Default: None.
+        use_sdpa: compute the attention with the fused torch.nn.functional.scaled_dot_product_attention
+                  kernel when the attention weights are not needed (need_weights=False) and it is
+                  available. Same parameters as the reference implementation. Default: True.
 
         Note: if kdim and vdim are None, they will be set to embed_dim such that
         query, key, and value have the same number of features.
@@ -43,8 +56,10 @@ class MultiheadAttention(Module):
     }
     __constants__ = ['q_proj_weight', 'k_proj_weight', 'v_proj_weight', 'in_proj_weight']
 
-    def __init__(self, embed_dim, num_heads, dropout=0., bias=True, add_bias_kv=False, add_zero_attn=False, kdim=None, vdim=None):
+    def __init__(self, embed_dim, num_heads, dropout=0., bias=True, add_bias_kv=False, add_zero_attn=False, kdim=None, vdim=None,
+                 use_sdpa=True):
         super(MultiheadAttention, self).__init__()
+        self.use_sdpa = use_sdpa
         self.embed_dim = embed_dim
         self.kdim = kdim if kdim is not None else embed_dim
         self.vdim = vdim if vdim is not None else embed_dim
@@ -70,7 +85,7 @@ class MultiheadAttention(Module):
             self.in_proj_bias = Parameter(torch.empty(3 * embed_dim))
         else:
             self.register_parameter('in_proj_bias', None)
-        self.out_proj = Linear(embed_dim, embed_dim, bias=bias)
+        self.out_proj = NonDynamicallyQuantizableLinear(embed_dim, embed_dim, bias=bias)
 
         if add_bias_kv:
             self.bias_k = Parameter(torch.empty(1, 1, embed_dim))
@@ -102,6 +117,8 @@ class MultiheadAttention(Module):
         # Support loading old MultiheadAttention checkpoints generated by v1.1.0
         if '_qkv_same_embed_dim' not in state:
             state['_qkv_same_embed_dim'] = True
+        if 'use_sdpa' not in state:
+            state['use_sdpa'] = True
 
         super(MultiheadAttention, self).__setstate__(state)
 
@@ -139,6 +156,18 @@ class MultiheadAttention(Module):
         - attn_output_weights: :math:`(N, L, S)` where N is the batch size,
           L is the target sequence length, S is the source sequence length.
         """
+        if self.use_sdpa and SDPA_AVAILABLE and not need_weights and self.bias_k is None and not self.add_zero_attn:
+            attn_output = sdpa_attention_forward(
+                query, key, value, self.num_heads,
+                self.in_proj_weight, self.in_proj_bias,
+                self.dropout, self.out_proj.weight, self.out_proj.bias,
+                training=self.training,
+                key_padding_mask=key_padding_mask, attn_mask=attn_mask,
+                q_proj_weight=None if self._qkv_same_embed_dim else self.q_proj_weight,
+                k_proj_weight=None if self._qkv_same_embed_dim else self.k_proj_weight,
+                v_proj_weight=None if self._qkv_same_embed_dim else self.v_proj_weight)
+            return attn_output, None
+
         if not self._qkv_same_embed_dim:
             return multi_head_attention_forward(
                 query, key, value, self.embed_dim, self.num_heads,
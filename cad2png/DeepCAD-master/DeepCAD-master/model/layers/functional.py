@@ -254,3 +254,85 @@ def multi_head_attention_forward(query,                           # type: Tensor
         return attn_output, attn_output_weights.sum(dim=1) / num_heads
     else:
         return attn_output, None
+
+
+def sdpa_attention_forward(query,                           # type: Tensor
+                           key,                             # type: Tensor
+                           value,                           # type: Tensor
+                           num_heads,                       # type: int
+                           in_proj_weight,                  # type: Tensor
+                           in_proj_bias,                    # type: Optional[Tensor]
+                           dropout_p,                       # type: float
+                           out_proj_weight,                 # type: Tensor
+                           out_proj_bias,                   # type: Optional[Tensor]
+                           training=True,                   # type: bool
+                           key_padding_mask=None,           # type: Optional[Tensor]
+                           attn_mask=None,                  # type: Optional[Tensor]
+                           q_proj_weight=None,              # type: Optional[Tensor]
+                           k_proj_weight=None,              # type: Optional[Tensor]
+                           v_proj_weight=None               # type: Optional[Tensor]
+                           ):
+    # type: (...) -> Tensor
+    r"""Same as multi_head_attention_forward with need_weights=False, computed by the fused
+    torch.nn.functional.scaled_dot_product_attention kernel (torch >= 2.0).
+    bias_k/bias_v, add_zero_attn and static_k/static_v are not supported.
+
+    Args:
+        see multi_head_attention_forward. Separate projection weights are used if q_proj_weight is given.
+    Shape:
+        Inputs: see multi_head_attention_forward.
+        Outputs:
+        - attn_output: :math:`(L, N, E)` where L is the target sequence length, N is the batch size,
+          E is the embedding dimension.
+    """
+    tgt_len, bsz, embed_dim = query.size()
+    src_len = key.size(0)
+    head_dim = embed_dim // num_heads
+    assert head_dim * num_heads == embed_dim, "embed_dim must be divisible by num_heads"
+
+    if q_proj_weight is None:
+        b_q, b_k, b_v = in_proj_bias.chunk(3) if in_proj_bias is not None else (None, None, None)
+        if query is key and key is value:
+            # self-attention
+            q, k, v = F.linear(query, in_proj_weight, in_proj_bias).chunk(3, dim=-1)
+        elif key is value:
+            # encoder-decoder attention
+            q = F.linear(query, in_proj_weight[:embed_dim], b_q)
+            k, v = F.linear(key, in_proj_weight[embed_dim:],
+                            in_proj_bias[embed_dim:] if in_proj_bias is not None else None).chunk(2, dim=-1)
+        else:
+            w_q, w_k, w_v = in_proj_weight.chunk(3)
+            q, k, v = F.linear(query, w_q, b_q), F.linear(key, w_k, b_k), F.linear(value, w_v, b_v)
+    else:
+        b_q, b_k, b_v = in_proj_bias.chunk(3) if in_proj_bias is not None else (None, None, None)
+        q = F.linear(query, q_proj_weight, b_q)
+        k = F.linear(key, k_proj_weight, b_k)
+        v = F.linear(value, v_proj_weight, b_v)
+
+    # (L, N, E) -> (N, num_heads, L, head_dim)
+    q = q.reshape(tgt_len, bsz, num_heads, head_dim).permute(1, 2, 0, 3)
+    k = k.reshape(src_len, bsz, num_heads, head_dim).permute(1, 2, 0, 3)
+    v = v.reshape(src_len, bsz, num_heads, head_dim).permute(1, 2, 0, 3)
+
+    # additive attn_mask and boolean key_padding_mask (True: ignore) merged into one mask for SDPA
+    mask = None
+    if attn_mask is not None:
+        if attn_mask.dim() == 2:
+            if list(attn_mask.size()) != [tgt_len, src_len]:
+                raise RuntimeError('The size of the 2D attn_mask is not correct.')
+            mask = attn_mask.to(q.dtype)
+        elif attn_mask.dim() == 3:
+            if list(attn_mask.size()) != [bsz * num_heads, tgt_len, src_len]:
+                raise RuntimeError('The size of the 3D attn_mask is not correct.')
+            mask = attn_mask.to(q.dtype).view(bsz, num_heads, tgt_len, src_len)
+        else:
+            raise RuntimeError("attn_mask's dimension {} is not supported".format(attn_mask.dim()))
+    if key_padding_mask is not None:
+        assert list(key_padding_mask.size()) == [bsz, src_len]
+        padding = key_padding_mask.bool().view(bsz, 1, 1, src_len)
+        mask = ~padding if mask is None else mask.masked_fill(padding, float('-inf'))
+
+    attn_output = F.scaled_dot_product_attention(q, k, v, attn_mask=mask,
+                                                 dropout_p=dropout_p if training else 0.)
+    attn_output = attn_output.permute(2, 0, 1, 3).reshape(tgt_len, bsz, embed_dim)
+    return F.linear(attn_output, out_proj_weight, out_proj_bias)
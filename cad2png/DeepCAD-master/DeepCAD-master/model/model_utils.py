@@ -26,7 +26,7 @@ def _get_key_padding_mask(commands, seq_dim=0):
         commands: Shape [S, ...]
     """
     with torch.no_grad():
-        key_padding_mask = (commands == EOS_IDX).cumsum(dim=seq_dim) > 0
+        key_padding_mask = (commands == EOS_IDX).long().cumsum(dim=seq_dim) > 0
 
         if seq_dim == 0:
             return key_padding_mask.transpose(0, 1)
@@ -35,7 +35,7 @@ def _get_key_padding_mask(commands, seq_dim=0):
 
 def _get_padding_mask(commands, seq_dim=0, extended=False):
     with torch.no_grad():
-        padding_mask = (commands == EOS_IDX).cumsum(dim=seq_dim) == 0
+        padding_mask = (commands == EOS_IDX).long().cumsum(dim=seq_dim) == 0
         padding_mask = padding_mask.float()
 
         if extended:
@@ -55,7 +55,7 @@ def _get_group_mask(commands, seq_dim=0):
     """
     with torch.no_grad():
         # group_mask = (commands == SOS_IDX).cumsum(dim=seq_dim)
-        group_mask = (commands == EXT_IDX).cumsum(dim=seq_dim)
+        group_mask = (commands == EXT_IDX).long().cumsum(dim=seq_dim)
         return group_mask
 
 
@@ -12,7 +12,7 @@ import random
 import sys
 sys.path.append("..")
 from trainer.base import BaseTrainer
-from utils import cycle, ensure_dirs, ensure_dir, read_ply, write_ply
+from utils import cycle, ensure_dirs, ensure_dir, read_ply, write_ply, PointCloudStore
 try:
     from pointnet2_ops.pointnet2_modules import PointnetFPModule, PointnetSAModule
 except Exception as e:
@@ -36,6 +36,7 @@ class Config(object):
     def __init__(self, args):
         self.data_root = os.path.join(args.proj_dir, args.exp_name, "results/all_zs_ckpt{}.h5".format(args.ae_ckpt))
         self.pc_root = args.pc_root
+        self.pc_store = args.pc_store
         self.split_path = args.split_path
         self.exp_dir = os.path.join(args.proj_dir, args.exp_name, "pc2cad")
         self.log_dir = os.path.join(self.exp_dir, 'log')
@@ -175,14 +176,27 @@ class ShapeCodesDataset(Dataset):
         with h5py.File(self.data_root, 'r') as fp:
             self.zs = fp["{}_zs".format(phase)][:]
 
-    def __getitem__(self, index):
-        data_id = self.all_data[index]
+        self.store = PointCloudStore(config.pc_store) if config.pc_store is not None else None
+
+    def load_pc(self, data_id):
+        """randomly subsampled point cloud, None if missing"""
+        if self.store is not None:
+            if data_id not in self.store:
+                return None
+            return self.store.sample(self.store.rows([data_id]), self.n_points)[0]
+
         pc_path = os.path.join(self.pc_root, data_id + '.ply')
         if not os.path.exists(pc_path):
-            return self.__getitem__(index + 1)
+            return None
         pc = read_ply(pc_path)
         sample_idx = random.sample(list(range(pc.shape[0])), self.n_points)
-        pc = pc[sample_idx]
+        return pc[sample_idx]
+
+    def __getitem__(self, index):
+        data_id = self.all_data[index]
+        pc = self.load_pc(data_id)
+        if pc is None:
+            return self.__getitem__(index + 1)
         pc = torch.tensor(pc, dtype=torch.float32)
         shape_code = torch.tensor(self.zs[index], dtype=torch.float32)
         return {"points": pc, "code": shape_code, "id": data_id}
@@ -203,6 +217,8 @@ parser = argparse.ArgumentParser()
 parser.add_argument('--proj_dir', type=str, default="proj_log",
                    help="path to project folder where models and logs will be saved")
 parser.add_argument('--pc_root', type=str, default="path_to_pc_data", help="path to point clouds data folder")
+parser.add_argument('--pc_store', type=str, default=None,
+                    help="packed point clouds (dataset/pack_pc.py), used instead of --pc_root if given")
 parser.add_argument('--split_path', type=str, default="data/train_val_test_split.json", help="path to train-val-test split")
 parser.add_argument('--exp_name', type=str, required=True, help="name of this experiment")
 parser.add_argument('--ae_ckpt', type=str, required=True, help="desired checkpoint to restore")
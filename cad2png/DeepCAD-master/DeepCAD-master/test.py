@@ -3,9 +3,11 @@ from dataset.cad_dataset import get_dataloader
 from config import ConfigAE
 from utils import ensure_dir
 from trainer import TrainerAE
+from trainer.base import inference_mode
 import torch
 import numpy as np
 import os
+import time
 import h5py
 from cadlib.macro import EOS_IDX
 
@@ -24,6 +26,18 @@ def main():
         raise ValueError
 
 
+def seq_lengths(commands):
+    """(N, ) index of the first EOS in each row of a (N, S) command array, S if there is none"""
+    is_eos = commands == EOS_IDX
+    return np.where(is_eos.any(axis=1), is_eos.argmax(axis=1), commands.shape[1])
+
+
+def report_throughput(n_samples, elapsed, precision):
+    """samples per second of the network forward, excluding data loading and saving"""
+    print("{} samples, network time {:.2f}s, {:.1f} samples/s ({})".format(
+        n_samples, elapsed, n_samples / max(elapsed, 1e-9), precision))
+
+
 def reconstruct(cfg):
     # create network and training agent
     tr_agent = TrainerAE(cfg)
@@ -31,6 +45,7 @@ def reconstruct(cfg):
     # load from checkpoint if provided
     tr_agent.load_ckpt(cfg.ckpt)
     tr_agent.net.eval()
+    tr_agent.set_inference_precision(cfg.precision)
 
     # create dataloader
     test_loader = get_dataloader('test', cfg)
@@ -38,30 +53,37 @@ def reconstruct(cfg):
 
     if cfg.outputs is None:
         cfg.outputs = "{}/results/test_{}".format(cfg.exp_dir, cfg.ckpt)
+        if cfg.precision != "fp32":
+            cfg.outputs += "_" + cfg.precision
     ensure_dir(cfg.outputs)
 
     # evaluate
+    n_samples, elapsed = 0, 0.
     pbar = tqdm(test_loader)
     for i, data in enumerate(pbar):
         batch_size = data['command'].shape[0]
         commands = data['command']
         args = data['args']
         gt_vec = torch.cat([commands.unsqueeze(-1), args], dim=-1).squeeze(1).detach().cpu().numpy()
-        commands_ = gt_vec[:, :, 0]
-        with torch.no_grad():
+        batch_seq_len = seq_lengths(gt_vec[:, :, 0])
+        start = time.perf_counter()
+        with inference_mode():
             outputs, _ = tr_agent.forward(data)
             batch_out_vec = tr_agent.logits2vec(outputs)
+        elapsed += time.perf_counter() - start
+        n_samples += batch_size
 
         for j in range(batch_size):
             out_vec = batch_out_vec[j]
-            seq_len = commands_[j].tolist().index(EOS_IDX)
+            seq_len = batch_seq_len[j]
 
             data_id = data["id"][j].split('/')[-1]
 
             save_path = os.path.join(cfg.outputs, '{}_vec.h5'.format(data_id))
             with h5py.File(save_path, 'w') as fp:
-                fp.create_dataset('out_vec', data=out_vec[:seq_len], dtype=np.int)
-                fp.create_dataset('gt_vec', data=gt_vec[j][:seq_len], dtype=np.int)
+                fp.create_dataset('out_vec', data=out_vec[:seq_len], dtype=np.int64)
+                fp.create_dataset('gt_vec', data=gt_vec[j][:seq_len], dtype=np.int64)
+    report_throughput(n_samples, elapsed, cfg.precision)
 
 
 def encode(cfg):
@@ -71,27 +93,38 @@ def encode(cfg):
     # load from checkpoint if provided
     tr_agent.load_ckpt(cfg.ckpt)
     tr_agent.net.eval()
+    tr_agent.set_inference_precision(cfg.precision)
 
     # create dataloader
     save_dir = "{}/results".format(cfg.exp_dir)
     ensure_dir(save_dir)
-    save_path = os.path.join(save_dir, 'all_zs_ckpt{}.h5'.format(cfg.ckpt))
+    save_name = 'all_zs_ckpt{}'.format(cfg.ckpt)
+    if cfg.precision != "fp32":
+        save_name += "_" + cfg.precision
+    save_path = os.path.join(save_dir, save_name + '.h5')
     fp = h5py.File(save_path, 'w')
+    n_samples, elapsed = 0, 0.
     for phase in ['train', 'validation', 'test']:
         train_loader = get_dataloader(phase, cfg, shuffle=False)
 
         # encode
-        all_zs = []
+        all_zs, all_ids = [], []
         pbar = tqdm(train_loader)
         for i, data in enumerate(pbar):
-            with torch.no_grad():
+            start = time.perf_counter()
+            with inference_mode():
                 z = tr_agent.encode(data, is_batch=True)
                 z = z.detach().cpu().numpy()[:, 0, :]
                 all_zs.append(z)
+            all_ids.extend(data['id'])
+            elapsed += time.perf_counter() - start
+            n_samples += len(z)
         all_zs = np.concatenate(all_zs, axis=0)
         print(all_zs.shape)
         fp.create_dataset('{}_zs'.format(phase), data=all_zs)
+        fp.create_dataset('{}_ids'.format(phase), data=np.array(all_ids, dtype='S')) # for deploy/latent_index.py
     fp.close()
+    report_throughput(n_samples, elapsed, cfg.precision)
 
 
 def decode(cfg):
@@ -101,29 +134,36 @@ def decode(cfg):
     # load from checkpoint if provided
     tr_agent.load_ckpt(cfg.ckpt)
     tr_agent.net.eval()
+    tr_agent.set_inference_precision(cfg.precision)
 
     # load latent zs
     with h5py.File(cfg.z_path, 'r') as fp:
         zs = fp['zs'][:]
     save_dir = cfg.z_path.split('.')[0] + '_dec'
+    if cfg.precision != "fp32":
+        save_dir += "_" + cfg.precision
     ensure_dir(save_dir)
 
     # decode
+    elapsed = 0.
     for i in range(0, len(zs), cfg.batch_size):
-        with torch.no_grad():
+        start = time.perf_counter()
+        with inference_mode():
             batch_z = torch.tensor(zs[i:i+cfg.batch_size], dtype=torch.float32).unsqueeze(1)
-            batch_z = batch_z.cuda()
+            batch_z = batch_z.to(tr_agent.device)
             outputs = tr_agent.decode(batch_z)
             batch_out_vec = tr_agent.logits2vec(outputs)
+        elapsed += time.perf_counter() - start
+        batch_seq_len = seq_lengths(batch_out_vec[:, :, 0])
 
         for j in range(len(batch_z)):
             out_vec = batch_out_vec[j]
-            out_command = out_vec[:, 0]
-            seq_len = out_command.tolist().index(EOS_IDX)
+            seq_len = batch_seq_len[j]
 
             save_path = os.path.join(save_dir, '{}.h5'.format(i + j))
             with h5py.File(save_path, 'w') as fp:
-                fp.create_dataset('out_vec', data=out_vec[:seq_len], dtype=np.int)
+                fp.create_dataset('out_vec', data=out_vec[:seq_len], dtype=np.int64)
+    report_throughput(len(zs), elapsed, cfg.precision)
 
 
 if __name__ == '__main__':
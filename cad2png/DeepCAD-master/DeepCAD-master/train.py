@@ -1,7 +1,9 @@
+import time
 from collections import OrderedDict
 from tqdm import tqdm
 import argparse
 from dataset.cad_dataset import get_dataloader
+from dataset.loader_utils import DevicePrefetcher
 from config import ConfigAE
 from utils import cycle
 from trainer import TrainerAE
@@ -19,7 +21,8 @@ def main():
         tr_agent.load_ckpt(cfg.ckpt)
 
     # create dataloader
-    train_loader = get_dataloader('train', cfg)
+    # batches are copied to the device one step ahead
+    train_loader = DevicePrefetcher(get_dataloader('train', cfg), tr_agent.device)
     val_loader = get_dataloader('validation', cfg)
     val_loader_all = get_dataloader('validation', cfg)
     val_loader = cycle(val_loader)
@@ -30,12 +33,19 @@ def main():
     for e in range(clock.epoch, cfg.nr_epochs):
         # begin iteration
         pbar = tqdm(train_loader)
+        data_start = time.time()
         for b, data in enumerate(pbar):
+            data_time = time.time() - data_start
+
             # train step
             outputs, losses = tr_agent.train_func(data)
+            losses = OrderedDict({k: v.item() for k, v in losses.items()}) # waits for the device
+            compute_time = time.time() - data_start - data_time
+            tr_agent.record_step_time(data_time, compute_time)
 
             pbar.set_description("EPOCH[{}][{}]".format(e, b))
-            pbar.set_postfix(OrderedDict({k: v.item() for k, v in losses.items()}))
+            losses.update(data_ms=1000 * data_time, step_ms=1000 * compute_time)
+            pbar.set_postfix(losses)
 
             # validation step
             if clock.step % cfg.val_frequency == 0:
@@ -45,6 +55,7 @@ def main():
             clock.tick()
 
             tr_agent.update_learning_rate()
+            data_start = time.time()
 
         if clock.epoch % 5 == 0:
             tr_agent.evaluate(val_loader_all)
@@ -57,6 +68,9 @@ def main():
         # if clock.epoch % 10 == 0:
         tr_agent.save_ckpt('latest')
 
+    # checkpoints are written in the background
+    tr_agent.checkpoint_writer.close()
+
 
 if __name__ == '__main__':
     main()
@@ -1,9 +1,77 @@
 import os
+import contextlib
 import torch
 import torch.optim as optim
 import torch.nn as nn
 from abc import abstractmethod
 from tensorboardX import SummaryWriter
+from .checkpoint import AsyncCheckpointWriter
+
+
+def inference_mode():
+    """torch.inference_mode context if available (torch >= 1.9), torch.no_grad otherwise"""
+    if hasattr(torch, "inference_mode"):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def autocast(device, dtype=None):
+    """torch.autocast context on the given device (torch >= 1.10), no-op if dtype is None"""
+    if dtype is None:
+        return contextlib.nullcontext()
+    if not hasattr(torch, "autocast"):
+        raise ValueError("mixed precision requires torch >= 1.10, found {}".format(torch.__version__))
+    return torch.autocast(device.type, dtype=dtype)
+
+
+AMP_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+class NoGradScaler(object):
+    """pass-through with the GradScaler interface, for fp32 / bf16 training and torch without amp"""
+    def scale(self, loss):
+        return loss
+
+    def unscale_(self, optimizer):
+        pass
+
+    def step(self, optimizer):
+        optimizer.step()
+
+    def update(self):
+        pass
+
+    def state_dict(self):
+        return {}
+
+    def load_state_dict(self, state_dict):
+        pass
+
+
+def grad_scaler(device, enabled):
+    """loss scaler for fp16 training, a pass-through if not enabled"""
+    if not enabled:
+        return NoGradScaler()
+    if hasattr(torch, "amp") and hasattr(torch.amp, "GradScaler"):
+        return torch.amp.GradScaler(device.type)
+    if device.type == "cuda" and hasattr(torch, "cuda") and hasattr(torch.cuda, "amp") \
+            and hasattr(torch.cuda.amp, "GradScaler"):
+        return torch.cuda.amp.GradScaler()
+    raise ValueError("fp16 training on {} is not supported by torch {} (cuda needs torch >= 1.6, cpu >= 2.3)".format(
+        device, torch.__version__))
+
+
+def setup_device(cfg):
+    """resolve the torch device from cfg.device ("cuda", "cpu" or None for cuda if available).
+    On CPU, the number of intra-op threads is set to cfg.num_threads if given."""
+    device = getattr(cfg, "device", None)
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device)
+    num_threads = getattr(cfg, "num_threads", None)
+    if device.type == "cpu" and num_threads is not None:
+        torch.set_num_threads(num_threads)
+    return device
 
 
 class BaseTrainer(object):
@@ -17,6 +85,19 @@ class BaseTrainer(object):
         self.model_dir = cfg.model_dir
         self.clock = TrainClock()
         self.batch_size = cfg.batch_size
+        self.device = setup_device(cfg)
+        self.step_times = {"data_wait": 0.0, "compute": 0.0}
+        self.n_timed_steps = 0
+
+        # mixed precision: the forward runs under autocast in amp_dtype, fp16 losses are scaled
+        self.amp_dtype = AMP_DTYPES.get(getattr(cfg, "amp", None))
+        self.scaler = grad_scaler(self.device, self.amp_dtype == torch.float16)
+        # gradient accumulation: the optimizer steps once every accum_steps training steps
+        self.accum_steps = getattr(cfg, "accum_steps", 1)
+        if self.accum_steps < 1:
+            raise ValueError("accum_steps must be at least 1, got {}".format(self.accum_steps))
+        self.n_accumulated = 0
+        self.checkpoint_writer = AsyncCheckpointWriter(getattr(cfg, "keep_ckpts", None))
 
         # build network
         self.build_net(cfg)
@@ -45,7 +126,7 @@ class BaseTrainer(object):
         self.scheduler = optim.lr_scheduler.StepLR(self.optimizer, cfg.lr_step_size)
 
     def save_ckpt(self, name=None):
-        """save checkpoint during training for future restore"""
+        """save checkpoint during training for future restore. The write finishes in the background."""
         if name is None:
             save_path = os.path.join(self.model_dir, "ckpt_epoch{}.pth".format(self.clock.epoch))
             print("Saving checkpoint epoch {}...".format(self.clock.epoch))
@@ -53,27 +134,27 @@ class BaseTrainer(object):
             save_path = os.path.join(self.model_dir, "{}.pth".format(name))
 
         if isinstance(self.net, nn.DataParallel):
-            model_state_dict = self.net.module.cpu().state_dict()
+            model_state_dict = self.net.module.state_dict()
         else:
-            model_state_dict = self.net.cpu().state_dict()
+            model_state_dict = self.net.state_dict()
 
-        torch.save({
+        self.checkpoint_writer.save({
             'clock': self.clock.make_checkpoint(),
             'model_state_dict': model_state_dict,
             'optimizer_state_dict': self.optimizer.state_dict(),
             'scheduler_state_dict': self.scheduler.state_dict(),
+            'scaler_state_dict': self.scaler.state_dict(),
         }, save_path)
 
-        self.net.cuda()
-
     def load_ckpt(self, name=None):
         """load checkpoint from saved checkpoint"""
         name = name if name == 'latest' else "ckpt_epoch{}".format(name)
         load_path = os.path.join(self.model_dir, "{}.pth".format(name))
+        self.checkpoint_writer.wait()
         if not os.path.exists(load_path):
             raise ValueError("Checkpoint {} not exists.".format(load_path))
 
-        checkpoint = torch.load(load_path)
+        checkpoint = torch.load(load_path, map_location=self.device)
         print("Loading checkpoint from {} ...".format(load_path))
         if isinstance(self.net, nn.DataParallel):
             self.net.module.load_state_dict(checkpoint['model_state_dict'])
@@ -81,6 +162,8 @@ class BaseTrainer(object):
             self.net.load_state_dict(checkpoint['model_state_dict'])
         self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
         self.scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
+        if checkpoint.get('scaler_state_dict'): # empty for runs without fp16
+            self.scaler.load_state_dict(checkpoint['scaler_state_dict'])
         self.clock.restore_checkpoint(checkpoint['clock'])
 
     @abstractmethod
@@ -90,16 +173,26 @@ class BaseTrainer(object):
         raise NotImplementedError
 
     def update_network(self, loss_dict):
-        """update network by back propagation"""
-        loss = sum(loss_dict.values())
-        self.optimizer.zero_grad()
-        loss.backward()
+        """update network by back propagation. Gradients are accumulated over accum_steps calls
+        (the loss is averaged over them) before the optimizer steps."""
+        loss = sum(loss_dict.values()) / self.accum_steps
+        self.scaler.scale(loss).backward()
+        self.n_accumulated += 1
+        if self.n_accumulated < self.accum_steps:
+            return
+        self.n_accumulated = 0
+
         if self.cfg.grad_clip is not None:
+            self.scaler.unscale_(self.optimizer)
             nn.utils.clip_grad_norm_(self.net.parameters(), self.cfg.grad_clip)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer) # skipped if fp16 gradients overflowed
+        self.scaler.update()
+        self.optimizer.zero_grad()
 
     def update_learning_rate(self):
-        """record and update learning rate"""
+        """record and update learning rate, once per optimizer step"""
+        if self.n_accumulated != 0:
+            return
         self.train_tb.add_scalar('learning_rate', self.optimizer.param_groups[-1]['lr'], self.clock.epoch)
         self.scheduler.step()
 
@@ -111,6 +204,22 @@ class BaseTrainer(object):
         for k, v in losses_values.items():
             tb.add_scalar(k, v, self.clock.step)
 
+    def record_step_time(self, data_time, compute_time, frequency=10):
+        """accumulate the time a training step waited for data and computed, and record the averages
+        to tensorboard every frequency steps"""
+        self.step_times["data_wait"] += data_time
+        self.step_times["compute"] += compute_time
+        self.n_timed_steps += 1
+        if self.n_timed_steps < frequency:
+            return
+        total = sum(self.step_times.values())
+        for k, v in self.step_times.items():
+            self.train_tb.add_scalar("time/" + k, v / self.n_timed_steps, self.clock.step)
+        self.train_tb.add_scalar("time/data_wait_ratio", self.step_times["data_wait"] / max(total, 1e-12),
+                                 self.clock.step)
+        self.step_times = {k: 0.0 for k in self.step_times}
+        self.n_timed_steps = 0
+
     def train_func(self, data):
         """one step of training"""
         self.net.train()
@@ -127,7 +236,7 @@ class BaseTrainer(object):
         """one step of validation"""
         self.net.eval()
 
-        with torch.no_grad():
+        with inference_mode():
             outputs, losses = self.forward(data)
 
         self.record_losses(losses, 'validation')
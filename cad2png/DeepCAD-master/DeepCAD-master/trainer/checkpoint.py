@@ -0,0 +1,83 @@
+import os
+import re
+import copy
+import glob
+import torch
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncCheckpointWriter(object):
+    """Save checkpoints in a background thread without moving the live networks.
+
+    save() snapshots every tensor of the state into CPU buffers (pinned for cuda tensors, so the copies are
+    asynchronous) that are reused from one save to the next, and returns. The writer thread waits for the
+    copies, writes to a temporary file and renames it, so an interrupted save never leaves a truncated
+    checkpoint. Only one save is in flight: the next save waits for the previous write to finish.
+    """
+    def __init__(self, keep_last=None, pattern="ckpt_epoch*.pth"):
+        """
+        Args:
+            keep_last (int): number of periodic checkpoints (file names matching pattern) to keep in their
+                folder, older ones are deleted after each save. None keeps all.
+            pattern (str): glob of the periodic checkpoints, named checkpoints like latest.pth are never deleted
+        """
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1, got {}".format(keep_last))
+        self.keep_last = keep_last
+        self.pattern = pattern
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._buffers = {}
+
+    def _snapshot(self, obj, key=""):
+        """copy of obj with every tensor copied into a CPU buffer"""
+        if isinstance(obj, torch.Tensor):
+            buffer = self._buffers.get(key)
+            if buffer is None or buffer.shape != obj.shape or buffer.dtype != obj.dtype:
+                buffer = torch.empty(obj.shape, dtype=obj.dtype, pin_memory=obj.is_cuda)
+                self._buffers[key] = buffer
+            buffer.copy_(obj.detach(), non_blocking=obj.is_cuda)
+            return buffer
+        if isinstance(obj, dict):
+            return type(obj)((k, self._snapshot(v, "{}/{}".format(key, k))) for k, v in obj.items())
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._snapshot(v, "{}/{}".format(key, i)) for i, v in enumerate(obj))
+        return copy.deepcopy(obj)
+
+    def save(self, state, save_path):
+        """snapshot state (nested dicts / lists of tensors and python values) and write it to save_path
+        in the background. Errors of the previous write are raised here."""
+        self.wait()
+        snapshot = self._snapshot(state)
+        copied = None
+        if torch.cuda.is_available():
+            copied = torch.cuda.Event()
+            copied.record()
+        self._pending = self._executor.submit(self._write, snapshot, save_path, copied)
+
+    def _write(self, snapshot, save_path, copied):
+        if copied is not None:
+            copied.synchronize()
+        tmp_path = save_path + ".tmp"
+        torch.save(snapshot, tmp_path)
+        os.replace(tmp_path, save_path)
+        if self.keep_last is not None:
+            self._remove_old(os.path.dirname(save_path))
+
+    def _remove_old(self, save_dir):
+        def number(path):
+            digits = re.findall(r"\d+", os.path.basename(path))
+            return int(digits[-1]) if digits else -1
+        paths = sorted(glob.glob(os.path.join(save_dir, self.pattern)), key=number)
+        for path in paths[:max(len(paths) - self.keep_last, 0)]:
+            os.remove(path)
+
+    def wait(self):
+        """block until the pending write is on disk"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
@@ -1,8 +1,9 @@
 import torch
+import torch.nn as nn
 import torch.optim as optim
 from tqdm import tqdm
 from model import CADTransformer
-from .base import BaseTrainer
+from .base import BaseTrainer, autocast
 from .loss import CADLoss
 from .scheduler import GradualWarmupScheduler
 from cadlib.macro import *
@@ -10,46 +11,67 @@ from cadlib.macro import *
 
 class TrainerAE(BaseTrainer):
     def build_net(self, cfg):
-        self.net = CADTransformer(cfg).cuda()
+        self.net = CADTransformer(cfg).to(self.device)
+        self.cmd_args_mask = torch.tensor(CMD_ARGS_MASK).bool().to(self.device)
 
     def set_optimizer(self, cfg):
         """set optimizer and lr scheduler used in training"""
         self.optimizer = optim.Adam(self.net.parameters(), cfg.lr)
         self.scheduler = GradualWarmupScheduler(self.optimizer, 1.0, cfg.warmup_step)
 
+    def set_inference_precision(self, precision):
+        """set the numerical precision of the network for inference. Call after load_ckpt.
+
+        Args:
+            precision (str): "fp32"; "int8": dynamic int8 quantization of all Linear layers (encoder, decoder
+                and FCN heads), CPU only; "bf16": bfloat16 autocast
+        """
+        if precision == "int8":
+            if self.device.type != "cpu":
+                raise ValueError("dynamic int8 quantization only runs on CPU, got device {}".format(self.device))
+            self.net = torch.quantization.quantize_dynamic(self.net, {nn.Linear}, dtype=torch.qint8)
+        elif precision == "bf16":
+            self.amp_dtype = torch.bfloat16
+        elif precision != "fp32":
+            raise ValueError("unknown precision: {}".format(precision))
+
     def set_loss_function(self):
-        self.loss_func = CADLoss(self.cfg).cuda()
+        self.loss_func = CADLoss(self.cfg).to(self.device)
 
     def forward(self, data):
-        commands = data['command'].cuda() # (N, S)
-        args = data['args'].cuda()  # (N, S, N_ARGS)
+        commands = data['command'].to(self.device, non_blocking=True) # (N, S)
+        args = data['args'].to(self.device, non_blocking=True)  # (N, S, N_ARGS)
 
-        outputs = self.net(commands, args)
-        loss_dict = self.loss_func(outputs)
+        with autocast(self.device, self.amp_dtype):
+            outputs = self.net(commands, args)
+            loss_dict = self.loss_func(outputs) # autocast computes cross entropy in fp32
 
         return outputs, loss_dict
 
     def encode(self, data, is_batch=False):
         """encode into latent vectors"""
-        commands = data['command'].cuda()
-        args = data['args'].cuda()
+        commands = data['command'].to(self.device, non_blocking=True)
+        args = data['args'].to(self.device, non_blocking=True)
         if not is_batch:
             commands = commands.unsqueeze(0)
             args = args.unsqueeze(0)
-        z = self.net(commands, args, encode_mode=True)
-        return z
+        with autocast(self.device, self.amp_dtype):
+            z = self.net(commands, args, encode_mode=True)
+        return z.float()
 
     def decode(self, z):
         """decode given latent vectors"""
-        outputs = self.net(None, None, z=z, return_tgt=False)
+        with autocast(self.device, self.amp_dtype):
+            outputs = self.net(None, None, z=z, return_tgt=False)
         return outputs
 
     def logits2vec(self, outputs, refill_pad=True, to_numpy=True):
-        """network outputs (logits) to final CAD vector"""
-        out_command = torch.argmax(torch.softmax(outputs['command_logits'], dim=-1), dim=-1)  # (N, S)
-        out_args = torch.argmax(torch.softmax(outputs['args_logits'], dim=-1), dim=-1) - 1  # (N, S, N_ARGS)
+        """network outputs (logits) to final CAD vector. The whole batch is copied to host at once."""
+        # softmax is monotonic, take the argmax of the logits directly
+        out_command = torch.argmax(outputs['command_logits'], dim=-1)  # (N, S)
+        out_args = torch.argmax(outputs['args_logits'], dim=-1) - 1  # (N, S, N_ARGS)
         if refill_pad: # fill all unused element to -1
-            mask = ~torch.tensor(CMD_ARGS_MASK).bool().cuda()[out_command.long()]
+            mask = ~self.cmd_args_mask[out_command.long()]
             out_args[mask] = -1
 
         out_cad_vec = torch.cat([out_command.unsqueeze(-1), out_args], dim=-1)
@@ -70,8 +92,8 @@ class TrainerAE(BaseTrainer):
 
         for i, data in enumerate(pbar):
             with torch.no_grad():
-                commands = data['command'].cuda()
-                args = data['args'].cuda()
+                commands = data['command'].to(self.device, non_blocking=True)
+                args = data['args'].to(self.device, non_blocking=True)
                 outputs = self.net(commands, args)
                 out_args = torch.argmax(torch.softmax(outputs['args_logits'], dim=-1), dim=-1) - 1
                 out_args = out_args.long().detach().cpu().numpy()  # (N, S, n_args)
@@ -84,7 +106,7 @@ class TrainerAE(BaseTrainer):
             arc_pos = np.where(gt_commands == ARC_IDX)
             circle_pos = np.where(gt_commands == CIRCLE_IDX)
 
-            args_comp = (gt_args == out_args).astype(np.int)
+            args_comp = (gt_args == out_args).astype(np.int64)
             all_ext_args_comp.append(args_comp[ext_pos][:, -N_ARGS_EXT:])
             all_line_args_comp.append(args_comp[line_pos][:, :2])
             all_arc_args_comp.append(args_comp[arc_pos][:, :4])
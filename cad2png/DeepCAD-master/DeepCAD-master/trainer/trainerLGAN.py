@@ -1,4 +1,5 @@
 import os
+import time
 import numpy as np
 import torch
 import torch.autograd as autograd
@@ -18,6 +19,8 @@ class TrainerLatentWGAN(BaseTrainer):
         self.save_frequency = cfg.save_frequency
         self.gp_lambda = cfg.gp_lambda
         self.n_dim = cfg.n_dim
+        self.log_frequency = getattr(cfg, "log_frequency", 10)
+        self._speed_start = None
 
         # build netD and netG
         self.build_net(cfg)
@@ -26,8 +29,8 @@ class TrainerLatentWGAN(BaseTrainer):
         self.set_optimizer(cfg)
 
     def build_net(self, cfg):
-        self.netD = Discriminator(cfg.h_dim, cfg.z_dim).cuda()
-        self.netG = Generator(cfg.n_dim, cfg.h_dim, cfg.z_dim).cuda()
+        self.netD = Discriminator(cfg.h_dim, cfg.z_dim).to(self.device)
+        self.netG = Generator(cfg.n_dim, cfg.h_dim, cfg.z_dim).to(self.device)
 
     def eval(self):
         self.netD.eval()
@@ -46,25 +49,23 @@ class TrainerLatentWGAN(BaseTrainer):
         else:
             save_path = os.path.join(self.model_dir, "{}.pth".format(name))
 
-        torch.save({
+        self.checkpoint_writer.save({
             'clock': self.clock.make_checkpoint(),
-            'netG_state_dict': self.netG.cpu().state_dict(),
-            'netD_state_dict': self.netD.cpu().state_dict(),
+            'netG_state_dict': self.netG.state_dict(),
+            'netD_state_dict': self.netD.state_dict(),
             'optimizerG_state_dict': self.optimizerG.state_dict(),
             'optimizerD_state_dict': self.optimizerD.state_dict(),
         }, save_path)
 
-        self.netG.cuda()
-        self.netD.cuda()
-
     def load_ckpt(self, name=None):
         """load checkpoint from saved checkpoint"""
         name = name if name == 'latest' else "ckpt_epoch{}".format(name)
         load_path = os.path.join(self.model_dir, "{}.pth".format(name))
+        self.checkpoint_writer.wait()
         if not os.path.exists(load_path):
             raise ValueError("Checkpoint {} not exists.".format(load_path))
 
-        checkpoint = torch.load(load_path)
+        checkpoint = torch.load(load_path, map_location=self.device)
         print("Loading checkpoint from {} ...".format(load_path))
         self.netG.load_state_dict(checkpoint['netG_state_dict'])
         self.netD.load_state_dict(checkpoint['netD_state_dict'])
@@ -73,33 +74,40 @@ class TrainerLatentWGAN(BaseTrainer):
         self.clock.restore_checkpoint(checkpoint['clock'])
 
     def calc_gradient_penalty(self, netD, real_data, fake_data):
-        alpha = torch.rand(self.batch_size, 1)
+        alpha = torch.rand(self.batch_size, 1, device=self.device)
         alpha = alpha.expand(real_data.size())
-        alpha = alpha.cuda() # if use_cuda else alpha
 
         interpolates = alpha * real_data.detach() + ((1 - alpha) * fake_data.detach())
 
-        interpolates = interpolates.cuda()
         interpolates.requires_grad_(True)
 
         disc_interpolates = netD(interpolates)
 
         gradients = autograd.grad(outputs=disc_interpolates, inputs=interpolates,
-                                  grad_outputs=torch.ones(disc_interpolates.size()).cuda(),
+                                  grad_outputs=torch.ones_like(disc_interpolates),
                                   create_graph=True, retain_graph=True, only_inputs=True)[0]
 
         gradients = gradients.view(gradients.size(0), -1)
         gradient_penalty = ((gradients.norm(2, dim=1) - 1) ** 2).mean() * self.gp_lambda # LAMBDA
         return gradient_penalty
 
+    def record_speed(self):
+        """record training iterations per second since the previous call"""
+        now = time.time()
+        if self._speed_start is not None:
+            start_time, start_step = self._speed_start
+            iters_per_sec = (self.clock.step - start_step) / max(now - start_time, 1e-12)
+            self.train_tb.add_scalar("iters_per_sec", iters_per_sec, global_step=self.clock.step)
+        self._speed_start = (now, self.clock.step)
+
     def train(self, dataloader):
         """training process"""
         data = cycle(dataloader)
 
         one = torch.FloatTensor([1])
         mone = one * -1
-        one = one.cuda()
-        mone = mone.cuda()
+        one = one.to(self.device)
+        mone = mone.to(self.device)
 
         pbar = tqdm(range(self.clock.step, self.n_iters))
         for iteration in pbar:
@@ -112,7 +120,7 @@ class TrainerLatentWGAN(BaseTrainer):
             for iter_d in range(self.critic_iters):
                 real_data = next(data)
 
-                real_data = real_data.cuda()
+                real_data = real_data.to(self.device, non_blocking=True)
                 real_data.requires_grad_(True)
 
                 self.netD.zero_grad()
@@ -123,8 +131,7 @@ class TrainerLatentWGAN(BaseTrainer):
                 D_real.backward(mone)
 
                 # train with fake
-                noise = torch.randn(self.batch_size, self.n_dim)
-                noise = noise.cuda()
+                noise = torch.randn(self.batch_size, self.n_dim, device=self.device)
                 fake = self.netG(noise).detach()
                 inputv = fake
                 D_fake = self.netD(inputv)
@@ -147,8 +154,7 @@ class TrainerLatentWGAN(BaseTrainer):
                 p.requires_grad = False  # to avoid computation
             self.netG.zero_grad()
 
-            noise = torch.randn(self.batch_size, self.n_dim)
-            noise = noise.cuda()
+            noise = torch.randn(self.batch_size, self.n_dim, device=self.device)
             noise.requires_grad_(True)
 
             fake = self.netG(noise)
@@ -165,9 +171,70 @@ class TrainerLatentWGAN(BaseTrainer):
 
             # save model
             self.clock.tick()
+            if self.clock.step % self.log_frequency == 0:
+                self.record_speed()
             if self.clock.step % self.save_frequency == 0:
                 self.save_ckpt()
 
+        self.checkpoint_writer.wait()
+
+    def critic_step(self, real_data, fake_data, alpha):
+        """one discriminator update. Real and fake samples go through netD in one forward pass, and the WGAN-GP
+        loss D_fake - D_real + gradient penalty is back-propagated once. The interpolates get their own pass,
+        so the double backward of the penalty only runs over them."""
+        n = real_data.size(0)
+        scores = self.netD(torch.cat([real_data, fake_data], dim=0))
+        D_real, D_fake = scores[:n].mean(), scores[n:].mean()
+
+        interpolates = (alpha * real_data + (1 - alpha) * fake_data).requires_grad_(True)
+        disc_interpolates = self.netD(interpolates)
+        gradients = autograd.grad(outputs=disc_interpolates.sum(), inputs=interpolates, create_graph=True)[0]
+        gradient_penalty = ((gradients.norm(2, dim=1) - 1) ** 2).mean() * self.gp_lambda
+
+        D_cost = D_fake - D_real + gradient_penalty
+        self.optimizerD.zero_grad()
+        D_cost.backward()
+        self.optimizerD.step()
+        return D_cost.detach(), (D_real - D_fake).detach()
+
+    def train_in_memory(self, sampler):
+        """training process on latents resident on the device (dataset.lgan_dataset.LatentSampler).
+        The generator is fixed during the critic iterations, so their real batches, fake batches and
+        interpolation weights are drawn at once. Losses are copied to host every log_frequency iterations."""
+        shape = (self.critic_iters, self.batch_size)
+
+        pbar = tqdm(range(self.clock.step, self.n_iters))
+        for iteration in pbar:
+            # (1) Update D network
+            self.netD.requires_grad_(True)
+            real_data = sampler.sample(self.critic_iters) # (critic_iters, batch_size, z_dim)
+            with torch.no_grad():
+                noise = torch.randn(self.critic_iters * self.batch_size, self.n_dim, device=self.device)
+                fake_data = self.netG(noise).view(*shape, -1)
+            alpha = torch.rand(*shape, 1, device=self.device)
+            for iter_d in range(self.critic_iters):
+                D_cost, Wasserstein_D = self.critic_step(real_data[iter_d], fake_data[iter_d], alpha[iter_d])
+
+            # (2) Update G network
+            self.netD.requires_grad_(False) # to avoid computation
+            self.optimizerG.zero_grad()
+            noise = torch.randn(self.batch_size, self.n_dim, device=self.device)
+            G_cost = -self.netD(self.netG(noise)).mean()
+            G_cost.backward()
+            self.optimizerG.step()
+
+            self.clock.tick()
+            if self.clock.step % self.log_frequency == 0:
+                losses = {"D_loss": D_cost.item(), "G_loss": G_cost.item()}
+                pbar.set_postfix(losses)
+                self.train_tb.add_scalars("loss", losses, global_step=self.clock.step)
+                self.train_tb.add_scalar("wasserstein distance", Wasserstein_D.item(), global_step=self.clock.step)
+                self.record_speed()
+            if self.clock.step % self.save_frequency == 0:
+                self.save_ckpt()
+
+        self.checkpoint_writer.wait()
+
     def generate(self, n_samples, return_score=False):
         """generate samples"""
         self.eval()
@@ -176,7 +243,7 @@ class TrainerLatentWGAN(BaseTrainer):
         generated_z = []
         z_scores = []
         for i in range(chunk_num):
-            noise = torch.randn(self.batch_size, self.n_dim).cuda()
+            noise = torch.randn(self.batch_size, self.n_dim, device=self.device)
             with torch.no_grad():
                 fake = self.netG(noise)
                 G_score = self.netD(fake)
@@ -187,7 +254,7 @@ class TrainerLatentWGAN(BaseTrainer):
             print("chunk {} finished.".format(i))
 
         remains = n_samples - self.batch_size * chunk_num
-        noise = torch.randn(remains, self.n_dim).cuda()
+        noise = torch.randn(remains, self.n_dim, device=self.device)
         with torch.no_grad():
             fake = self.netG(noise)
             G_score = self.netD(fake)
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from .pc_utils import read_ply
+
+POINTS_NAME = "points.npy"
+INDEX_NAME = "index.npz"
+N_PERMUTATIONS = 64
+
+
+def build_pc_store(pc_root, data_ids, save_dir, n_points, dtype=np.float32, seed=0):
+    """pack <pc_root>/<data_id>.ply point clouds into one (n_models, n_points, 3) memory-mappable array.
+
+    Clouds with more than n_points points are randomly subsampled, clouds with fewer points are skipped.
+
+    Returns:
+        list: data ids that were skipped (missing file or too few points)
+    """
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    rng = np.random.RandomState(seed)
+    available, skipped = [], []
+    for data_id in data_ids:
+        exists = os.path.exists(os.path.join(pc_root, data_id + ".ply"))
+        (available if exists else skipped).append(data_id)
+
+    tmp_path = os.path.join(save_dir, POINTS_NAME + ".tmp")
+    points = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(len(available), n_points, 3))
+    ids = []
+    for data_id in available:
+        pc = read_ply(os.path.join(pc_root, data_id + ".ply"))
+        if pc.shape[0] < n_points:
+            skipped.append(data_id)
+            continue
+        if pc.shape[0] > n_points:
+            pc = pc[rng.choice(pc.shape[0], n_points, replace=False)]
+        points[len(ids)] = pc
+        ids.append(data_id)
+    points.flush()
+    del points
+
+    if len(ids) < len(available):
+        # drop the unused tail rows of skipped clouds
+        full = np.load(tmp_path, mmap_mode="r")
+        np.save(os.path.join(save_dir, POINTS_NAME), full[:len(ids)])
+        del full
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, os.path.join(save_dir, POINTS_NAME))
+    np.savez(os.path.join(save_dir, INDEX_NAME), ids=np.array(ids, dtype=str))
+    return skipped
+
+
+class PointCloudStore(object):
+    """Read-only view of a packed point cloud store written by build_pc_store.
+
+    The points array is memory-mapped (lazily, so that each dataloader worker maps it once), and random
+    subsets of points are drawn by gathering with a small set of preset random permutations.
+    """
+    def __init__(self, store_dir, seed=0):
+        self.store_dir = store_dir
+        with np.load(os.path.join(store_dir, INDEX_NAME)) as fp:
+            self.ids = fp["ids"].tolist()
+        self.id2row = {data_id: i for i, data_id in enumerate(self.ids)}
+        self._points = None
+        self.seed = seed
+        self._permutations = None
+
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = np.load(os.path.join(self.store_dir, POINTS_NAME), mmap_mode="r")
+        return self._points
+
+    @property
+    def n_points(self):
+        return self.points.shape[1]
+
+    @property
+    def permutations(self):
+        """(N_PERMUTATIONS, n_points) preset random permutations of point indices"""
+        if self._permutations is None:
+            rng = np.random.RandomState(self.seed)
+            self._permutations = np.stack([rng.permutation(self.n_points) for _ in range(N_PERMUTATIONS)])
+        return self._permutations
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, data_id):
+        return data_id in self.id2row
+
+    def rows(self, data_ids):
+        return np.array([self.id2row[data_id] for data_id in data_ids], dtype=np.int64)
+
+    def get(self, data_id):
+        """all points of one model, (n_points, 3) float32"""
+        return np.asarray(self.points[self.id2row[data_id]], dtype=np.float32)
+
+    def sample(self, rows, n_points):
+        """randomly subsample n_points points from each of the given rows.
+
+        Returns:
+            np.array: (len(rows), n_points, 3) float32
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if n_points > self.n_points:
+            raise ValueError("store has only {} points per model, {} requested".format(self.n_points, n_points))
+        perm_idx = np.random.randint(0, N_PERMUTATIONS, size=len(rows))
+        point_idx = self.permutations[perm_idx, :n_points]
+        # read whole rows once (sequential mmap access), then gather in memory
+        points = self.points[rows]
+        return points[np.arange(len(rows))[:, np.newaxis], point_idx].astype(np.float32)
+
+
+def normalize_pcs(points):
+    """scale every point cloud of a (n, n_points, 3) batch into the unit cube"""
+    return points / np.max(np.abs(points), axis=(1, 2), keepdims=True)
@@ -3,148 +3,170 @@
 """
 批量CAD转换工具
 将CAD JSON文件批量转换为2D和3D图片
+每个JSON只解析一次，在同一进程内由内存中的模型依次渲染2D、3D和组合视图，
+组合视图直接由内存中的PNG数据拼合，不再调用子进程或回读磁盘图片。
 """
 
+import io
 import os
 import json
-import subprocess
 import time
 from pathlib import Path
 import argparse
+import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+from cad_to_image import create_visualizer, renderer_version, render_options, RENDERERS
+from cad_3d_visualizer import CAD3DVisualizer, RENDERER_VERSION as RENDERER_3D_VERSION
+from build_manifest import BuildManifest, file_hash
+from render_pool import run_render_tasks, default_workers
 
-def run_conversion_script(script_path, args):
-    """运行转换脚本"""
-    try:
-        cmd = ['python', script_path] + args
-        print(f"执行命令: {' '.join(cmd)}")
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        
-        if result.returncode == 0:
-            print(f"✅ {script_path} 执行成功")
-            if result.stdout:
-                print(result.stdout)
-        else:
-            print(f"❌ {script_path} 执行失败")
-            if result.stderr:
-                print(result.stderr)
-            return False
-            
-    except Exception as e:
-        print(f"❌ 执行 {script_path} 时出错: {e}")
-        return False
-    
-    return True
+# 组合视图输出发生变化时递增，使增量构建清单中的旧图片失效
+COMBINED_VERSION = 2
+
+# 各类输出的目录和文件名格式
+OUTPUT_DIRS = {
+    '2d': 'cad/images',
+    '3d': 'cad/3d_images',
+    'combined': 'cad/combined',
+}
+OUTPUT_NAMES = {
+    '2d': '{stem}.png',
+    '3d': '{stem}_3d.png',
+    'combined': '{stem}_combined.png',
+}
 
 def create_output_directories():
     """创建输出目录"""
-    dirs = ['cad/images', 'cad/3d_images', 'cad/combined']
-    for dir_path in dirs:
+    for dir_path in OUTPUT_DIRS.values():
         Path(dir_path).mkdir(parents=True, exist_ok=True)
         print(f"📁 创建目录: {dir_path}")
 
-def generate_2d_images(input_dir='cad/cadl', output_dir='cad/images'):
-    """生成2D图片"""
-    print("\n🖼️  开始生成2D图片...")
+def _init_pipeline_worker(renderer, image_size, style, extrude_height):
+    """工作进程初始化：2D、3D和组合视图的figure在进程内复用"""
+    fig, axes = plt.subplots(1, 2, figsize=(20, 10))
+    return {
+        '2d': create_visualizer(renderer, 'png', image_size),
+        '3d': CAD3DVisualizer(),
+        'combined': (fig, axes),
+        'style': style,
+        'extrude_height': extrude_height,
+    }
+
+def _render_3d_png(state, cad_data):
+    """由内存中的模型渲染3D视图，返回PNG数据"""
+    visualizer = state['3d']
+    if state['style'] == 'wireframe':
+        visualizer.create_wireframe_model(cad_data, state['extrude_height'])
+    else:
+        visualizer.create_extruded_model(cad_data, state['extrude_height'])
+    visualizer.add_metadata_info(cad_data)
+    return visualizer.to_png_bytes()
+
+def _compose_combined(state, stem, png_2d, png_3d, output_file):
+    """由内存中的2D和3D PNG数据拼合组合视图"""
+    fig, (ax1, ax2) = state['combined']
+    for ax, png, title in ((ax1, png_2d, '2D视图'), (ax2, png_3d, '3D视图')):
+        ax.clear()
+        ax.imshow(mpimg.imread(io.BytesIO(png), format='png'))
+        ax.set_title(f'{title} - {stem}', fontsize=14, fontweight='bold')
+        ax.axis('off')
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+
+def _convert_file(state, task):
+    """
+    转换单个JSON文件：解析一次，按需渲染2D/3D并写出，再由内存数据拼合组合视图。
+    组合视图需要但本次无需重新生成的2D/3D图片直接读取已有文件。
+    """
+    json_file, outputs, pending = task
+    with open(json_file, 'r', encoding='utf-8') as f:
+        cad_data = json.load(f)
     
-    args = [
-        '--input', input_dir,
-        '--output', output_dir,
-        '--format', 'png'
-    ]
+    renderers = {
+        '2d': lambda: state['2d'].to_png_bytes(cad_data),
+        '3d': lambda: _render_3d_png(state, cad_data),
+    }
+    pngs = {}
+    for kind, render in renderers.items():
+        if kind not in pending and 'combined' not in pending:
+            continue
+        if kind not in pending and os.path.exists(outputs[kind]):
+            with open(outputs[kind], 'rb') as f:
+                pngs[kind] = f.read()
+            continue
+        pngs[kind] = render()
+        if kind in pending:
+            with open(outputs[kind], 'wb') as f:
+                f.write(pngs[kind])
     
-    success = run_conversion_script('cad_to_image.py', args)
+    if 'combined' in pending:
+        _compose_combined(state, Path(json_file).stem, pngs['2d'], pngs['3d'], outputs['combined'])
+
+def convert_cad_files(input_dir='cad/cadl', kinds=('2d', '3d', 'combined'), style='extruded',
+                      extrude_height=100, renderer='matplotlib', image_size=1200, workers=1, force=False):
+    """
+    在当前进程内批量转换CAD文件（可选多进程并行），按构建清单增量生成
     
-    if success:
-        print(f"✅ 2D图片生成完成，保存在: {output_dir}")
-    else:
-        print("❌ 2D图片生成失败")
+    Returns:
+        dict: 各类输出 -> 成功生成的数量；失败的文件数记录在 'failed'
+    """
+    json_files = sorted(Path(input_dir).glob("*.json"))
+    if not json_files:
+        print("❌ 没有找到JSON文件")
+        return None
     
-    return success
-
-def generate_3d_images(input_dir='cad/cadl', output_dir='cad/3d_images', style='extruded'):
-    """生成3D图片"""
-    print(f"\n🎯 开始生成3D图片 (样式: {style})...")
+    print(f"📁 找到 {len(json_files)} 个JSON文件")
     
-    args = [
-        '--input', input_dir,
-        '--output', output_dir,
-        '--style', style,
-        '--height', '100'
-    ]
+    # 各类输出的渲染器版本和选项，组合视图同时依赖2D和3D的设置
+    versions = {
+        '2d': renderer_version(renderer, 'png'),
+        '3d': f"3d-{RENDERER_3D_VERSION}",
+        'combined': f"combined-{COMBINED_VERSION}",
+    }
+    options = {
+        '2d': render_options(renderer, 'png', image_size),
+        '3d': {'height': extrude_height, 'style': style},
+    }
+    options['combined'] = {'2d': versions['2d'], '3d': versions['3d'], **options['3d']}
+    manifests = {kind: BuildManifest(OUTPUT_DIRS[kind]) for kind in kinds}
     
-    success = run_conversion_script('cad_3d_visualizer.py', args)
+    tasks = []
+    hashes = {}
+    for json_file in json_files:
+        outputs = {kind: str(Path(OUTPUT_DIRS[kind]) / OUTPUT_NAMES[kind].format(stem=json_file.stem))
+                   for kind in OUTPUT_DIRS}
+        hashes[str(json_file)] = input_hash = file_hash(json_file)
+        pending = tuple(kind for kind in kinds
+                        if force or not manifests[kind].is_up_to_date(
+                            outputs[kind], input_hash, versions[kind], options[kind]))
+        if pending:
+            tasks.append((str(json_file), outputs, pending))
     
-    if success:
-        print(f"✅ 3D图片生成完成，保存在: {output_dir}")
-    else:
-        print("❌ 3D图片生成失败")
+    for kind, manifest in manifests.items():
+        expected = [OUTPUT_NAMES[kind].format(stem=json_file.stem) for json_file in json_files]
+        removed = manifest.remove_orphans(expected)
+        if removed:
+            print(f"🧹 已清理 {len(removed)} 个孤立的{kind}图片")
+    print(f"⏭️  {len(json_files) - len(tasks)} 个文件无变化，{len(tasks)} 个文件待转换")
     
-    return success
-
-def create_combined_view(input_dir='cad/cadl', output_dir='cad/combined'):
-    """创建组合视图（2D+3D并排显示）"""
-    print("\n🔄 开始创建组合视图...")
+    results = run_render_tasks(tasks, _init_pipeline_worker, _convert_file,
+                               init_args=(renderer, image_size, style, extrude_height),
+                               workers=workers,
+                               label=lambda task: Path(task[0]).name)
     
-    try:
-        import matplotlib.pyplot as plt
-        import matplotlib.image as mpimg
-        from pathlib import Path
-        
-        # 获取所有JSON文件
-        json_files = list(Path(input_dir).glob("*.json"))
-        
-        if not json_files:
-            print("❌ 没有找到JSON文件")
-            return False
-        
-        print(f"📁 找到 {len(json_files)} 个文件，开始创建组合视图...")
-        
-        for json_file in json_files:
-            try:
-                # 检查对应的图片文件是否存在
-                img_2d = Path('cad/images') / f"{json_file.stem}.png"
-                img_3d = Path('cad/3d_images') / f"{json_file.stem}_3d.png"
-                
-                if not img_2d.exists() or not img_3d.exists():
-                    print(f"⚠️  跳过 {json_file.name} - 缺少对应的图片文件")
-                    continue
-                
-                # 创建组合图片
-                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 10))
-                
-                # 加载2D图片
-                img_2d_data = mpimg.imread(str(img_2d))
-                ax1.imshow(img_2d_data)
-                ax1.set_title(f'2D视图 - {json_file.stem}', fontsize=14, fontweight='bold')
-                ax1.axis('off')
-                
-                # 加载3D图片
-                img_3d_data = mpimg.imread(str(img_3d))
-                ax2.imshow(img_3d_data)
-                ax2.set_title(f'3D视图 - {json_file.stem}', fontsize=14, fontweight='bold')
-                ax2.axis('off')
-                
-                # 保存组合图片
-                output_file = Path(output_dir) / f"{json_file.stem}_combined.png"
-                plt.savefig(output_file, dpi=300, bbox_inches='tight')
-                plt.close()
-                
-                print(f"✅ 创建组合视图: {output_file.name}")
-                
-            except Exception as e:
-                print(f"❌ 处理 {json_file.name} 时出错: {e}")
-                continue
-        
-        print(f"✅ 组合视图创建完成，保存在: {output_dir}")
-        return True
-        
-    except ImportError:
-        print("❌ 缺少必要的库，无法创建组合视图")
-        return False
-    except Exception as e:
-        print(f"❌ 创建组合视图时出错: {e}")
-        return False
+    counts = {kind: 0 for kind in kinds}
+    counts['failed'] = 0
+    for (json_file, outputs, pending), ok, _ in results:
+        if not ok:
+            counts['failed'] += 1
+            continue
+        for kind in pending:
+            manifests[kind].record(outputs[kind], json_file, hashes[json_file],
+                                   versions[kind], options[kind])
+            counts[kind] += 1
+    for manifest in manifests.values():
+        manifest.save()
+    
+    return counts
 
 def generate_summary_report(input_dir='cad/cadl'):
     """生成转换报告"""
@@ -209,6 +231,15 @@ def main():
     parser.add_argument('--style', '-s', type=str, default='extruded',
                         choices=['extruded', 'wireframe'],
                         help='3D模型样式 (默认: extruded)')
+    parser.add_argument('--renderer', '-r', type=str, default='matplotlib',
+                        choices=RENDERERS,
+                        help='2D渲染器 (默认: matplotlib)')
+    parser.add_argument('--size', type=int, default=1200,
+                        help='raster渲染器输出的2D图片像素尺寸 (默认: 1200)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help=f'并行转换的工作进程数，0表示使用全部核心 ({default_workers()}) (默认: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略增量构建清单，全部重新生成')
     
     args = parser.parse_args()
     
@@ -221,29 +252,19 @@ def main():
     
     start_time = time.time()
     
-    # 生成2D图片
-    if not args.skip_2d:
-        success_2d = generate_2d_images(args.input)
-    else:
-        print("⏭️  跳过2D图片生成")
-        success_2d = True
-    
-    # 生成3D图片
-    if not args.skip_3d:
-        success_3d = generate_3d_images(args.input, style=args.style)
-    else:
-        print("⏭️  跳过3D图片生成")
-        success_3d = True
+    kinds = [kind for kind, skip in (('2d', args.skip_2d), ('3d', args.skip_3d),
+                                     ('combined', args.skip_combined)) if not skip]
+    for kind in sorted(set(OUTPUT_DIRS) - set(kinds)):
+        print(f"⏭️  跳过{kind}图片生成")
     
-    # 创建组合视图
-    if not args.skip_combined and success_2d and success_3d:
-        success_combined = create_combined_view(args.input)
-    else:
-        print("⏭️  跳过组合视图生成")
-        success_combined = True
+    workers = args.workers if args.workers > 0 else default_workers()
+    counts = convert_cad_files(args.input, kinds, style=args.style, renderer=args.renderer,
+                               image_size=args.size,
+                               workers=workers, force=args.force)
+    success = counts is not None and counts['failed'] == 0
     
     # 生成报告
-    if success_2d or success_3d:
+    if counts is not None:
         generate_summary_report(args.input)
     
     # 计算总时间
@@ -252,7 +273,7 @@ def main():
     print(f"\n🎉 批量转换完成！")
     print(f"⏱️  总耗时: {total_time:.2f} 秒")
     
-    if success_2d and success_3d and success_combined:
+    if success:
         print("✅ 所有转换任务都成功完成")
     else:
         print("⚠️  部分转换任务失败，请检查错误信息")
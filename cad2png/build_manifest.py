@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量渲染构建清单
+记录每个输出图片对应的输入内容哈希、渲染器版本和渲染选项，
+仅重新渲染新增或发生变化的输入，并清理输入已删除的孤立输出。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = '.build_manifest.json'
+
+
+def file_hash(path, chunk_size=1 << 16):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def combined_hash(paths):
+    """多个输入文件的联合哈希（如组合视图依赖的2D和3D图片）"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_hash(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_NAME
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('outputs', {})
+            except (OSError, ValueError):
+                # 清单损坏时视为空清单，全部重新渲染
+                self.entries = {}
+
+    def is_up_to_date(self, output_file, input_hash, renderer_version, options):
+        """输出文件存在且输入哈希、渲染器版本和选项都未变化时返回True"""
+        entry = self.entries.get(Path(output_file).name)
+        if entry is None or not Path(output_file).exists():
+            return False
+        return (entry.get('input_hash') == input_hash
+                and entry.get('renderer_version') == renderer_version
+                and entry.get('options') == options)
+
+    def record(self, output_file, input_file, input_hash, renderer_version, options):
+        """记录一个渲染成功的输出，输入路径相对于输出目录保存，移动或重新克隆仓库后清单仍然有效"""
+        try:
+            input_path = Path(os.path.relpath(input_file, self.output_dir)).as_posix()
+        except ValueError:
+            # Windows下输入和输出不在同一盘符时无法使用相对路径
+            input_path = os.path.abspath(input_file)
+        self.entries[Path(output_file).name] = {
+            'input': input_path,
+            'input_hash': input_hash,
+            'renderer_version': renderer_version,
+            'options': options,
+        }
+
+    def remove_orphans(self, expected_outputs):
+        """
+        删除输入文件已被删除的孤立输出，返回删除的文件名
+        本次运行不会生成、但输入仍存在的输出（如用其他格式或尺寸渲染的图片）不算孤立，予以保留
+        """
+        expected = {Path(p).name for p in expected_outputs}
+        removed = []
+        for name in sorted(set(self.entries) - expected):
+            input_file = self.entries[name].get('input')
+            if not input_file or (self.output_dir / input_file).exists():
+                continue
+            try:
+                (self.output_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            del self.entries[name]
+            removed.append(name)
+        return removed
+
+    def save(self):
+        """原子写入清单（临时文件 + 重命名）"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'outputs': self.entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def plan_incremental(tasks, manifest, renderer_version, options, force=False,
+                     input_of=lambda task: task[0], output_of=lambda task: task[1],
+                     hash_of=None):
+    """
+    根据清单筛选需要渲染的任务
+
+    Returns:
+        (待渲染任务列表, {输出路径: 输入哈希})
+    """
+    hash_of = hash_of or (lambda task: file_hash(input_of(task)))
+    pending = []
+    hashes = {}
+    for task in tasks:
+        output_file = output_of(task)
+        try:
+            hashes[output_file] = hash_of(task)
+        except OSError:
+            # 输入缺失（如组合视图缺少2D/3D图片），交给渲染步骤报告错误
+            hashes[output_file] = None
+            pending.append(task)
+            continue
+        if force or not manifest.is_up_to_date(output_file, hashes[output_file],
+                                               renderer_version, options):
+            pending.append(task)
+    return pending, hashes
@@ -5,15 +5,21 @@
 支持从JSON文件创建3D CAD模型并导出为图片
 """
 
+import io
 import json
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection, Poly3DCollection
 import matplotlib.patches as patches
 from pathlib import Path
 import argparse
+from render_pool import run_render_tasks, default_workers
+from build_manifest import BuildManifest, plan_incremental
+
+# 渲染输出发生变化时递增，使增量构建清单中的旧图片失效
+RENDERER_VERSION = 2
 
 class CAD3DVisualizer:
     def __init__(self):
@@ -21,31 +27,77 @@ class CAD3DVisualizer:
         self.ax = None
         
     def create_3d_plot(self):
-        """创建3D绘图环境"""
-        self.fig = plt.figure(figsize=(15, 12))
+        """创建3D绘图环境（已有figure时清空复用，避免重复创建）"""
+        if self.fig is None:
+            self.fig = plt.figure(figsize=(15, 12))
+        else:
+            self.fig.clf()
         self.ax = self.fig.add_subplot(111, projection='3d')
         self.ax.set_xlabel('X轴')
         self.ax.set_ylabel('Y轴')
         self.ax.set_zlabel('Z轴')
         self.ax.set_title('3D CAD模型可视化', fontsize=16, fontweight='bold')
         
+    @staticmethod
+    def _profile_outline(primitives, num_circle_points=100):
+        """
+        将轮廓收集为2D线段数组 (N, 2, 2)：直线为一段，圆离散为折线段
+        """
+        lines = np.array([[(p['xstart'], p['ystart']), (p['xend'], p['yend'])]
+                          for p in primitives if p['type'] == 'Line'], dtype=float).reshape(-1, 2, 2)
+        circles = np.array([(p['xc'], p['yc'], p['r'])
+                            for p in primitives if p['type'] == 'Circle'], dtype=float).reshape(-1, 3)
+        
+        theta = np.linspace(0, 2*np.pi, num_circle_points)
+        ring = np.stack([np.cos(theta), np.sin(theta)], axis=-1)              # (T, 2)
+        points = circles[:, None, :2] + circles[:, None, 2:] * ring[None]      # (C, T, 2)
+        arcs = np.stack([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 2, 2)
+        return np.concatenate([lines, arcs])
+    
+    @staticmethod
+    def _connector_points(primitives, num_circle_points=8):
+        """竖直连接线的落脚点 (N, 2)：直线的两个端点，圆周上均匀分布的点"""
+        ends = np.array([[(p['xstart'], p['ystart']), (p['xend'], p['yend'])]
+                         for p in primitives if p['type'] == 'Line'], dtype=float).reshape(-1, 2)
+        circles = np.array([(p['xc'], p['yc'], p['r'])
+                            for p in primitives if p['type'] == 'Circle'], dtype=float).reshape(-1, 3)
+        theta = np.linspace(0, 2*np.pi, num_circle_points)
+        ring = np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+        on_circles = (circles[:, None, :2] + circles[:, None, 2:] * ring[None]).reshape(-1, 2)
+        return np.concatenate([ends, on_circles])
+    
+    @staticmethod
+    def _lift(segments_2d, z_height):
+        """为2D线段 (N, 2, 2) 补上Z坐标，得到3D线段 (N, 2, 3)"""
+        z = np.full(segments_2d.shape[:-1] + (1,), float(z_height))
+        return np.concatenate([segments_2d, z], axis=-1)
+    
+    def _add_segments(self, segments, **kwargs):
+        """以单个Line3DCollection绘制所有3D线段"""
+        if len(segments):
+            self.ax.add_collection3d(Line3DCollection(segments, **kwargs))
+    
+    def _draw_connectors(self, primitives, extrude_height, alpha):
+        """绘制底面与顶面之间的竖直连接线"""
+        points = self._connector_points(primitives)
+        segments = np.stack([self._lift(points, 0), self._lift(points, extrude_height)], axis=1)
+        self._add_segments(segments, colors='gray', alpha=alpha, linewidths=1)
+    
+    def _draw_side_walls(self, primitives, extrude_height):
+        """以单个Poly3DCollection绘制拉伸侧壁（每条轮廓线段对应一个四边形面片）"""
+        outline = self._profile_outline(primitives, num_circle_points=64)
+        if not len(outline):
+            return
+        bottom = self._lift(outline, 0)
+        top = self._lift(outline, extrude_height)
+        quads = np.concatenate([bottom, top[:, ::-1]], axis=1)                # (N, 4, 3)
+        self.ax.add_collection3d(Poly3DCollection(quads, facecolors='lightsteelblue',
+                                                  edgecolors='none', alpha=0.35))
+    
     def draw_2d_profile(self, primitives, z_height=0, color='blue'):
         """在指定Z高度绘制2D轮廓"""
-        for primitive in primitives:
-            if primitive['type'] == 'Circle':
-                # 绘制圆形
-                theta = np.linspace(0, 2*np.pi, 100)
-                x = primitive['xc'] + primitive['r'] * np.cos(theta)
-                y = primitive['yc'] + primitive['r'] * np.sin(theta)
-                z = np.full_like(theta, z_height)
-                self.ax.plot(x, y, z, color=color, linewidth=2)
-                
-            elif primitive['type'] == 'Line':
-                # 绘制直线
-                x = [primitive['xstart'], primitive['xend']]
-                y = [primitive['ystart'], primitive['yend']]
-                z = [z_height, z_height]
-                self.ax.plot(x, y, z, color=color, linewidth=2)
+        segments = self._lift(self._profile_outline(primitives), z_height)
+        self._add_segments(segments, colors=color, linewidths=2)
                 
     def create_extruded_model(self, json_data, extrude_height=100):
         """创建拉伸的3D模型"""
@@ -54,6 +106,9 @@ class CAD3DVisualizer:
         # 获取基本图形
         primitives = json_data.get('primitives', [])
         
+        # 绘制填充的侧壁
+        self._draw_side_walls(primitives, extrude_height)
+        
         # 绘制底部轮廓
         self.draw_2d_profile(primitives, z_height=0, color='blue')
         
@@ -61,45 +116,10 @@ class CAD3DVisualizer:
         self.draw_2d_profile(primitives, z_height=extrude_height, color='red')
         
         # 绘制连接线（创建3D效果）
-        for primitive in primitives:
-            if primitive['type'] == 'Circle':
-                # 绘制圆柱体的连接线
-                theta = np.linspace(0, 2*np.pi, 8)
-                for t in theta:
-                    x = primitive['xc'] + primitive['r'] * np.cos(t)
-                    y = primitive['yc'] + primitive['r'] * np.sin(t)
-                    self.ax.plot([x, x], [y, y], [0, extrude_height], 
-                               color='gray', alpha=0.5, linewidth=1)
-                               
-            elif primitive['type'] == 'Line':
-                # 绘制直线的连接线
-                x_start, y_start = primitive['xstart'], primitive['ystart']
-                x_end, y_end = primitive['xend'], primitive['yend']
-                
-                # 绘制四个角点的连接线
-                for x, y in [(x_start, y_start), (x_end, y_end)]:
-                    self.ax.plot([x, x], [y, y], [0, extrude_height], 
-                               color='gray', alpha=0.5, linewidth=1)
+        self._draw_connectors(primitives, extrude_height, alpha=0.5)
         
         # 设置坐标轴范围
-        all_x = []
-        all_y = []
-        for primitive in primitives:
-            if primitive['type'] == 'Circle':
-                all_x.extend([primitive['xc'] - primitive['r'], primitive['xc'] + primitive['r']])
-                all_y.extend([primitive['yc'] - primitive['r'], primitive['yc'] + primitive['r']])
-            elif primitive['type'] == 'Line':
-                all_x.extend([primitive['xstart'], primitive['xend']])
-                all_y.extend([primitive['ystart'], primitive['yend']])
-        
-        if all_x and all_y:
-            x_range = max(all_x) - min(all_x)
-            y_range = max(all_y) - min(all_y)
-            margin = max(x_range, y_range) * 0.1
-            
-            self.ax.set_xlim(min(all_x) - margin, max(all_x) + margin)
-            self.ax.set_ylim(min(all_y) - margin, max(all_y) + margin)
-            self.ax.set_zlim(0, extrude_height + margin)
+        self._set_axis_limits(primitives, extrude_height)
         
         return self.fig, self.ax
     
@@ -114,25 +134,7 @@ class CAD3DVisualizer:
         self.draw_2d_profile(primitives, z_height=extrude_height, color='red')
         
         # 绘制连接线
-        for primitive in primitives:
-            if primitive['type'] == 'Circle':
-                # 绘制圆周上的连接点
-                num_points = 8
-                theta = np.linspace(0, 2*np.pi, num_points)
-                for t in theta:
-                    x = primitive['xc'] + primitive['r'] * np.cos(t)
-                    y = primitive['yc'] + primitive['r'] * np.sin(t)
-                    self.ax.plot([x, x], [y, y], [0, extrude_height], 
-                               color='gray', alpha=0.7, linewidth=1)
-                               
-            elif primitive['type'] == 'Line':
-                # 绘制端点连接线
-                x_start, y_start = primitive['xstart'], primitive['ystart']
-                x_end, y_end = primitive['xend'], primitive['yend']
-                
-                for x, y in [(x_start, y_start), (x_end, y_end)]:
-                    self.ax.plot([x, x], [y, y], [0, extrude_height], 
-                               color='gray', alpha=0.7, linewidth=1)
+        self._draw_connectors(primitives, extrude_height, alpha=0.7)
         
         # 设置坐标轴
         self._set_axis_limits(primitives, extrude_height)
@@ -141,23 +143,20 @@ class CAD3DVisualizer:
     
     def _set_axis_limits(self, primitives, extrude_height):
         """设置坐标轴范围"""
-        all_x = []
-        all_y = []
-        for primitive in primitives:
-            if primitive['type'] == 'Circle':
-                all_x.extend([primitive['xc'] - primitive['r'], primitive['xc'] + primitive['r']])
-                all_y.extend([primitive['yc'] - primitive['r'], primitive['yc'] + primitive['r']])
-            elif primitive['type'] == 'Line':
-                all_x.extend([primitive['xstart'], primitive['xend']])
-                all_y.extend([primitive['ystart'], primitive['yend']])
+        lines = np.array([(p['xstart'], p['ystart'], p['xend'], p['yend'])
+                          for p in primitives if p['type'] == 'Line'], dtype=float).reshape(-1, 4)
+        circles = np.array([(p['xc'], p['yc'], p['r'])
+                            for p in primitives if p['type'] == 'Circle'], dtype=float).reshape(-1, 3)
+        all_x = np.concatenate([lines[:, 0], lines[:, 2], circles[:, 0] - circles[:, 2], circles[:, 0] + circles[:, 2]])
+        all_y = np.concatenate([lines[:, 1], lines[:, 3], circles[:, 1] - circles[:, 2], circles[:, 1] + circles[:, 2]])
         
-        if all_x and all_y:
-            x_range = max(all_x) - min(all_x)
-            y_range = max(all_y) - min(all_y)
+        if all_x.size and all_y.size:
+            x_range = all_x.max() - all_x.min()
+            y_range = all_y.max() - all_y.min()
             margin = max(x_range, y_range) * 0.1
             
-            self.ax.set_xlim(min(all_x) - margin, max(all_x) + margin)
-            self.ax.set_ylim(min(all_y) - margin, max(all_y) + margin)
+            self.ax.set_xlim(all_x.min() - margin, all_x.max() + margin)
+            self.ax.set_ylim(all_y.min() - margin, all_y.max() + margin)
             self.ax.set_zlim(0, extrude_height + margin)
     
     def add_metadata_info(self, json_data):
@@ -176,63 +175,88 @@ class CAD3DVisualizer:
     def save_model(self, output_path, dpi=300):
         """保存模型图片"""
         if self.fig:
-            plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+            self.fig.savefig(output_path, dpi=dpi, bbox_inches='tight')
             print(f"3D模型图片已保存到: {output_path}")
     
+    def to_png_bytes(self, dpi=300):
+        """返回当前模型图片的内存PNG数据（不写磁盘）"""
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    
     def show_model(self):
         """显示模型"""
         if self.fig:
             plt.show()
 
-def process_cad_3d_files(input_dir, output_dir, extrude_height=100, style='extruded'):
-    """批量处理CAD文件并生成3D可视化"""
+def _init_3d_worker():
+    """工作进程初始化：每个进程创建一个3D可视化器并复用其figure"""
+    return CAD3DVisualizer()
+
+def _render_3d_file(visualizer, task):
+    """渲染单个JSON文件的3D视图"""
+    json_file, output_file, extrude_height, style = task
+    with open(json_file, 'r', encoding='utf-8') as f:
+        cad_data = json.load(f)
+    
+    # 根据样式创建不同的3D模型
+    if style == 'extruded':
+        visualizer.create_extruded_model(cad_data, extrude_height)
+    elif style == 'wireframe':
+        visualizer.create_wireframe_model(cad_data, extrude_height)
+    
+    # 添加元数据信息
+    visualizer.add_metadata_info(cad_data)
+    
+    # 保存图片
+    visualizer.save_model(output_file)
+
+def process_cad_3d_files(input_dir, output_dir, extrude_height=100, style='extruded', workers=1,
+                         force=False):
+    """批量处理CAD文件并生成3D可视化（增量：仅渲染新增或变化的JSON）"""
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
     
     # 查找所有JSON文件
-    json_files = list(input_path.glob("*.json"))
+    json_files = sorted(input_path.glob("*.json"))
     
     if not json_files:
         print(f"在 {input_dir} 中没有找到JSON文件")
         return
     
     print(f"找到 {len(json_files)} 个JSON文件")
+    if workers > 1:
+        print(f"使用 {workers} 个工作进程渲染")
     
-    for json_file in json_files:
-        try:
-            print(f"处理文件: {json_file.name}")
-            
-            # 读取JSON数据
-            with open(json_file, 'r', encoding='utf-8') as f:
-                cad_data = json.load(f)
-            
-            # 创建3D可视化器
-            visualizer = CAD3DVisualizer()
-            
-            # 根据样式创建不同的3D模型
-            if style == 'extruded':
-                visualizer.create_extruded_model(cad_data, extrude_height)
-            elif style == 'wireframe':
-                visualizer.create_wireframe_model(cad_data, extrude_height)
-            
-            # 添加元数据信息
-            visualizer.add_metadata_info(cad_data)
-            
-            # 生成输出文件名
-            output_file = output_path / f"{json_file.stem}_3d.png"
-            
-            # 保存图片
-            visualizer.save_model(str(output_file))
-            
-            # 关闭图形以释放内存
-            plt.close(visualizer.fig)
-            
-        except Exception as e:
-            print(f"处理文件 {json_file.name} 时出错: {e}")
-            continue
+    tasks = [(str(json_file), str(output_path / f"{json_file.stem}_3d.png"), extrude_height, style)
+             for json_file in json_files]
+    
+    # 根据构建清单跳过未变化的文件，并清理已删除输入对应的图片
+    manifest = BuildManifest(output_path)
+    version = f"3d-{RENDERER_VERSION}"
+    options = {'height': extrude_height, 'style': style}
+    pending, hashes = plan_incremental(tasks, manifest, version, options, force)
+    removed = manifest.remove_orphans([task[1] for task in tasks])
+    if removed:
+        print(f"已清理 {len(removed)} 个孤立的3D图片")
+    print(f"{len(tasks) - len(pending)} 个文件无变化，{len(pending)} 个文件待渲染")
+    
+    results = run_render_tasks(pending, _init_3d_worker, _render_3d_file,
+                               workers=workers,
+                               label=lambda task: Path(task[0]).name)
+    
+    for task, ok, _ in results:
+        if ok:
+            manifest.record(task[1], task[0], hashes[task[1]], version, options)
+    manifest.save()
+    
+    failed = [task for task, ok, _ in results if not ok]
+    if failed:
+        print(f"{len(failed)}/{len(pending)} 个文件处理失败")
     
     print(f"3D模型处理完成！图片保存在: {output_dir}")
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description='3D CAD模型可视化工具')
@@ -247,6 +271,10 @@ def main():
                         help='3D模型样式 (默认: extruded)')
     parser.add_argument('--single', type=str,
                         help='处理单个文件 (可选)')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略增量构建清单，全部重新渲染')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help=f'批量渲染的工作进程数，0表示使用全部核心 ({default_workers()}) (默认: 1)')
     
     args = parser.parse_args()
     
@@ -278,7 +306,8 @@ def main():
             print(f"处理文件时出错: {e}")
     else:
         # 批量处理
-        process_cad_3d_files(args.input, args.output, args.height, args.style)
+        workers = args.workers if args.workers > 0 else default_workers()
+        process_cad_3d_files(args.input, args.output, args.height, args.style, workers, args.force)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAD JSON原生光栅渲染器
+绕过matplotlib，直接用NumPy计算坐标并用PIL ImageDraw绘制基本图形，
+通过超采样后缩放实现抗锯齿。版式（网格、标题、统计信息框、配色）
+与 cad_to_image.CADVisualizer 保持一致，速度快一个数量级以上。
+"""
+
+import io
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # pillow为可选依赖，仅raster渲染器需要
+    Image = ImageDraw = ImageFont = None
+
+# 渲染输出发生变化时递增，使增量构建清单中的旧图片失效
+RENDERER_VERSION = 1
+
+# 与matplotlib路径一致的配色
+COLOR_BACKGROUND = (255, 255, 255)
+COLOR_LINE = (0, 0, 255)          # 'b-' / edgecolor='blue'
+COLOR_MARKER = (255, 0, 0)        # 'ro'
+COLOR_ARC = (0, 128, 0)           # 'g--'
+COLOR_POINT = (0, 0, 0)           # 'ko'
+COLOR_GRID = (235, 235, 235)      # '#b0b0b0' alpha=0.3 叠加在白底上
+COLOR_FRAME = (0, 0, 0)
+COLOR_STATS_BOX = (247, 228, 194)  # wheat alpha=0.8 叠加在白底上
+
+# matplotlib原图为12x12英寸，bbox_inches='tight'裁剪后约10英寸见方，
+# 线宽/标记尺寸/字号以磅为单位，按输出像素等比换算
+FIGURE_POINTS = 10 * 72
+LINE_WIDTH_PT = 2
+MARKER_SIZE_PT = 4
+POINT_SIZE_PT = 6
+GRID_WIDTH_PT = 0.8
+DASH_PATTERN_PT = (7.4, 3.2)
+GRID_STEP = 200
+
+
+def collect_primitives(primitives):
+    """
+    将primitives列表按类型收集为NumPy数组，便于批量坐标变换
+    返回: dict(lines=(N,4), circles=(N,3), arcs=(N,4), points=(N,2))
+    """
+    lines, circles, arcs, points = [], [], [], []
+    for primitive in primitives:
+        ptype = primitive.get('type')
+        if ptype == 'Line':
+            lines.append((primitive['xstart'], primitive['ystart'],
+                          primitive['xend'], primitive['yend']))
+        elif ptype == 'Circle':
+            circles.append((primitive['xc'], primitive['yc'], primitive['r']))
+        elif ptype == 'Arc':
+            # 与matplotlib路径一致：简化为起止点间的虚线
+            if 'xstart' in primitive and 'ystart' in primitive:
+                arcs.append((primitive['xstart'], primitive['ystart'],
+                             primitive['xend'], primitive['yend']))
+        elif ptype == 'Point':
+            points.append((primitive['x'], primitive['y']))
+
+    def to_array(rows, width):
+        return np.asarray(rows, dtype=np.float64).reshape(-1, width)
+
+    return {
+        'lines': to_array(lines, 4),
+        'circles': to_array(circles, 3),
+        'arcs': to_array(arcs, 4),
+        'points': to_array(points, 2),
+    }
+
+
+class CADRasterizer:
+    def __init__(self, canvas_size=(1000, 1000), image_size=1200, supersample=2):
+        if Image is None:
+            raise ImportError("raster渲染器需要安装pillow: pip install pillow")
+        self.canvas_size = canvas_size
+        self.image_size = image_size
+        self.supersample = supersample
+
+        # 超采样画布上的版式参数
+        size = image_size * supersample
+        self.size = size
+        self.px_per_pt = size / FIGURE_POINTS
+        self.plot_left = int(size * 0.06)
+        self.plot_top = int(size * 0.04)
+        self.plot_side = int(size * 0.91)
+        self.scale = np.array([self.plot_side / canvas_size[0],
+                               self.plot_side / canvas_size[1]])
+
+        self.title_font = self._load_font(14 * self.px_per_pt)
+        self.text_font = self._load_font(10 * self.px_per_pt)
+
+        # 网格、边框和刻度与模型无关，只绘制一次，每个文件复制使用
+        self.background = Image.new('RGB', (size, size), COLOR_BACKGROUND)
+        self._draw_axes(ImageDraw.Draw(self.background))
+
+    @staticmethod
+    def _load_font(size):
+        """加载默认字体（Pillow>=10.1支持指定字号）"""
+        try:
+            return ImageFont.load_default(size=max(1, int(size)))
+        except TypeError:
+            return ImageFont.load_default()
+
+    def _pt(self, points):
+        """磅转换为超采样画布上的像素"""
+        return max(1, int(round(points * self.px_per_pt)))
+
+    def to_pixels(self, xy):
+        """批量将CAD坐标 (N,2) 转换为像素坐标（y轴向下）"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        px = np.empty_like(xy)
+        px[:, 0] = self.plot_left + xy[:, 0] * self.scale[0]
+        px[:, 1] = self.plot_top + self.plot_side - xy[:, 1] * self.scale[1]
+        return px
+
+    def _draw_axes(self, draw):
+        """绘制网格、边框和刻度标签"""
+        left, top, side = self.plot_left, self.plot_top, self.plot_side
+        grid_width = self._pt(GRID_WIDTH_PT)
+        for value in range(0, self.canvas_size[0] + 1, GRID_STEP):
+            x = left + value * self.scale[0]
+            draw.line([(x, top), (x, top + side)], fill=COLOR_GRID, width=grid_width)
+            draw.text((x, top + side + self._pt(4)), str(value),
+                      fill=COLOR_FRAME, font=self.text_font, anchor='mt')
+        for value in range(0, self.canvas_size[1] + 1, GRID_STEP):
+            y = top + side - value * self.scale[1]
+            draw.line([(left, y), (left + side, y)], fill=COLOR_GRID, width=grid_width)
+            draw.text((left - self._pt(4), y), str(value),
+                      fill=COLOR_FRAME, font=self.text_font, anchor='rm')
+        draw.rectangle([left, top, left + side, top + side],
+                       outline=COLOR_FRAME, width=grid_width)
+
+    def _draw_dots(self, draw, centers, diameter, color):
+        """绘制圆点标记"""
+        radius = diameter / 2.0
+        for x, y in centers:
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=color)
+
+    def _draw_dashed(self, draw, segments, color, width):
+        """绘制虚线段，按虚线周期向量化切分"""
+        dash, gap = (self._pt(v) for v in DASH_PATTERN_PT)
+        for x0, y0, x1, y1 in segments:
+            length = np.hypot(x1 - x0, y1 - y0)
+            if length == 0:
+                continue
+            starts = np.arange(0.0, length, dash + gap)
+            ends = np.minimum(starts + dash, length)
+            direction = np.array([x1 - x0, y1 - y0]) / length
+            p0 = np.array([x0, y0]) + starts[:, None] * direction
+            p1 = np.array([x0, y0]) + ends[:, None] * direction
+            for a, b in zip(p0, p1):
+                draw.line([tuple(a), tuple(b)], fill=color, width=width)
+
+    def _draw_primitives(self, draw, collected):
+        """绘制所有基本图形"""
+        line_width = self._pt(LINE_WIDTH_PT)
+        marker = self._pt(MARKER_SIZE_PT)
+
+        circles = collected['circles']
+        if len(circles):
+            centers = self.to_pixels(circles[:, :2])
+            radii = circles[:, 2] * self.scale[0]
+            for (x, y), r in zip(centers, radii):
+                draw.ellipse([x - r, y - r, x + r, y + r],
+                             outline=COLOR_LINE, width=line_width)
+            self._draw_dots(draw, centers, marker, COLOR_MARKER)
+
+        lines = collected['lines']
+        if len(lines):
+            starts = self.to_pixels(lines[:, :2])
+            ends = self.to_pixels(lines[:, 2:])
+            for a, b in zip(starts, ends):
+                draw.line([tuple(a), tuple(b)], fill=COLOR_LINE, width=line_width)
+            # round capstyle
+            self._draw_dots(draw, np.concatenate([starts, ends]), line_width, COLOR_LINE)
+            self._draw_dots(draw, np.concatenate([starts, ends]), marker, COLOR_MARKER)
+
+        arcs = collected['arcs']
+        if len(arcs):
+            segments = np.hstack([self.to_pixels(arcs[:, :2]), self.to_pixels(arcs[:, 2:])])
+            self._draw_dashed(draw, segments, COLOR_ARC, line_width)
+
+        points = collected['points']
+        if len(points):
+            self._draw_dots(draw, self.to_pixels(points), self._pt(POINT_SIZE_PT), COLOR_POINT)
+
+    def _draw_stats(self, draw, metadata):
+        """在左上角绘制统计信息框"""
+        stats_text = f"basic shapes: {metadata.get('primitive_count', {})}\n"
+        stats_text += f"constraints: {metadata.get('constraint_count', 0)}\n"
+        stats_text += f"dimensions: {metadata.get('dimension_count', 0)}"
+
+        pad = self._pt(4)
+        origin = (self.plot_left + int(self.plot_side * 0.02) + pad,
+                  self.plot_top + int(self.plot_side * 0.02) + pad)
+        bbox = draw.multiline_textbbox(origin, stats_text, font=self.text_font)
+        draw.rounded_rectangle([bbox[0] - pad, bbox[1] - pad, bbox[2] + pad, bbox[3] + pad],
+                               radius=pad, fill=COLOR_STATS_BOX, outline=COLOR_FRAME,
+                               width=self._pt(GRID_WIDTH_PT))
+        draw.multiline_text(origin, stats_text, fill=COLOR_FRAME, font=self.text_font)
+
+    def render(self, json_data):
+        """渲染CAD模型，返回PIL图像"""
+        image = self.background.copy()
+        draw = ImageDraw.Draw(image)
+
+        title = f"CADmodel - {json_data.get('metadata', {}).get('notes', 'no description')}"
+        draw.text((self.plot_left + self.plot_side / 2, self.plot_top / 2), title,
+                  fill=COLOR_FRAME, font=self.title_font, anchor='mm')
+
+        self._draw_primitives(draw, collect_primitives(json_data.get('primitives', [])))
+
+        metadata = json_data.get('metadata', {})
+        if metadata:
+            self._draw_stats(draw, metadata)
+
+        if self.supersample > 1:
+            # 整数倍盒式降采样即可得到抗锯齿效果，远快于LANCZOS
+            image = image.reduce(self.supersample)
+        return image
+
+    def visualize_cad(self, json_data, output_path=None):
+        """可视化CAD模型（接口与CADVisualizer.visualize_cad一致）"""
+        image = self.render(json_data)
+
+        if output_path:
+            # 线稿图像压缩率高，低压缩等级即可得到小文件且编码更快
+            image.save(output_path, compress_level=1)
+            print(f"image saved to: {output_path}")
+
+        return image
+
+    def to_png_bytes(self, json_data):
+        """渲染CAD模型并返回内存中的PNG数据（不写磁盘）"""
+        buffer = io.BytesIO()
+        self.render(json_data).save(buffer, format='PNG', compress_level=1)
+        return buffer.getvalue()
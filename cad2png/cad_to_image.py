@@ -5,6 +5,7 @@ CAD JSON文件转图片工具
 将CAD文件中的JSON文件转换为PNG图片格式
 """
 
+import io
 import json
 import os
 import matplotlib.pyplot as plt
@@ -13,6 +14,11 @@ from matplotlib.patches import Circle, Rectangle, Polygon, FancyBboxPatch
 import numpy as np
 from pathlib import Path
 import argparse
+from render_pool import run_render_tasks, default_workers
+from build_manifest import BuildManifest, plan_incremental
+
+# 渲染输出发生变化时递增，使增量构建清单中的旧图片失效
+RENDERER_VERSION = 1
 
 class CADVisualizer:
     def __init__(self, canvas_size=(1000, 1000)):
@@ -121,13 +127,58 @@ class CADVisualizer:
         
         # 保存图片
         if output_path:
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
+            self.fig.savefig(output_path, dpi=300, bbox_inches='tight')
             print(f"image saved to: {output_path}")
         
         return self.fig, self.ax
+    
+    def to_png_bytes(self, json_data):
+        """渲染CAD模型并返回内存中的PNG数据（不写磁盘）"""
+        self.visualize_cad(json_data)
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
+        return buffer.getvalue()
+
+RENDERERS = ['matplotlib', 'raster']
+RASTER_FORMATS = ['png', 'jpg']
+
+def create_visualizer(renderer='matplotlib', file_format='png', image_size=1200):
+    """根据渲染器名称创建可视化器，raster渲染器不支持矢量格式时回退到matplotlib"""
+    if renderer == 'raster':
+        if file_format in RASTER_FORMATS:
+            from cad_raster import CADRasterizer
+            return CADRasterizer(image_size=image_size)
+        print(f"⚠️  raster渲染器不支持 {file_format} 格式，改用matplotlib渲染器")
+    return CADVisualizer()
+
+def renderer_version(renderer='matplotlib', file_format='png'):
+    """实际使用的渲染器及其版本，写入增量构建清单"""
+    if renderer == 'raster' and file_format in RASTER_FORMATS:
+        from cad_raster import RENDERER_VERSION as RASTER_VERSION
+        return f"raster-{RASTER_VERSION}"
+    return f"matplotlib-{RENDERER_VERSION}"
 
-def process_cad_files(input_dir, output_dir, file_format='png', fix_paths=False):
-    """批量处理CAD文件"""
+def render_options(renderer='matplotlib', file_format='png', image_size=1200):
+    """影响输出内容的渲染选项，写入增量构建清单；各工具写同一目录时须使用相同的选项"""
+    options = {'format': file_format}
+    if renderer_version(renderer, file_format).startswith('raster'):
+        options['size'] = image_size
+    return options
+
+def _init_render_worker(renderer, file_format, image_size):
+    """工作进程初始化：每个进程创建一个可视化器并在所有文件间复用"""
+    return create_visualizer(renderer, file_format, image_size)
+
+def _render_file(visualizer, task):
+    """渲染单个JSON文件"""
+    json_file, output_file = task
+    with open(json_file, 'r', encoding='utf-8') as f:
+        cad_data = json.load(f)
+    visualizer.visualize_cad(cad_data, output_file)
+
+def process_cad_files(input_dir, output_dir, file_format='png', fix_paths=False,
+                      renderer='matplotlib', image_size=1200, workers=1, force=False):
+    """批量处理CAD文件（增量：仅渲染新增或变化的JSON，force=True时全部重新渲染）"""
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     
@@ -145,38 +196,49 @@ def process_cad_files(input_dir, output_dir, file_format='png', fix_paths=False)
     output_path.mkdir(parents=True, exist_ok=True)
     
     # 查找所有JSON文件
-    json_files = list(input_path.glob("*.json"))
+    json_files = sorted(input_path.glob("*.json"))
     
     if not json_files:
         print(f"no JSON files found in {input_dir}")
         return
     
     print(f"found {len(json_files)} JSON files")
+    if workers > 1:
+        print(f"rendering with {workers} worker processes")
     
-    # 创建可视化器
-    visualizer = CADVisualizer()
+    # 每个任务为 (输入JSON, 输出图片) 路径对
+    tasks = [(str(json_file), str(output_path / f"{json_file.stem}.{file_format}"))
+             for json_file in json_files]
     
-    for json_file in json_files:
-        try:
-            print(f"processing file: {json_file.name}")
-            
-            # 读取JSON数据
-            with open(json_file, 'r', encoding='utf-8') as f:
-                cad_data = json.load(f)
-            
-            # 生成输出文件名
-            output_file = output_path / f"{json_file.stem}.{file_format}"
-            
-            # 可视化并保存
-            visualizer.visualize_cad(cad_data, str(output_file))
-            
-        except Exception as e:
-            print(f"error processing file {json_file.name}: {e}")
-            continue
+    # 根据构建清单跳过未变化的文件，并清理已删除输入对应的图片
+    manifest = BuildManifest(output_path)
+    version = renderer_version(renderer, file_format)
+    options = render_options(renderer, file_format, image_size)
+    pending, hashes = plan_incremental(tasks, manifest, version, options, force)
+    removed = manifest.remove_orphans([output_file for _, output_file in tasks])
+    if removed:
+        print(f"removed {len(removed)} orphaned images")
+    print(f"{len(tasks) - len(pending)} up to date, {len(pending)} to render")
+    
+    results = run_render_tasks(pending, _init_render_worker, _render_file,
+                               init_args=(renderer, file_format, image_size),
+                               workers=workers,
+                               label=lambda task: Path(task[0]).name)
+    
+    for (json_file, output_file), ok, _ in results:
+        if ok:
+            manifest.record(output_file, json_file, hashes[output_file], version, options)
+    manifest.save()
+    
+    failed = [task for task, ok, _ in results if not ok]
+    if failed:
+        print(f"{len(failed)} of {len(pending)} files failed")
     
     print(f"processing completed! images saved to: {output_dir}")
     if fix_paths:
         print(f"📁 实际保存位置: {output_path}")
+    
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description='Transform CAD JSON files to images')
@@ -189,6 +251,15 @@ def main():
                         help='output image format (default: png)')
     parser.add_argument('--single', '-s', type=str,
                         help='process single file (optional)')
+    parser.add_argument('--renderer', '-r', type=str, default='matplotlib',
+                        choices=RENDERERS,
+                        help='rendering backend: matplotlib or native raster (default: matplotlib)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help=f'number of worker processes for batch rendering, 0 = all cores ({default_workers()}) (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-render all files, ignoring the incremental build manifest')
+    parser.add_argument('--size', type=int, default=1200,
+                        help='output image size in pixels for the raster renderer (default: 1200)')
     parser.add_argument('--fix-paths', action='store_true',
                         help='automatically fix output paths to match AI retrieval system expectations')
     parser.add_argument('--auto-detect', action='store_true',
@@ -246,7 +317,7 @@ def main():
             else:
                 output_file = f"{os.path.splitext(args.single)[0]}.{args.format}"
             
-            visualizer = CADVisualizer()
+            visualizer = create_visualizer(args.renderer, args.format, args.size)
             visualizer.visualize_cad(cad_data, output_file)
             
             print(f"single file processing completed: {output_file}")
@@ -255,7 +326,9 @@ def main():
             print(f"error processing file: {e}")
     else:
         # 批量处理
-        process_cad_files(args.input, args.output, args.format, args.fix_paths)
+        workers = args.workers if args.workers > 0 else default_workers()
+        process_cad_files(args.input, args.output, args.format, args.fix_paths,
+                          args.renderer, args.size, workers, args.force)
 
 if __name__ == "__main__":
     main()
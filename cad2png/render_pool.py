@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAD批量渲染进程池
+按块分发渲染任务到多个进程，每个工作进程只初始化一次可视化器（复用figure），
+主进程按输入顺序汇报进度，单个文件失败不影响其他文件。
+2D (cad_to_image) 和 3D (cad_3d_visualizer) 批处理共用此执行器。
+"""
+
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 工作进程内的可视化器等状态，由initializer创建
+_worker_state = None
+
+
+def _init_worker(init_fn, init_args, quiet):
+    """工作进程初始化：创建可视化器，并屏蔽子进程的逐文件输出"""
+    global _worker_state
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    _worker_state = init_fn(*init_args)
+
+
+def _run_task(task_fn, task):
+    """执行单个任务，异常被捕获并作为结果返回，实现失败隔离"""
+    try:
+        task_fn(_worker_state, task)
+        return True, None
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def _run_chunk(task_fn, tasks):
+    """在工作进程中执行一块任务"""
+    return [_run_task(task_fn, task) for task in tasks]
+
+
+def _chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def default_workers():
+    """默认工作进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def run_render_tasks(tasks, init_fn, task_fn, init_args=(), workers=1,
+                     chunksize=None, label=None):
+    """
+    执行渲染任务列表
+
+    Args:
+        tasks: 任务列表（需可pickle，例如 (json路径, 输出路径) 元组）
+        init_fn: 每个工作进程调用一次 init_fn(*init_args)，返回可视化器等状态
+        task_fn: task_fn(state, task) 渲染单个任务，需为模块级函数
+        workers: 进程数，<=1 时在当前进程串行执行
+        chunksize: 每次分发给工作进程的任务数，默认按进程数自动计算
+        label: label(task) 返回进度输出中显示的名称
+
+    Returns:
+        list: 与tasks顺序一致的 (task, 成功与否, 错误信息) 列表
+    """
+    label = label or str
+    total = len(tasks)
+    results = []
+    if not tasks:
+        return results
+
+    def report(task, ok, error):
+        results.append((task, ok, error))
+        status = "✅" if ok else f"❌ {error}"
+        print(f"[{len(results)}/{total}] {label(task)} {status}")
+
+    if workers <= 1 or total <= 1:
+        global _worker_state
+        _worker_state = init_fn(*init_args)
+        for task in tasks:
+            ok, error = _run_task(task_fn, task)
+            report(task, ok, error)
+        return results
+
+    workers = min(workers, total)
+    if chunksize is None:
+        # 每个进程约分到4块，兼顾负载均衡与调度开销
+        chunksize = max(1, total // (workers * 4))
+    chunks = _chunked(tasks, chunksize)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(init_fn, init_args, True)) as executor:
+        futures = [executor.submit(_run_chunk, task_fn, chunk) for chunk in chunks]
+        # 按提交顺序收集结果，保证进度输出有序
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_results = future.result()
+            except BrokenProcessPool as e:
+                chunk_results = [(False, f"worker crashed: {e}")] * len(chunk)
+            except Exception:
+                error = traceback.format_exc(limit=1).strip().splitlines()[-1]
+                chunk_results = [(False, error)] * len(chunk)
+            for task, (ok, error) in zip(chunk, chunk_results):
+                report(task, ok, error)
+
+    return results
@@ -26,5 +26,9 @@ DATA_DIR = "dataset/reports"
 REPORTS_FILE = os.path.join("dataset", "reports.json")
 PARTS_FILE = os.path.join("dataset", "parts.json")
 
+# CAD几何相似检索：DeepCAD潜向量索引目录和导出的编码器目录
+CAD_LATENT_INDEX_DIR = os.path.join("cad2png", "cad", "latent_index")
+CAD_ENCODER_EXPORT_DIR = os.path.join("cad2png", "cad", "cad_encoder")
+
 # 图片路径
 LOGO_PATH = "imgs/ZICUS LOGO.png"
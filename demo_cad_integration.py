@@ -73,7 +73,10 @@ def demo_cad_image_integration():
         if enhanced_part.get('has_cad_image'):
             print(f"   ✅ 找到对应CAD图片")
             print(f"   📁 图片路径: {enhanced_part.get('cad_image_path', 'N/A')}")
-            print(f"   🖼️  图片大小: {len(enhanced_part.get('cad_image', ''))} 字符 (base64)")
+            if enhanced_part.get('has_cad_svg'):
+                print(f"   📐 SVG预览大小: {len(enhanced_part['cad_svg'])} 字符 (PNG未加载)")
+            else:
+                print(f"   🖼️  图片大小: {len(enhanced_part.get('cad_image', ''))} 字符 (base64)")
         else:
             print(f"   ❌ 未找到对应CAD图片")
         
@@ -101,7 +104,10 @@ def demo_cad_image_integration():
         if part.get('has_cad_image'):
             print(f"   🎨 CAD图片: ✅ 可用")
             print(f"   📁 路径: {part['cad_image_path']}")
-            print(f"   📏 大小: {len(part['cad_image'])} 字符")
+            if part.get('has_cad_svg'):
+                print(f"   📏 SVG大小: {len(part['cad_svg'])} 字符")
+            else:
+                print(f"   📏 大小: {len(part['cad_image'])} 字符")
         else:
             print(f"   🎨 CAD图片: ❌ 不可用")
             print(f"   💡 建议: 检查零件编号和源文件是否匹配")
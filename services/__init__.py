@@ -11,7 +11,33 @@ from .llm_service import (
 # 搜索服务
 from .search_service import (
     find_parts_for_product,
-    search_fastgpt_kb
+    search_fastgpt_kb,
+    search_similar_parts_by_geometry
+)
+
+# 缓存服务
+from .cache_service import (
+    load_file_as_base64,
+    list_files_cached,
+    clear_resource_cache
+)
+
+# CAD预览服务
+from .cad_preview_service import (
+    cad_json_to_svg,
+    get_cad_svg
+)
+
+# CAD几何相似检索服务
+from .cad_similarity_service import (
+    find_similar_cad_models,
+    find_similar_cad_by_json
+)
+
+# CAD缩略图拼图服务
+from .contact_sheet_service import (
+    build_contact_sheets,
+    load_contact_sheets
 )
 
 # 摄像头服务
@@ -44,6 +70,24 @@ __all__ = [
     # 搜索服务
     'find_parts_for_product', 
     'search_fastgpt_kb',
+    'search_similar_parts_by_geometry',
+    
+    # 缓存服务
+    'load_file_as_base64',
+    'list_files_cached',
+    'clear_resource_cache',
+    
+    # CAD预览服务
+    'cad_json_to_svg',
+    'get_cad_svg',
+    
+    # CAD几何相似检索服务
+    'find_similar_cad_models',
+    'find_similar_cad_by_json',
+
+    # CAD缩略图拼图服务
+    'build_contact_sheets',
+    'load_contact_sheets',
     
     # 摄像头服务
     'start_camera_recognition',
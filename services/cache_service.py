@@ -0,0 +1,60 @@
+"""
+缓存服务模块 - 统一管理跨Streamlit重跑的静态资源与目录列表缓存
+"""
+
+import streamlit as st
+import base64
+import os
+
+
+def _file_signature(path):
+    """
+    获取文件/目录的签名 (mtime_ns, size)，文件变化后签名随之变化，
+    作为缓存键的一部分实现按文件变更自动失效。不存在时返回None。
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def _read_file_base64(path, signature):
+    """读取文件并进行base64编码（signature仅参与缓存键）"""
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _list_dir_files(directory, suffix, signature):
+    """列出目录下指定后缀的文件（signature仅参与缓存键）"""
+    return sorted(f for f in os.listdir(directory) if f.endswith(suffix))
+
+
+def load_file_as_base64(path):
+    """
+    以base64形式加载文件，同一文件在进程内只读取编码一次，
+    文件被修改后自动重新加载。文件不存在时抛出FileNotFoundError。
+    """
+    signature = _file_signature(path)
+    if signature is None:
+        raise FileNotFoundError(path)
+    return _read_file_base64(path, signature)
+
+
+def list_files_cached(directory, suffix='.png'):
+    """
+    列出目录下指定后缀的文件名，目录内容变化（增删文件）后自动刷新。
+    目录不存在时返回None。
+    """
+    signature = _file_signature(directory)
+    if signature is None:
+        return None
+    return _list_dir_files(directory, suffix, signature)
+
+
+def clear_resource_cache():
+    """显式清空所有资源缓存"""
+    _read_file_base64.clear()
+    _list_dir_files.clear()
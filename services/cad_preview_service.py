@@ -0,0 +1,112 @@
+"""
+CAD预览服务模块 - 将 cad/cadl 格式的CAD JSON直接转换为SVG矢量预览
+绕过matplotlib，生成体积小、与分辨率无关的预览，可直接内联到页面中
+"""
+
+import streamlit as st
+import json
+import os
+from .cache_service import _file_signature
+
+# CAD JSON目录路径
+CAD_JSON_DIR = "cad2png/cad/cadl"
+
+# 与2D渲染图一致的配色
+SVG_LINE_COLOR = "#0000ff"
+SVG_MARKER_COLOR = "#ff0000"
+SVG_ARC_COLOR = "#008000"
+SVG_POINT_COLOR = "#000000"
+
+
+def _fmt(value):
+    """紧凑的数字格式，去掉多余的小数位"""
+    return f"{float(value):.6g}"
+
+
+def cad_json_to_svg(json_data, canvas_size=(1000, 1000), show_markers=True):
+    """
+    将CAD JSON的primitives直接转换为SVG字符串
+    坐标系与CAD一致（y轴向上），通过viewBox和翻转变换映射到SVG坐标
+    """
+    width, height = canvas_size
+    lines = []
+    circles = []
+    arcs = []
+    markers = []
+
+    for primitive in json_data.get('primitives', []):
+        ptype = primitive.get('type')
+        if ptype == 'Line':
+            x0, y0 = _fmt(primitive['xstart']), _fmt(primitive['ystart'])
+            x1, y1 = _fmt(primitive['xend']), _fmt(primitive['yend'])
+            lines.append(f"M{x0} {y0}L{x1} {y1}")
+            markers.extend([(x0, y0), (x1, y1)])
+        elif ptype == 'Circle':
+            xc, yc = _fmt(primitive['xc']), _fmt(primitive['yc'])
+            circles.append(f'<circle cx="{xc}" cy="{yc}" r="{_fmt(primitive["r"])}"/>')
+            markers.append((xc, yc))
+        elif ptype == 'Arc':
+            # 与2D渲染图一致：简化为起止点间的虚线
+            if 'xstart' in primitive and 'ystart' in primitive:
+                arcs.append(f"M{_fmt(primitive['xstart'])} {_fmt(primitive['ystart'])}"
+                            f"L{_fmt(primitive['xend'])} {_fmt(primitive['yend'])}")
+        elif ptype == 'Point':
+            markers.append((_fmt(primitive['x']), _fmt(primitive['y'])))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="-20 -20 {width + 40} {height + 40}" '
+        f'preserveAspectRatio="xMidYMid meet">',
+        f'<rect x="-20" y="-20" width="{width + 40}" height="{height + 40}" fill="#fff"/>',
+        f'<g transform="matrix(1 0 0 -1 0 {height})" fill="none" stroke-width="6" '
+        f'stroke-linecap="round">',
+    ]
+    if lines:
+        parts.append(f'<path stroke="{SVG_LINE_COLOR}" d="{"".join(lines)}"/>')
+    if circles:
+        parts.append(f'<g stroke="{SVG_LINE_COLOR}">{"".join(circles)}</g>')
+    if arcs:
+        parts.append(f'<path stroke="{SVG_ARC_COLOR}" stroke-dasharray="22 10" d="{"".join(arcs)}"/>')
+    if show_markers and markers:
+        dots = "".join(f'<circle cx="{x}" cy="{y}" r="7"/>' for x, y in markers)
+        parts.append(f'<g fill="{SVG_MARKER_COLOR}">{dots}</g>')
+    parts.append('</g></svg>')
+    return "".join(parts)
+
+
+def _get_cad_json_path(part_id, source_file):
+    """根据零件ID和源文件名查找对应的CAD JSON路径"""
+    possible_names = [
+        source_file,
+        f"{part_id}.json",
+        source_file.lower(),
+        f"{part_id.lower()}.json",
+    ]
+    for json_name in possible_names:
+        if not json_name or not json_name.endswith('.json'):
+            continue
+        json_path = os.path.join(CAD_JSON_DIR, os.path.basename(json_name))
+        if os.path.exists(json_path):
+            return json_path
+    return None
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _load_cad_svg(json_path, signature):
+    """读取CAD JSON并生成SVG（signature仅参与缓存键，文件变化后自动失效）"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return cad_json_to_svg(json.load(f))
+
+
+def get_cad_svg(part_id, source_file):
+    """
+    获取零件对应的CAD SVG预览
+    Returns:
+        (svg字符串, JSON路径)，找不到或解析失败时返回 (None, None)
+    """
+    json_path = _get_cad_json_path(part_id, source_file)
+    if not json_path:
+        return None, None
+    try:
+        return _load_cad_svg(json_path, _file_signature(json_path)), json_path
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
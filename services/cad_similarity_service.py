@@ -0,0 +1,78 @@
+"""
+CAD几何相似检索服务模块 - 基于DeepCAD自编码器潜向量的近邻索引查找外形相似的CAD模型
+与FastGPT文本检索互补：文本检索按语义匹配零件，本服务按几何形状匹配零件
+索引由DeepCAD的 build_latent_index.py 生成；按新的CAD JSON检索时还需要 export.py 导出的编码器
+"""
+
+import streamlit as st
+import os
+import sys
+from config import CAD_LATENT_INDEX_DIR, CAD_ENCODER_EXPORT_DIR
+from .cache_service import _file_signature
+
+# DeepCAD代码目录（deploy检索模块所在位置）
+DEEPCAD_DIR = os.path.join("cad2png", "DeepCAD-master", "DeepCAD-master")
+
+
+@st.cache_resource(show_spinner=False)
+def _load_retrieval(index_dir, export_dir, signature):
+    """加载潜向量索引（及编码器），进程内只加载一次，索引文件变化后自动重新加载（signature仅参与缓存键）"""
+    deepcad_dir = os.path.abspath(DEEPCAD_DIR)
+    if deepcad_dir not in sys.path:
+        sys.path.append(deepcad_dir)
+    from deploy import CADRetrieval
+    return CADRetrieval(index_dir, export_dir)
+
+
+def get_cad_retrieval():
+    """获取CAD几何检索器，索引未生成或依赖缺失时返回None"""
+    signature = _file_signature(os.path.join(CAD_LATENT_INDEX_DIR, "index.npz"))
+    if signature is None:
+        return None
+    export_dir = CAD_ENCODER_EXPORT_DIR if os.path.isdir(CAD_ENCODER_EXPORT_DIR) else None
+    try:
+        return _load_retrieval(CAD_LATENT_INDEX_DIR, export_dir, signature)
+    except (ImportError, OSError, ValueError, KeyError) as e:
+        st.warning(f"CAD几何检索不可用: {e}")
+        return None
+
+
+def _get_model_id(retrieval, part_id, source_file):
+    """根据零件ID和源文件名查找索引中的CAD模型ID（即cad2png/cad/json下的文件名）"""
+    source_name = os.path.splitext(os.path.basename(source_file or ''))[0]
+    for model_id in [source_name, part_id, source_name.lower(), str(part_id).lower()]:
+        if model_id and model_id in retrieval:
+            return model_id
+    return None
+
+
+def find_similar_cad_models(part_id, source_file='', top_k=10):
+    """
+    查找与已索引零件外形相似的CAD模型
+    Returns:
+        [(模型ID, 余弦相似度)]，按相似度降序；索引不可用或零件未被索引时返回空列表
+    """
+    retrieval = get_cad_retrieval()
+    if retrieval is None:
+        return []
+    model_id = _get_model_id(retrieval, part_id, source_file)
+    if model_id is None:
+        return []
+    return retrieval.similar_to_id(model_id, top_k)
+
+
+def find_similar_cad_by_json(json_data, top_k=10):
+    """
+    查找与一个新的CAD JSON（DeepCAD格式）外形相似的已索引CAD模型，需要已导出的编码器
+    Returns:
+        [(模型ID, 余弦相似度)]，按相似度降序；不可用或JSON无法转换时返回空列表
+    """
+    retrieval = get_cad_retrieval()
+    if retrieval is None or retrieval.encoder is None:
+        return []
+    try:
+        return retrieval.similar_to_json(json_data, top_k)
+    except Exception as e:
+        # JSON格式错误、超出序列长度或cadlib转换失败都不应使页面崩溃
+        st.warning(f"无法解析CAD JSON: {type(e).__name__}: {e}")
+        return []
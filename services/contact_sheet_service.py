@@ -0,0 +1,213 @@
+"""
+CAD缩略图拼图服务模块 - 将CAD图片库打包为少量拼图(sprite sheet)和JSON坐标索引
+图片库变化时只重建受影响的拼图，概览页面一次加载即可显示全部缩略图和分类统计
+"""
+
+import streamlit as st
+import json
+import os
+from PIL import Image
+from .cache_service import _file_signature, load_file_as_base64
+
+# 拼图输出目录和索引文件
+CONTACT_SHEET_DIR = "cad2png/cad/cad/cad/contact_sheets"
+INDEX_NAME = "contact_sheets.json"
+SHEET_NAME = "sheet_{:03d}.png"
+
+# 每张拼图的网格尺寸和缩略图边长（像素）
+TILE_SIZE = 128
+SHEET_COLUMNS = 16
+SHEET_ROWS = 16
+
+# 概览页面的分类关键词
+CATEGORY_KEYWORDS = ['circle', 'plate', 'bracket']
+
+
+def categorize(file_name):
+    """按关键词统计分类，一个文件可同时属于多个分类，均不匹配时归为other"""
+    name = file_name.lower()
+    categories = [keyword for keyword in CATEGORY_KEYWORDS if keyword in name]
+    return categories or ['other']
+
+
+def _load_index(output_dir):
+    """读取已有的拼图索引，不存在或损坏时返回空索引"""
+    index_path = os.path.join(output_dir, INDEX_NAME)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    layout = (index.get('tile_size'), index.get('columns'), index.get('rows'))
+    if layout != (TILE_SIZE, SHEET_COLUMNS, SHEET_ROWS):
+        return None
+    return index
+
+
+def _tile_origin(slot):
+    """槽位左上角在拼图中的像素坐标"""
+    return (slot % SHEET_COLUMNS) * TILE_SIZE, (slot // SHEET_COLUMNS) * TILE_SIZE
+
+
+def _update_sheet(images_dir, output_dir, sheet_id, entries, changed, cleared_slots):
+    """
+    更新一张拼图：在已有拼图上清空被删除的槽位并只重绘变化的缩略图，
+    拼图不存在或损坏时完整绘制
+    """
+    sheet_path = os.path.join(output_dir, SHEET_NAME.format(sheet_id))
+    used_rows = max(entry['slot'] // SHEET_COLUMNS for entry in entries.values()) + 1
+    size = (SHEET_COLUMNS * TILE_SIZE, used_rows * TILE_SIZE)
+
+    sheet = Image.new('RGB', size, 'white')
+    try:
+        with Image.open(sheet_path) as old_sheet:
+            # 拼图行数可能增加或减少，只复制新旧拼图重叠的部分
+            overlap = (min(size[0], old_sheet.width), min(size[1], old_sheet.height))
+            sheet.paste(old_sheet.convert('RGB').crop((0, 0) + overlap))
+    except OSError:
+        # 拼图不存在或已损坏时完整重绘
+        changed = set(entries)
+
+    for slot in cleared_slots:
+        x, y = _tile_origin(slot)
+        sheet.paste('white', (x, y, x + TILE_SIZE, y + TILE_SIZE))
+
+    for name in changed:
+        entry = entries[name]
+        with Image.open(os.path.join(images_dir, name)) as image:
+            image = image.convert('RGB')
+            image.thumbnail((TILE_SIZE, TILE_SIZE), Image.BILINEAR)
+        x, y = _tile_origin(entry['slot'])
+        sheet.paste('white', (x, y, x + TILE_SIZE, y + TILE_SIZE))
+        entry['x'] = x + (TILE_SIZE - image.width) // 2
+        entry['y'] = y + (TILE_SIZE - image.height) // 2
+        entry['w'], entry['h'] = image.width, image.height
+        sheet.paste(image, (entry['x'], entry['y']))
+    sheet.save(sheet_path, optimize=True)
+
+
+def build_contact_sheets(images_dir, output_dir=CONTACT_SHEET_DIR, force=False):
+    """
+    增量构建CAD图片拼图
+
+    已有图片保持原槽位，只在拼图上重绘新增或修改的缩略图、清空被删除图片的槽位；
+    新图片优先填入已删除图片空出的槽位。
+
+    Returns:
+        dict: 拼图索引 {'sheets': [...], 'images': {文件名: 坐标}, 'categories': {...}}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index = None if force else _load_index(output_dir)
+    old_images = index['images'] if index else {}
+
+    current = {}
+    for name in sorted(f for f in os.listdir(images_dir) if f.endswith('.png')):
+        current[name] = list(_file_signature(os.path.join(images_dir, name)))
+
+    per_sheet = SHEET_COLUMNS * SHEET_ROWS
+    images = {}
+    changed = set()
+    cleared = {}
+    for name, entry in old_images.items():
+        if name not in current:
+            cleared.setdefault(entry['sheet'], []).append(entry['slot'])
+        else:
+            images[name] = entry
+            if entry['signature'] != current[name]:
+                entry['signature'] = current[name]
+                changed.add(name)
+
+    # 新图片填入空闲槽位
+    taken = {entry['sheet'] * per_sheet + entry['slot'] for entry in images.values()}
+    free_slot = 0
+    for name in current:
+        if name in images:
+            continue
+        while free_slot in taken:
+            free_slot += 1
+        taken.add(free_slot)
+        sheet_id, slot = divmod(free_slot, per_sheet)
+        images[name] = {'sheet': sheet_id, 'slot': slot, 'signature': current[name]}
+        changed.add(name)
+        if slot in cleared.get(sheet_id, []):
+            cleared[sheet_id].remove(slot)
+
+    sheet_count = max((entry['sheet'] for entry in images.values()), default=-1) + 1
+    dirty = set(cleared) | {images[name]['sheet'] for name in changed}
+    for sheet_id in sorted(dirty):
+        sheet_path = os.path.join(output_dir, SHEET_NAME.format(sheet_id))
+        entries = {name: entry for name, entry in images.items() if entry['sheet'] == sheet_id}
+        if entries:
+            _update_sheet(images_dir, output_dir, sheet_id, entries,
+                          changed & set(entries), cleared.get(sheet_id, []))
+        elif os.path.exists(sheet_path):
+            os.remove(sheet_path)
+
+    categories = {keyword: 0 for keyword in CATEGORY_KEYWORDS + ['other']}
+    for name in images:
+        for category in categorize(name):
+            categories[category] += 1
+
+    index = {
+        'tile_size': TILE_SIZE,
+        'columns': SHEET_COLUMNS,
+        'rows': SHEET_ROWS,
+        'sheets': [SHEET_NAME.format(i) for i in range(sheet_count)],
+        'images': images,
+        'categories': categories,
+    }
+    tmp_path = os.path.join(output_dir, INDEX_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(output_dir, INDEX_NAME))
+    return index
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_contact_sheets(images_dir, output_dir, signature):
+    """构建拼图并以base64返回（signature为图片目录签名，目录变化后重建）"""
+    index = build_contact_sheets(images_dir, output_dir)
+    sheets = [load_file_as_base64(os.path.join(output_dir, name)) if os.path.exists(os.path.join(output_dir, name))
+              else None for name in index['sheets']]
+    return index, sheets
+
+
+def load_contact_sheets(images_dir, output_dir=CONTACT_SHEET_DIR):
+    """
+    获取CAD图片库的拼图索引和base64编码的拼图
+    Returns:
+        (索引, base64拼图列表)，图片目录不存在时返回 (None, [])
+    """
+    signature = _file_signature(images_dir)
+    if signature is None:
+        return None, []
+    # 目录签名反映文件增删；渲染流程每次运行都会重写构建清单，用来反映图片内容更新
+    manifest_signature = _file_signature(os.path.join(images_dir, '.build_manifest.json'))
+    return _load_contact_sheets(images_dir, output_dir, (signature, manifest_signature))
+
+
+def contact_sheet_html(index, sheets, display_size=96, max_height=480):
+    """生成用CSS背景定位显示所有缩略图的HTML，每张拼图只内联一次"""
+    scale = display_size / index['tile_size']
+    styles = [
+        f".cad-sheet-{i}{{background-image:url(data:image/png;base64,{data});"
+        f"background-size:{index['columns'] * index['tile_size'] * scale:g}px auto;}}"
+        for i, data in enumerate(sheets) if data
+    ]
+    tiles = []
+    for name, entry in sorted(index['images'].items()):
+        x = (entry['slot'] % index['columns']) * index['tile_size'] * scale
+        y = (entry['slot'] // index['columns']) * index['tile_size'] * scale
+        tiles.append(
+            f'<div class="cad-tile" title="{name}">'
+            f'<div class="cad-sheet-{entry["sheet"]}" style="width:{display_size}px;height:{display_size}px;'
+            f'background-position:-{x:g}px -{y:g}px;"></div>'
+            f'<div class="cad-tile-caption">{os.path.splitext(name)[0]}</div></div>'
+        )
+    return (
+        "<style>" + "".join(styles) +
+        f".cad-tile{{display:inline-block;margin:4px;width:{display_size}px;vertical-align:top;}}"
+        ".cad-tile-caption{font-size:11px;color:gray;text-align:center;overflow:hidden;"
+        "text-overflow:ellipsis;white-space:nowrap;}</style>"
+        f'<div style="max-height:{max_height}px;overflow-y:auto;">' + "".join(tiles) + "</div>"
+    )
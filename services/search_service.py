@@ -8,6 +8,9 @@ import json
 import os
 from config import LLM_MODEL, FASTGPT_API_KEY, FASTGPT_DATASET_ID
 from .llm_service import get_llm_client, _generate_fallback_components, _calculate_relevance_reason
+from .cache_service import load_file_as_base64
+from .cad_preview_service import get_cad_svg
+from .cad_similarity_service import find_similar_cad_models
 
 
 def _get_cad_image_path(part_id, source_file):
@@ -39,11 +42,7 @@ def _load_cad_image_as_base64(image_path):
     将CAD图片加载为base64编码，用于在Streamlit中显示
     """
     try:
-        import base64
-        with open(image_path, "rb") as img_file:
-            img_data = img_file.read()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            return img_base64
+        return load_file_as_base64(image_path)
     except Exception as e:
         st.warning(f"无法加载CAD图片 {image_path}: {e}")
         return None
@@ -51,15 +50,29 @@ def _load_cad_image_as_base64(image_path):
 
 def _enhance_part_with_cad_image(part_data):
     """
-    为零件数据添加CAD图片信息
+    为零件数据添加CAD图片信息：由CAD JSON生成的SVG矢量预览（cad_svg等字段）和PNG图片（cad_image等字段）。
+    有SVG预览时只记录PNG路径，不再加载PNG的base64数据（cad_image）
     """
     part_id = part_data.get('part_number', part_data.get('id', ''))
     source_file = part_data.get('source_file', '')
     
+    # 由CAD JSON直接生成的SVG矢量预览，体积远小于PNG的base64，界面优先显示
+    cad_svg, cad_json_path = get_cad_svg(part_id, source_file)
+    if cad_svg:
+        part_data['cad_svg'] = cad_svg
+        part_data['cad_json_path'] = cad_json_path
+        part_data['has_cad_svg'] = True
+    else:
+        part_data['has_cad_svg'] = False
+    
     # 查找对应的CAD图片
     cad_image_path = _get_cad_image_path(part_id, source_file)
     
-    if cad_image_path:
+    if cad_image_path and part_data['has_cad_svg']:
+        # 界面显示SVG预览，PNG只保留路径
+        part_data['cad_image_path'] = cad_image_path
+        part_data['has_cad_image'] = True
+    elif cad_image_path:
         # 加载图片为base64
         cad_image_base64 = _load_cad_image_as_base64(cad_image_path)
         if cad_image_base64:
@@ -366,4 +379,35 @@ def search_fastgpt_kb(query: str, similarity: float = 0.5):
         return [], [{"content": "请求失败", "error": str(e)}]
     except Exception as e:
         st.error(f"处理FastGPT结果时发生未知错误: {e}")
-        return [], [{"content": "处理过程中发生未知错误", "error": str(e)}]
\ No newline at end of file
+        return [], [{"content": "处理过程中发生未知错误", "error": str(e)}]
+
+
+def search_similar_parts_by_geometry(part_data, top_k=8):
+    """
+    按CAD几何形状查找与给定零件相似的零件，作为文本搜索的补充。
+    返回与search_fastgpt_kb相同结构的零件列表，score为潜向量余弦相似度；
+    几何索引不可用或零件未被索引时返回空列表。
+    """
+    part_id = str(part_data.get('part_number', part_data.get('id', '')))
+    source_file = str(part_data.get('source_file', ''))
+
+    results = []
+    for model_id, score in find_similar_cad_models(part_id, source_file, top_k):
+        similar_part = {
+            'part_number': model_id,
+            'part_name': model_id,
+            'description': '几何形状相似的CAD模型',
+            'operator': '系统',
+            'created_time': '未知',
+            'image': None,
+            'source_file': f"{model_id}.json",
+            'keywords': '',
+            'score': score,
+            'embedding_score': score,
+            'rerank_score': 0.0,
+            'original_score': score,
+            'llm_analyzed': False,
+            'relevance_reason': f"与 {part_id} 外形相似"
+        }
+        results.append(_enhance_part_with_cad_image(similar_part))
+    return results
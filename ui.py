@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import html
 import base64
 import time
 from services import (
@@ -20,6 +21,13 @@ from services import (
 import database
 from utils import show_info_message, show_error_message, show_success_message, show_warning_message
 
+def _show_cad_svg(cad_svg, caption, width=None):
+    """内联显示CAD SVG矢量预览"""
+    max_width = f"{width}px" if width else "100%"
+    st.markdown(f'<div style="max-width: {max_width}; margin: 0 auto;">{cad_svg}'
+                f'<p style="text-align: center; color: gray; font-size: 14px;">{html.escape(caption)}</p></div>',
+                unsafe_allow_html=True)
+
 def show_parts_query():
     """Display parts query interface, integrating product decomposition with intelligent search"""
     st.subheader("🤖 Intelligent Parts Finder")
@@ -367,20 +375,24 @@ def show_parts_query():
                                             
                                             # 显示CAD图片（如果有）
                                             cad_image_data = part.get('cad_image')
-                                            if cad_image_data:
+                                            if cad_image_data or part.get('has_cad_svg'):
                                                 st.markdown("---")
                                                 st.markdown("### 🎨 CAD design image ")
                                                 try:
-                                                    st.image(f"data:image/png;base64,{cad_image_data}", 
-                                                             caption=f"CAD Design: {part.get('part_name', 'N/A')}",
-                                                             use_column_width=True)
+                                                    if part.get('has_cad_svg'):
+                                                        _show_cad_svg(part['cad_svg'], f"CAD Design: {part.get('part_name', 'N/A')}")
+                                                    else:
+                                                        st.image(f"data:image/png;base64,{cad_image_data}", 
+                                                                 caption=f"CAD Design: {part.get('part_name', 'N/A')}",
+                                                                 use_column_width=True)
                                                 except Exception as cad_img_error:
                                                     st.warning(f"CAD image display failed: {cad_img_error}")
                                             
                                             # 显示CAD图片路径信息（调试用）
-                                            if part.get('has_cad_image'):
+                                            if part.get('has_cad_image') or part.get('has_cad_svg'):
                                                 with st.expander("🔍 CAD image information ", expanded=False):
                                                     st.info(f"**CAD image path:** {part.get('cad_image_path', 'N/A')}")
+                                                    st.info(f"**CAD JSON path:** {part.get('cad_json_path', 'N/A')}")
                                                     st.info(f"**Part ID:** {part.get('part_number', 'N/A')}")
                                                     st.info(f"**Source file:** {part.get('source_file', 'N/A')}")
 
@@ -458,20 +470,24 @@ def show_parts_query():
                                         
                                         # 显示CAD图片（如果有）
                                         cad_image_data = part.get('cad_image')
-                                        if cad_image_data:
+                                        if cad_image_data or part.get('has_cad_svg'):
                                             st.markdown("---")
                                             st.markdown("### 🎨 CAD design image")
                                             try:
-                                                st.image(f"data:image/png;base64,{cad_image_data}", 
-                                                         caption=f"CAD Design: {part.get('part_name', 'N/A')}",
-                                                         use_column_width=True)
+                                                if part.get('has_cad_svg'):
+                                                    _show_cad_svg(part['cad_svg'], f"CAD Design: {part.get('part_name', 'N/A')}")
+                                                else:
+                                                    st.image(f"data:image/png;base64,{cad_image_data}", 
+                                                             caption=f"CAD Design: {part.get('part_name', 'N/A')}",
+                                                             use_column_width=True)
                                             except Exception as cad_img_error:
                                                 st.warning(f"CAD image display failed: {cad_img_error}")
                                         
                                         # 显示CAD图片路径信息（调试用）
-                                        if part.get('has_cad_image'):
+                                        if part.get('has_cad_image') or part.get('has_cad_svg'):
                                             with st.expander("🔍 CAD image information", expanded=False):
                                                 st.info(f"**CAD image path:** {part.get('cad_image_path', 'N/A')}")
+                                                st.info(f"**CAD JSON path:** {part.get('cad_json_path', 'N/A')}")
                                                 st.info(f"**Part ID:** {part.get('part_number', 'N/A')}")
                                                 st.info(f"**Source file:** {part.get('source_file', 'N/A')}")
 
@@ -544,28 +560,34 @@ def _display_search_results(results):
                 
                 # 显示CAD图片（如果有）
                 cad_image_data = part.get('cad_image')
-                if cad_image_data:
+                if cad_image_data or part.get('has_cad_svg'):
                     st.markdown("---")
                     st.markdown("### 🎨 CAD design image")
                     try:
                         # 使用列布局来更好地控制图片大小
                         col1, col2, col3 = st.columns([1, 2, 1])
                         with col2:
-                            st.image(f"data:image/png;base64,{cad_image_data}", 
-                                     caption=f"CAD Design: {part.get('part_name', 'N/A')}",
-                                     width=400,  # 固定宽度，适应网页展示
-                                     use_column_width=False)  # 不使用列宽，保持固定尺寸
+                            if part.get('has_cad_svg'):
+                                _show_cad_svg(part['cad_svg'], f"CAD Design: {part.get('part_name', 'N/A')}", width=400)
+                            else:
+                                st.image(f"data:image/png;base64,{cad_image_data}", 
+                                         caption=f"CAD Design: {part.get('part_name', 'N/A')}",
+                                         width=400,  # 固定宽度，适应网页展示
+                                         use_column_width=False)  # 不使用列宽，保持固定尺寸
                     except Exception as cad_img_error:
                         st.warning(f"CAD image display failed: {cad_img_error}")
                 
                 # 显示CAD图片路径信息（调试用）
-                if part.get('has_cad_image'):
+                if part.get('has_cad_image') or part.get('has_cad_svg'):
                     with st.expander("🔍 CAD image information", expanded=False):
                         st.info(f"**CAD image path:** {part.get('cad_image_path', 'N/A')}")
+                        st.info(f"**CAD JSON path:** {part.get('cad_json_path', 'N/A')}")
                         st.info(f"**Part ID:** {part.get('part_number', 'N/A')}")
                         st.info(f"**Source file:** {part.get('source_file', 'N/A')}")
                         # 添加图片预览
-                        if part.get('cad_image'):
+                        if part.get('has_cad_svg'):
+                            _show_cad_svg(part['cad_svg'], "CAD image preview", width=300)
+                        elif part.get('cad_image'):
                             st.image(f"data:image/png;base64,{part['cad_image']}", 
                                      caption="CAD image preview",
                                      width=300,